@@ -1,21 +1,36 @@
-from typing import List
-from fastapi import APIRouter, Depends, Query
-
-from ..models import anime, database
-from ..schemas.anime import Anime
-
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+
+from ..models import database
+from ..models.database import settings
+from ..schemas.anime import Anime, AnimeSearchResult, AnimeTop
+from ..services.anime import list_animes, search_animes
+from ..services.catalog import catalog, get_catalog_version
+from ..services.http_cache import (
+    CATALOG_CACHE_CONTROL,
+    cache_headers,
+    etag_matches,
+    not_modified,
+)
+from ..services.pagination import decode_cursor, set_next_cursor
+from ..services.popularity import TOP_METRICS, top_animes
+from ..services.serialization import rows_response
 
 router = APIRouter()
 
 
 @router.get("/api/anime/list", response_model=List[Anime])
-def get_anime_list(
-    db: Session = Depends(database.get_db),
+async def get_anime_list(
+    request: Request,
+    response: Response,
+    db=Depends(database.get_read_session),
     page: int = Query(1, ge=1, description="Page number (starting from 1)"),
     size: int = Query(
         10, ge=1, le=100, description="Number of items per page (between 1 and 100)"
     ),
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from `X-Next-Cursor`; overrides `page`"
+    ),
 ):
     """
     Retrieve a paginated list of animes available on the platform.
@@ -24,11 +39,21 @@ def get_anime_list(
 
     - **page**: The page number to retrieve, starting from 1. Default is 1.
     - **size**: The number of items to return per page, between 1 and 100. Default is 10.
+    - **cursor**: Opaque cursor returned in the `X-Next-Cursor` header of the previous page.
+      When present, `page` is ignored and the page is fetched by primary key, so deep pages
+      cost the same as the first one.
+
+    Results are always ordered by `id`. When the page is full, the response includes an
+    `X-Next-Cursor` header that can be passed as `cursor` to fetch the next page.
+
+    Responses carry an `ETag` tied to the catalog version. Send it back in `If-None-Match`
+    to get a `304 Not Modified` with no body while the catalog has not changed.
 
     **Example request:**
 
     ```
     GET /api/anime/list?page=2&size=5
+    GET /api/anime/list?size=5&cursor=NQ
     ```
 
     **Example response:**
@@ -53,13 +78,136 @@ def get_anime_list(
 
     **Errors:**
 
+    - **304**: Not Modified - The catalog has not changed since the `ETag` sent in `If-None-Match`.
+    - **400**: Cursor inválido - If `cursor` is malformed.
     - **422**: Validation error if `page` or `size` are out of the allowed range.
 
     - **500**: Internal server error if there is a problem retrieving data from the database.
 
     """
 
-    skip = (page - 1) * size
-
-    animes = db.query(anime.AnimeDB).offset(skip).limit(size).all()
+    after = decode_cursor(cursor) if cursor is not None else None
+
+    # Sin snapshot, la versión se lee de la misma base que la página
+    snapshot = catalog.loaded
+    version = catalog.version if snapshot else await db.run_sync(get_catalog_version)
+    headers = cache_headers(f'W/"catalog-{version}"', CATALOG_CACHE_CONTROL)
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    if snapshot:
+        animes = catalog.page(size, (page - 1) * size, after)
+    else:
+        animes = await db.run_sync(list_animes, size, (page - 1) * size, after)
+    set_next_cursor(response, animes[-1].id if animes else None, size, len(animes))
+    if settings.FAST_JSON_RESPONSES:
+        return rows_response(response, animes, ("id", "title"))
     return animes
+
+
+@router.get("/api/anime/search", response_model=List[AnimeSearchResult])
+async def search_anime_titles(
+    response: Response,
+    db=Depends(database.get_read_session),
+    q: str = Query(
+        ..., min_length=1, max_length=100, description="Text to look for in the titles"
+    ),
+    limit: int = Query(
+        10, ge=1, le=50, description="Number of results (between 1 and 50)"
+    ),
+):
+    """
+    Search animes by title, tolerating typos and partial input.
+
+    Titles are compared word by word ignoring case, accents and punctuation, and a
+    word with a typo or two still matches, so `re zero`, `rezero` or `Re:Zer` all find
+    "Re:Zero - Starting Life in Another World". The last word of `q` is treated as a
+    prefix unless `q` ends with a space, which makes the endpoint usable for
+    autocomplete.
+
+    - **q**: Text to search for, between 1 and 100 characters.
+    - **limit**: Number of results to return, between 1 and 50. Default is 10.
+
+    `score` is the fraction of the words of `q` found in the title (1 means all of them,
+    a word with typos counts less); results are ordered by `score` and, on ties,
+    shorter titles come first.
+    Catalog changes show up within a few seconds.
+
+    **Example request:**
+
+    ```
+    GET /api/anime/search?q=re%20zer&limit=2
+    ```
+
+    **Example response:**
+
+    ```json
+    [
+        {"anime_id": 12, "title": "Re:Zero - Starting Life in Another World", "score": 1.0},
+        {"anime_id": 40, "title": "Re:Zero - Memory Snow", "score": 1.0}
+    ]
+    ```
+
+    **Errors:**
+
+    - **422**: Validation error if `q` is empty or too long, or `limit` is out of range.
+    - **503**: Búsqueda no disponible - If the search index is disabled or not loaded yet.
+    """
+    results = await db.run_sync(search_animes, q, limit)
+    response.headers["Cache-Control"] = (
+        f"public, max-age={int(settings.SEARCH_REFRESH_SECONDS)}"
+    )
+    return results
+
+
+@router.get("/api/anime/top", response_model=List[AnimeTop])
+async def get_top_animes(
+    response: Response,
+    by: str = Query(
+        "favorites", description="Ranking criterion: `favorites`, `viendo` or `visto`"
+    ),
+    limit: int = Query(
+        10, ge=1, le=100, description="Number of animes to return (between 1 and 100)"
+    ),
+):
+    """
+    Retrieve the most popular animes.
+
+    - **by**: `favorites` ranks by how many users have the anime in their favorites;
+      `viendo` and `visto` rank by how many users have it in their history with that status.
+    - **limit**: Number of animes to return, between 1 and 100. Default is 10.
+
+    Counts are maintained by the favorites and history endpoints and the ranking is
+    refreshed every few seconds, so a change can take a moment to show up here.
+
+    **Example request:**
+
+    ```
+    GET /api/anime/top?by=viendo&limit=2
+    ```
+
+    **Example response:**
+
+    ```json
+    [
+        {"anime_id": 1, "title": "Naruto", "count": 1520},
+        {"anime_id": 2, "title": "One Piece", "count": 1311}
+    ]
+    ```
+
+    **Errors:**
+
+    - **400**: Criterio inválido - If `by` is not one of the accepted values.
+    - **503**: Ranking no disponible - If the ranking has not been loaded yet.
+    """
+    if by not in TOP_METRICS:
+        raise HTTPException(status_code=400, detail="Criterio inválido")
+    if not top_animes.loaded:
+        raise HTTPException(status_code=503, detail="Ranking no disponible")
+    response.headers["Cache-Control"] = (
+        f"public, max-age={int(settings.ANIME_TOP_REFRESH_SECONDS)}"
+    )
+    entries = top_animes.top(by, limit)
+    if settings.FAST_JSON_RESPONSES:
+        return rows_response(response, entries, ("anime_id", "title", "count"))
+    return entries
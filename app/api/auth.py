@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from ..models.database import get_db
-from ..models.user import UserDB
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from ..models.database import get_session, pin_to_primary
 from datetime import timedelta
-from sqlalchemy.orm import Session
 
-from ..schemas.user import UserCreate, Token, User, LoginRequest
+from ..schemas.user import UserCreate, Token, User, LoginRequest, Principal
 from ..services.auth import (
     authenticate_user,
     create_access_token,
+    get_current_user,
     get_user,
     get_password_hash,
+    hashing_pool,
+    oauth2_scheme,
+    principal_cache,
+    token_claims,
 )
+from ..services.revocation import revoke_token, revoke_user_tokens
+from ..services.user import create_user
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
@@ -18,7 +23,7 @@ router = APIRouter()
 
 
 @router.post("/api/auth/register", response_model=User)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(request: Request, user: UserCreate, db=Depends(get_session)):
     """
     Register a new user.
 
@@ -49,21 +54,20 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
     - **400**: The email is already registered.
     - **422**: Invalid input data (e.g., invalid email format).
+    - **503**: Servidor ocupado - The password hashing queue is full; retry after `Retry-After` seconds.
 
     """
-    existing_user = get_user(db, email=user.email)
+    existing_user = await db.run_sync(get_user, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="El email ya está registrado")
-    hashed_password = get_password_hash(user.password)
-    db_user = UserDB(email=user.email, hashed_password=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    hashed_password = await hashing_pool.run(get_password_hash, user.password)
+    created = await db.run_sync(create_user, user.email, hashed_password)
+    pin_to_primary(request, created.id)
+    return created
 
 
 @router.post("/api/auth/login", response_model=Token)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, db=Depends(get_session)):
     """
     Log in a user.
 
@@ -94,6 +98,7 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
 
     - **401**: Email or password is incorrect.
     - **422**: Invalid input data (e.g., missing email or password).
+    - **503**: Servidor ocupado - The password hashing queue is full; retry after `Retry-After` seconds.
 
     The access token is a JWT token that must be used in the `Authorization` header
     for authenticated requests, like this:
@@ -102,7 +107,7 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     Authorization: Bearer <access_token>
     ```
     """
-    user = authenticate_user(db, login_data.email, login_data.password)
+    user = await authenticate_user(db, login_data.email, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -111,6 +116,67 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/api/auth/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: Principal = Depends(get_current_user),
+    db=Depends(get_session),
+):
+    """
+    Revoke the access token used in this request.
+
+    The token stops working at once in the worker that handles the request and within
+    `AUTH_DENYLIST_REFRESH_SECONDS` in the others. Other tokens of the user are not affected.
+
+    **Example response:**
+
+    ```json
+    {
+        "message": "Sesión cerrada"
+    }
+    ```
+
+    **Errors:**
+
+    - **400**: El token no se puede revocar - If the token was issued before revocation was supported.
+    - **401**: Unauthorized - If the user is not authenticated.
+    """
+    if current_user.token_id is None:
+        raise HTTPException(status_code=400, detail="El token no se puede revocar")
+    await db.run_sync(revoke_token, current_user.token_id, current_user.token_expires_at)
+    principal_cache.discard(token)
+    return {"message": "Sesión cerrada"}
+
+
+@router.post("/api/auth/logout-all")
+async def logout_everywhere(
+    current_user: Principal = Depends(get_current_user),
+    db=Depends(get_session),
+):
+    """
+    Revoke every access token issued to the user so far, on every device.
+
+    Tokens obtained from `/api/auth/login` afterwards work normally.
+
+    **Example response:**
+
+    ```json
+    {
+        "message": "Sesiones cerradas en todos los dispositivos"
+    }
+    ```
+
+    **Errors:**
+
+    - **401**: Unauthorized - If the user is not authenticated.
+    """
+    await db.run_sync(
+        revoke_user_tokens, current_user.id, ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+    principal_cache.invalidate_user(current_user.id)
+    return {"message": "Sesiones cerradas en todos los dispositivos"}
@@ -1,25 +1,41 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
-
-from sqlalchemy.orm import Session
-
-
-from ..models.anime import AnimeDB
-from ..models.database import get_db
-from ..models.user import UserDB
-from ..schemas.anime import Anime
-from ..schemas.favorite import AnimeFavoriteRequest, AnimeFavoriteResponse
-from ..services.auth import get_current_user
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
+
+
+from ..models.database import get_session, settings
+from ..schemas.favorite import (
+    AnimeFavoriteBatchRequest,
+    AnimeFavoriteBatchResult,
+    AnimeFavoriteRequest,
+    AnimeFavoriteResponse,
+)
+from ..schemas.user import User
+from ..services.auth import get_current_user, get_user_read_session
+from ..services.favorites import (
+    add_favorite,
+    batch_update_favorites,
+    list_favorites,
+    remove_favorite,
+)
+from ..services.http_cache import (
+    USER_CACHE_CONTROL,
+    cache_headers,
+    etag_matches,
+    not_modified,
+)
+from ..services.pagination import decode_cursor, set_next_cursor
+from ..services.serialization import rows_response
+from ..services.user import get_library_versions
 
 
 router = APIRouter()
 
 
 @router.post("/api/user/favorites")
-def add_to_favorites(
+async def add_to_favorites(
     request: AnimeFavoriteRequest,
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_session),
 ):
     """
     Add an anime to the user's list of favorites.
@@ -52,25 +68,23 @@ def add_to_favorites(
     - **400**: El anime ya está en favoritos - If the anime is already in the user's favorites.
     - **401**: Unauthorized - If the user is not authenticated.
     """
-    anime = db.query(AnimeDB).filter(AnimeDB.id == request.anime_id).first()
-    if not anime:
-        raise HTTPException(status_code=404, detail="Anime no encontrado")
-    if anime in current_user.favorites:
-        raise HTTPException(status_code=400, detail="El anime ya está en favoritos")
-    current_user.favorites.append(anime)
-    db.add(current_user)
-    db.commit()
+    await db.run_sync(add_favorite, current_user.id, request.anime_id)
     return {"message": "Anime agregado a favoritos"}
 
 
 @router.get("/api/user/favorites", response_model=List[AnimeFavoriteResponse])
-def get_user_favorites(
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+async def get_user_favorites(
+    request: Request,
+    response: Response,
+    db=Depends(get_user_read_session),
+    current_user: User = Depends(get_current_user),
     page: int = Query(1, ge=1, description="Page number (starting from 1)"),
     size: int = Query(
         10, ge=1, le=100, description="Number of items per page (between 1 and 100)"
     ),
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from `X-Next-Cursor`; overrides `page`"
+    ),
 ):
     """
     Retrieve a paginated list of animes in the user's favorites.
@@ -81,11 +95,21 @@ def get_user_favorites(
 
     - **page**: The page number to retrieve, starting from 1. Default is 1.
     - **size**: The number of items to return per page, between 1 and 100. Default is 10.
+    - **cursor**: Opaque cursor returned in the `X-Next-Cursor` header of the previous page.
+      When present, `page` is ignored.
+
+    Favorites are ordered by `anime_id`. When the page is full, the response includes an
+    `X-Next-Cursor` header that can be passed as `cursor` to fetch the next page.
+
+    Responses carry an `ETag` that changes whenever this list or the catalog (a title) is
+    modified. Send it back in `If-None-Match` to get a `304 Not Modified` with no body while
+    nothing has changed.
 
     **Example request:**
 
     ```
     GET /api/user/favorites?page=2&size=5
+    GET /api/user/favorites?size=5&cursor=Mg
     ```
 
     **Example response:**
@@ -105,33 +129,43 @@ def get_user_favorites(
 
     **Errors:**
 
+    - **304**: Not Modified - The list and the catalog have not changed since the `ETag` sent in `If-None-Match`.
+    - **400**: Cursor inválido - If `cursor` is malformed.
     - **401**: Unauthorized - If the user is not authenticated.
     - **500**: Internal server error if there is an issue retrieving data from the database.
     """
-    skip = (page - 1) * size
-
-    favorites = (
-        db.query(AnimeDB)
-        .join(UserDB.favorites)
-        .filter(UserDB.id == current_user.id)
-        .offset(skip)
-        .limit(size)
-        .all()
+    after = decode_cursor(cursor) if cursor is not None else None
+
+    versions = await db.run_sync(get_library_versions, current_user.id)
+    headers = cache_headers(
+        f'W/"favorites-{current_user.id}-{versions.favorites_version}-{versions.catalog_version}"',
+        USER_CACHE_CONTROL,
+        vary="Authorization",
     )
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
 
-    response = [
+    favorites = await db.run_sync(
+        list_favorites, current_user.id, size, (page - 1) * size, after
+    )
+    set_next_cursor(
+        response, favorites[-1].id if favorites else None, size, len(favorites)
+    )
+
+    if settings.FAST_JSON_RESPONSES:
+        return rows_response(response, favorites, ("anime_id", "title"))
+    return [
         AnimeFavoriteResponse(anime_id=anime.id, title=anime.title)
         for anime in favorites
     ]
 
-    return response
-
 
 @router.delete("/api/user/favorites")
-def remove_from_favorites(
+async def remove_from_favorites(
     request: AnimeFavoriteRequest,
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_session),
 ):
     """
     Remove an anime from the user's list of favorites.
@@ -164,12 +198,59 @@ def remove_from_favorites(
     - **400**: El anime no está en favoritos - If the anime is not in the user's favorites.
     - **401**: Unauthorized - If the user is not authenticated.
     """
-    anime = db.query(AnimeDB).filter(AnimeDB.id == request.anime_id).first()
-    if not anime:
-        raise HTTPException(status_code=404, detail="Anime no encontrado")
-    if anime not in current_user.favorites:
-        raise HTTPException(status_code=400, detail="El anime no está en favoritos")
-    current_user.favorites.remove(anime)
-    db.add(current_user)
-    db.commit()
+    await db.run_sync(remove_favorite, current_user.id, request.anime_id)
     return {"message": "Anime removido de favoritos"}
+
+
+
+@router.post(
+    "/api/user/favorites/batch", response_model=List[AnimeFavoriteBatchResult]
+)
+async def batch_update_user_favorites(
+    request: AnimeFavoriteBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_session),
+):
+    """
+    Add and/or remove several animes from the user's favorites in a single request.
+
+    All ids are validated with one query and the changes are applied in a single
+    transaction. Duplicated ids are ignored. Each id gets its own result, so a batch
+    with some unknown ids still applies the valid ones.
+
+    **Request body:**
+
+    - **add**: IDs of the animes to add to favorites (up to 1000).
+    - **remove**: IDs of the animes to remove from favorites (up to 1000).
+
+    **Example request:**
+
+    ```json
+    {
+        "add": [1, 2, 999],
+        "remove": [4]
+    }
+    ```
+
+    **Example response:**
+
+    ```json
+    [
+        {"anime_id": 1, "action": "add", "result": "added"},
+        {"anime_id": 2, "action": "add", "result": "already_favorite"},
+        {"anime_id": 999, "action": "add", "result": "not_found"},
+        {"anime_id": 4, "action": "remove", "result": "removed"}
+    ]
+    ```
+
+    Possible results are `added`, `already_favorite`, `removed`, `not_favorite` and `not_found`.
+
+    **Errors:**
+
+    - **400**: Un anime no puede agregarse y removerse a la vez - If an id appears in both lists.
+    - **401**: Unauthorized - If the user is not authenticated.
+    - **422**: Invalid input data (e.g., more than 1000 ids in a list).
+    """
+    return await db.run_sync(
+        batch_update_favorites, current_user.id, request.add, request.remove
+    )
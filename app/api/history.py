@@ -1,25 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
-from typing import List
+from typing import List, Optional
 
-from ..models.anime import AnimeDB
-from ..models.database import get_db
-from ..models.history import UserHistory
-from ..models.user import UserDB
+from ..models.database import get_session, settings
+from ..models.history import HISTORY_STATUSES
 from ..schemas.favorite import AnimeFavoriteRequest
 from ..schemas.history import AnimeHistoryRequest, AnimeHistoryResponse
-from ..services.auth import get_current_user
-
-from sqlalchemy.orm import Session
+from ..schemas.user import User
+from ..services.auth import get_current_user, get_user_read_session
+from ..services.history import (
+    HISTORY_ORDERS,
+    list_history,
+    remove_history,
+    upsert_history,
+)
+from ..services.history_buffer import history_buffer
+from ..services.http_cache import (
+    USER_CACHE_CONTROL,
+    cache_headers,
+    etag_matches,
+    not_modified,
+)
+from ..services.pagination import (
+    TOTAL_COUNT_HEADER,
+    decode_cursor,
+    decode_timestamp_cursor,
+    encode_cursor,
+    encode_timestamp_cursor,
+    set_next_cursor,
+)
+from ..services.popularity import STATUS_COUNTERS
+from ..services.serialization import rows_response
+from ..services.user import get_library_versions
 
 router = APIRouter()
 
 
 @router.post("/api/user/history")
-def add_to_history(
+async def add_to_history(
     request: AnimeHistoryRequest,
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_session),
 ):
     """
     Add or update an anime in the user's viewing history.
@@ -54,37 +75,36 @@ def add_to_history(
     - **404**: Anime no encontrado - If the anime with the provided ID does not exist.
     - **401**: Unauthorized - If the user is not authenticated.
     """
-    if request.status not in ["viendo", "visto"]:
+    if request.status not in HISTORY_STATUSES:
         raise HTTPException(status_code=400, detail="Estado inválido")
-    anime = db.query(AnimeDB).filter(AnimeDB.id == request.anime_id).first()
-    if not anime:
-        raise HTTPException(status_code=404, detail="Anime no encontrado")
-    existing_history = (
-        db.query(UserHistory)
-        .filter(
-            UserHistory.user_id == current_user.id, UserHistory.anime_id == anime.id
-        )
-        .first()
-    )
-    if existing_history:
-        existing_history.status = request.status
+    if history_buffer is not None:
+        await history_buffer.add(db, current_user.id, request.anime_id, request.status)
     else:
-        new_history = UserHistory(
-            user_id=current_user.id, anime_id=anime.id, status=request.status
+        await db.run_sync(
+            upsert_history, current_user.id, request.anime_id, request.status
         )
-        db.add(new_history)
-    db.commit()
     return {"message": "Anime agregado/actualizado en el historial"}
 
 
 @router.get("/api/user/history", response_model=List[AnimeHistoryResponse])
-def get_user_history(
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user),
+async def get_user_history(
+    request: Request,
+    response: Response,
+    db=Depends(get_user_read_session),
+    current_user: User = Depends(get_current_user),
     page: int = Query(1, ge=1, description="Page number (starting from 1)"),
     size: int = Query(
         10, ge=1, le=100, description="Number of items per page (between 1 and 100)"
     ),
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from `X-Next-Cursor`; overrides `page`"
+    ),
+    status: Optional[str] = Query(
+        None, description="Only entries with this status: `viendo` or `visto`"
+    ),
+    order: str = Query(
+        "added", description="`added` (oldest first) or `updated` (last updated first)"
+    ),
 ):
     """
     Retrieve a paginated list of animes in the user's viewing history.
@@ -95,11 +115,26 @@ def get_user_history(
 
     - **page**: The page number to retrieve, starting from 1. Default is 1.
     - **size**: The number of items to return per page, between 1 and 100. Default is 10.
+    - **cursor**: Opaque cursor returned in the `X-Next-Cursor` header of the previous page.
+      When present, `page` is ignored.
+    - **status**: Only return entries with this status, `viendo` or `visto`. Default is all.
+    - **order**: `added` orders by insertion, oldest first (default); `updated` orders by the
+      last time each entry was written, most recent first.
+
+    When the page is full, the response includes an `X-Next-Cursor` header that can be passed
+    as `cursor`, with the same `status` and `order`, to fetch the next page. `X-Total-Count`
+    holds how many entries match `status`, read from per-user counters rather than counted.
+
+    Responses carry an `ETag` that changes whenever this list or the catalog (a title) is
+    modified. Send it back in `If-None-Match` to get a `304 Not Modified` with no body while
+    nothing has changed.
 
     **Example request:**
 
     ```
     GET /api/user/history?page=2&size=5
+    GET /api/user/history?size=5&cursor=MTI
+    GET /api/user/history?status=viendo&order=updated
     ```
 
     **Example response:**
@@ -121,34 +156,70 @@ def get_user_history(
 
     **Errors:**
 
+    - **304**: Not Modified - The list and the catalog have not changed since the `ETag` sent in `If-None-Match`.
+    - **400**: Cursor inválido - If `cursor` is malformed.
+    - **400**: Estado inválido - If `status` is not "viendo" or "visto".
+    - **400**: Orden inválido - If `order` is not "added" or "updated".
     - **401**: Unauthorized - If the user is not authenticated.
     - **500**: Internal server error if there is an issue retrieving data from the database.
     """
-    skip = (page - 1) * size
-
-    history_items = (
-        db.query(UserHistory)
-        .filter(UserHistory.user_id == current_user.id)
-        .offset(skip)
-        .limit(size)
-        .all()
+    if status is not None and status not in HISTORY_STATUSES:
+        raise HTTPException(status_code=400, detail="Estado inválido")
+    if order not in HISTORY_ORDERS:
+        raise HTTPException(status_code=400, detail="Orden inválido")
+    by_update = order == "updated"
+    after = None
+    if cursor is not None:
+        after = decode_timestamp_cursor(cursor) if by_update else decode_cursor(cursor)
+
+    if history_buffer is not None:
+        await history_buffer.flush_before_read(current_user.id)
+
+    versions = await db.run_sync(get_library_versions, current_user.id)
+    headers = cache_headers(
+        f'W/"history-{current_user.id}-{versions.history_version}-{versions.catalog_version}"',
+        USER_CACHE_CONTROL,
+        vary="Authorization",
+    )
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    counts = {
+        entry_status: getattr(versions, name)
+        for entry_status, name in STATUS_COUNTERS.items()
+    }
+    response.headers[TOTAL_COUNT_HEADER] = str(
+        counts[status] if status is not None else sum(counts.values())
     )
 
-    response = [
-        AnimeHistoryResponse(
-            anime_id=item.anime_id, title=item.anime.title, status=item.status
-        )
-        for item in history_items
-    ]
+    history_items = await db.run_sync(
+        list_history, current_user.id, size, (page - 1) * size, after, status, order
+    )
+    last_key = None
+    if history_items:
+        last = history_items[-1]
+        last_key = (last.updated_at, last.id) if by_update else last.id
+    set_next_cursor(
+        response,
+        last_key,
+        size,
+        len(history_items),
+        encode_timestamp_cursor if by_update else encode_cursor,
+    )
 
-    return response
+    if settings.FAST_JSON_RESPONSES:
+        return rows_response(response, history_items, ("anime_id", "title", "status"))
+    return [
+        AnimeHistoryResponse(anime_id=anime_id, title=title, status=status)
+        for anime_id, title, status, _, _ in history_items
+    ]
 
 
 @router.delete("/api/user/history")
-def remove_from_history(
+async def remove_from_history(
     request: AnimeFavoriteRequest,
-    current_user: UserDB = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_session),
 ):
     """
     Remove an anime from the user's viewing history.
@@ -180,18 +251,8 @@ def remove_from_history(
     - **404**: Anime no encontrado en el historial - If the anime with the provided ID is not in the user's history.
     - **401**: Unauthorized - If the user is not authenticated.
     """
-    history_item = (
-        db.query(UserHistory)
-        .filter(
-            UserHistory.user_id == current_user.id,
-            UserHistory.anime_id == request.anime_id,
-        )
-        .first()
-    )
-    if not history_item:
-        raise HTTPException(
-            status_code=404, detail="Anime no encontrado en el historial"
-        )
-    db.delete(history_item)
-    db.commit()
+    if history_buffer is not None:
+        await history_buffer.remove(db, current_user.id, request.anime_id)
+    else:
+        await db.run_sync(remove_history, current_user.id, request.anime_id)
     return {"message": "Anime removido del historial"}
@@ -0,0 +1,145 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from ..models.database import engine, pool_stats, replica_router, settings
+from ..services.auth import hashing_pool, principal_cache, require_internal_token
+from ..services.catalog import catalog
+from ..services.cooccurrence import recommendations
+from ..services.history_buffer import history_buffer
+from ..services.metrics import render_metrics
+from ..services.popularity import top_animes
+from ..services.revocation import revocations
+from ..services.title_search import title_search
+
+router = APIRouter()
+# Todo lo que no es /ready ni /metrics exige INTERNAL_TOKEN
+protected = APIRouter(dependencies=[Depends(require_internal_token)])
+
+
+def _ping():
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+@router.get("/ready", include_in_schema=False)
+async def ready(request: Request):
+    """
+    Readiness probe: 200 once the lifespan warmup (connection pool, catalog
+    snapshot) has finished and the database answers, 503 otherwise. The body
+    reports how long startup and warmup took and whether the recommendations
+    index, built in the background, is loaded yet.
+    """
+    startup = getattr(request.app.state, "startup", {})
+    if not getattr(request.app.state, "ready", False):
+        return Response(status_code=503)
+    try:
+        await run_in_threadpool(_ping)
+    except Exception:
+        return Response(status_code=503)
+    return {"ready": True, **startup, "recommendations_loaded": recommendations.loaded}
+
+
+@protected.get("/internal/auth/principal-cache", include_in_schema=False)
+def get_principal_cache_stats():
+    """
+    Hit/miss counters of the `get_current_user` principal cache for this worker.
+    Used to size `PRINCIPAL_CACHE_SIZE` and `PRINCIPAL_CACHE_TTL_SECONDS`.
+    """
+    return principal_cache.stats()
+
+
+@protected.get("/internal/auth/revocations", include_in_schema=False)
+def get_revocation_stats():
+    """
+    Size of this worker's revoked-token Bloom filter and how often it let a check
+    skip the database (`checks - maybe_revoked`).
+    """
+    return revocations.stats()
+
+
+@protected.get("/internal/auth/hashing", include_in_schema=False)
+def get_hashing_pool_stats():
+    """
+    Load of the bcrypt worker pool for this worker: in-flight and queued hashes,
+    rejections and time spent waiting for a free thread.
+    """
+    return hashing_pool.stats()
+
+
+@protected.get("/internal/catalog", include_in_schema=False)
+def get_catalog_stats():
+    """
+    Size, version and memory footprint of the in-memory catalog snapshot.
+    """
+    return catalog.stats()
+
+
+@protected.get("/internal/search", include_in_schema=False)
+def get_search_stats():
+    """
+    Size, memory footprint and pending incremental changes of the title index
+    behind `/api/anime/search`.
+    """
+    return title_search.stats()
+
+
+@protected.get("/internal/history/buffer", include_in_schema=False)
+def get_history_buffer_stats():
+    """
+    Pending, coalesced and flushed history updates of the write-behind buffer
+    for this worker (`HISTORY_WRITE_BEHIND`).
+    """
+    if history_buffer is None:
+        return {"enabled": False}
+    return {"enabled": True, **history_buffer.stats()}
+
+
+@protected.get("/internal/anime/top", include_in_schema=False)
+def get_top_stats():
+    """
+    Entries per criterion and last refresh of the in-memory `/api/anime/top` ranking.
+    """
+    return top_animes.stats()
+
+
+@protected.get("/internal/recommendations", include_in_schema=False)
+def get_recommendations_stats():
+    """
+    Size, memory footprint and pending incremental changes of the co-occurrence
+    index behind `/api/anime/{id}/similar` and `/api/user/recommendations`.
+    """
+    return recommendations.stats()
+
+
+@protected.get("/internal/db/pool", include_in_schema=False)
+def get_pool_stats():
+    """
+    Connection pool gauges and checkout wait times for this worker, per engine.
+    Used to tune `DB_POOL_SIZE`/`DB_MAX_OVERFLOW` for a given number of workers.
+    """
+    return {name: stats.stats() for name, stats in pool_stats.items()}
+
+
+@protected.get("/internal/db/replicas", include_in_schema=False)
+def get_replica_stats():
+    """
+    Read routing for this worker: reads served by replicas, by the primary and
+    by the primary because the user wrote recently (read-your-writes pins).
+    """
+    return replica_router.stats()
+
+
+# Abierta para el scrape estándar de Prometheus; solo depende de METRICS_ENABLED
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Per-route latency histograms and request counts in Prometheus text format.
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
+
+
+router.include_router(protected)
@@ -0,0 +1,106 @@
+from typing import Optional
+
+import orjson
+from fastapi import APIRouter, Depends, Query, Request, Response
+
+from ..models.database import settings
+from ..schemas.library import UserLibrary
+from ..schemas.user import User
+from ..services.auth import get_current_user, get_user_read_session
+from ..services.history_buffer import history_buffer
+from ..services.http_cache import (
+    USER_CACHE_CONTROL,
+    cache_headers,
+    etag_matches,
+    not_modified,
+)
+from ..services.library import get_library, parse_fields
+
+router = APIRouter()
+
+
+@router.get(
+    "/api/user/library", response_model=UserLibrary, response_model_exclude_none=True
+)
+async def get_user_library(
+    request: Request,
+    response: Response,
+    db=Depends(get_user_read_session),
+    current_user: User = Depends(get_current_user),
+    size: int = Query(
+        10, ge=1, le=100, description="Number of items per list (between 1 and 100)"
+    ),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated subset of `favorites`, `history`, `counts`"
+    ),
+):
+    """
+    Retrieve the user's home screen data in one request.
+
+    Returns the first page of favorites (ordered by `anime_id`), the first page of the
+    viewing history (in insertion order) and the counts of favorites and of history
+    entries per status. Everything is read with a single SQL statement.
+
+    **Query Parameters:**
+
+    - **size**: The number of items in each list, between 1 and 100. Default is 10.
+    - **fields**: Comma-separated parts to return: `favorites`, `history`, `counts`.
+      Default is all of them; parts not requested are left out of the response.
+
+    The next pages are fetched from `/api/user/favorites` and `/api/user/history`.
+    Responses carry an `ETag` that changes whenever favorites, history or the catalog (a
+    title) are modified.
+    Send it back in `If-None-Match` to get a `304 Not Modified` with no body.
+
+    **Example request:**
+
+    ```
+    GET /api/user/library?size=5&fields=history,counts
+    ```
+
+    **Example response:**
+
+    ```json
+    {
+        "history": [
+            {
+                "anime_id": 2,
+                "title": "One Piece",
+                "status": "viendo"
+            }
+        ],
+        "counts": {
+            "favorites": 3,
+            "history": 1,
+            "viendo": 1,
+            "visto": 0
+        }
+    }
+    ```
+
+    **Errors:**
+
+    - **304**: Not Modified - Favorites, history and the catalog have not changed since the `ETag` sent in `If-None-Match`.
+    - **400**: Campo inválido - If `fields` names an unknown part.
+    - **401**: Unauthorized - If the user is not authenticated.
+    """
+    wanted = parse_fields(fields)
+
+    if history_buffer is not None:
+        await history_buffer.flush_before_read(current_user.id)
+
+    (favorites_version, history_version, catalog_version), library = await db.run_sync(
+        get_library, current_user.id, size, wanted
+    )
+    headers = cache_headers(
+        f'W/"library-{current_user.id}-{favorites_version}-{history_version}-{catalog_version}"',
+        USER_CACHE_CONTROL,
+        vary="Authorization",
+    )
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+
+    if settings.FAST_JSON_RESPONSES:
+        return Response(orjson.dumps(library), media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return library
@@ -0,0 +1,82 @@
+from typing import List
+from fastapi import APIRouter, Depends, Query
+
+from ..models.database import get_read_session
+from ..schemas.recommendation import AnimeRecommendation
+from ..schemas.user import User
+from ..services.auth import get_current_user, get_user_read_session
+from ..services.recommendations import recommended_animes, similar_animes
+
+router = APIRouter()
+
+
+@router.get("/api/anime/{anime_id}/similar", response_model=List[AnimeRecommendation])
+async def get_similar_animes(
+    anime_id: int,
+    db=Depends(get_read_session),
+    limit: int = Query(10, ge=1, le=50, description="Number of results (between 1 and 50)"),
+):
+    """
+    Retrieve the animes most often favorited together with the given one
+    ("users who favorited this also favorited").
+
+    Results come from an in-memory co-occurrence index, ordered by cosine similarity
+    (`score`) between the sets of users that favorited each anime.
+
+    **Example request:**
+
+    ```
+    GET /api/anime/1/similar?limit=2
+    ```
+
+    **Example response:**
+
+    ```json
+    [
+        {"anime_id": 20, "title": "Naruto", "score": 0.42},
+        {"anime_id": 21, "title": "One Piece", "score": 0.31}
+    ]
+    ```
+
+    **Errors:**
+
+    - **404**: Anime no encontrado - If the anime with the provided ID does not exist.
+    - **503**: Recomendaciones no disponibles - If the recommendations index is disabled or still being built.
+    """
+    return await db.run_sync(similar_animes, anime_id, limit)
+
+
+@router.get("/api/user/recommendations", response_model=List[AnimeRecommendation])
+async def get_user_recommendations(
+    db=Depends(get_user_read_session),
+    current_user: User = Depends(get_current_user),
+    limit: int = Query(10, ge=1, le=50, description="Number of results (between 1 and 50)"),
+):
+    """
+    Retrieve anime recommendations for the authenticated user based on their favorites.
+
+    Each candidate is scored with the sum of its similarities to every anime in the
+    user's favorites; animes already in the favorites are left out. A user without
+    favorites gets an empty list.
+
+    **Example request:**
+
+    ```
+    GET /api/user/recommendations?limit=2
+    ```
+
+    **Example response:**
+
+    ```json
+    [
+        {"anime_id": 7, "title": "Death Note", "score": 1.87},
+        {"anime_id": 3, "title": "Attack on Titan", "score": 1.12}
+    ]
+    ```
+
+    **Errors:**
+
+    - **401**: Unauthorized - If the user is not authenticated.
+    - **503**: Recomendaciones no disponibles - If the recommendations index is disabled or still being built.
+    """
+    return await db.run_sync(recommended_animes, current_user.id, limit)
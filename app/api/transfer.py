@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from ..models.database import (
+    SessionLocal,
+    client_pin,
+    get_session,
+    replica_router,
+    settings,
+)
+from ..schemas.transfer import LibraryImportReport
+from ..schemas.user import User
+from ..services.auth import get_current_user
+from ..services.history_buffer import history_buffer
+from ..services.transfer import export_library, import_library
+
+router = APIRouter()
+
+
+@router.get("/api/user/export")
+async def export_user_library(
+    request: Request, current_user: User = Depends(get_current_user)
+):
+    """
+    Download the user's favorites and viewing history as NDJSON.
+
+    One JSON object per line: first every favorite, ordered by `anime_id`, then every
+    history entry, in insertion order. The body is streamed as it is read from the
+    database, so large libraries download without being paged. The file can be sent
+    back as is to `POST /api/user/import`.
+
+    **Example request:**
+
+    ```
+    GET /api/user/export
+    ```
+
+    **Example response:**
+
+    ```
+    {"type":"favorite","anime_id":1,"title":"Naruto"}
+    {"type":"history","anime_id":2,"title":"One Piece","status":"viendo","updated_at":"2024-05-01T12:00:00+00:00"}
+    ```
+
+    **Errors:**
+
+    - **401**: Unauthorized - If the user is not authenticated.
+    """
+    if history_buffer is not None:
+        await history_buffer.flush_before_read(current_user.id)
+    replica = replica_router.choose(current_user.id, client_pin(request))
+    session_factory = replica[0] if replica is not None else SessionLocal
+    return StreamingResponse(
+        export_library(session_factory, current_user.id, settings.LIBRARY_EXPORT_YIELD_PER),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="biblioteca.ndjson"'},
+    )
+
+
+@router.post("/api/user/import", response_model=LibraryImportReport)
+async def import_user_library(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_session),
+):
+    """
+    Load favorites and viewing history from an NDJSON upload.
+
+    The request body uses the format of `GET /api/user/export` (`title` is optional and
+    ignored) and is processed while it is being received, in transactions of
+    `LIBRARY_IMPORT_BATCH_SIZE` entries. Favorites already present and animes that do
+    not exist are ignored; history entries are added or updated, the last line for an
+    anime winning. A history line keeps its `updated_at` if it has one (ISO 8601) and
+    is stamped when it is read otherwise. Invalid lines are skipped and reported with
+    their line number.
+
+    **Example request:**
+
+    ```
+    POST /api/user/import
+    Content-Type: application/x-ndjson
+
+    {"type":"favorite","anime_id":1}
+    {"type":"history","anime_id":2,"status":"visto"}
+    ```
+
+    **Example response:**
+
+    ```json
+    {
+        "lines": 2,
+        "favorites_added": 1,
+        "history_written": 1,
+        "ignored": 0,
+        "invalid": 0,
+        "errors": [],
+        "seconds": 0.012,
+        "rows_per_second": 166
+    }
+    ```
+
+    **Errors:**
+
+    - **400**: Línea demasiado larga - If a line exceeds 64 KiB. Batches written before it are kept.
+    - **401**: Unauthorized - If the user is not authenticated.
+    """
+    # Lo pendiente en el buffer es anterior a la importación: se escribe antes
+    if history_buffer is not None:
+        await history_buffer.flush_before_read(current_user.id)
+    return await import_library(
+        db, current_user.id, request.stream(), settings.LIBRARY_IMPORT_BATCH_SIZE
+    )
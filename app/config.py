@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Dict, List, Optional
+
 from pydantic_settings import BaseSettings # NEW
 
 
@@ -5,6 +8,84 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Token (Authorization: Bearer) para /internal/*; sin él esas rutas no existen
+    # (404). /ready queda abierta para los probes y /metrics para Prometheus
+    INTERNAL_TOKEN: Optional[str] = None
+    # Autenticación sin estado: el usuario sale de los claims del JWT (id, email y
+    # versión de token) sin consultar la tabla users
+    AUTH_STATELESS: bool = False
+    # Filtro de Bloom en memoria sobre los tokens revocados: entradas previstas,
+    # tasa de falsos positivos y cada cuánto se revisa la tabla token_denylist
+    AUTH_DENYLIST_CAPACITY: int = 100000
+    AUTH_DENYLIST_FALSE_POSITIVE_RATE: float = 0.001
+    AUTH_DENYLIST_REFRESH_SECONDS: float = 5.0
+    # Motor asíncrono (asyncpg, o aiosqlite con SQLite) en lugar del pool de hilos
+    DB_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Pool de conexiones (por worker)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Réplicas de lectura (lista JSON de URLs) y cuánto tiempo tras escribir se
+    # leen los datos del usuario desde el primario
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_STICKY_SECONDS: float = 5.0
+    # Caché de token -> usuario autenticado (0 la desactiva)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    # Pool dedicado para bcrypt: hilos y solicitudes en espera antes de responder 503
+    HASH_WORKERS: int = 4
+    HASH_QUEUE_DEPTH: int = 32
+    # Copia en memoria del catálogo (id, título) y cada cuánto se revisa su versión
+    CATALOG_SNAPSHOT_ENABLED: bool = True
+    CATALOG_REFRESH_SECONDS: float = 5.0
+    # Índice de títulos en memoria para /api/anime/search: activado, puntaje mínimo
+    # (fracción de palabras de la búsqueda presentes en el título) y cada cuánto
+    # se revisa la versión del catálogo para aplicar los cambios
+    SEARCH_INDEX_ENABLED: bool = True
+    SEARCH_MIN_SCORE: float = 0.3
+    SEARCH_REFRESH_SECONDS: float = 5.0
+    # Listas serializadas con orjson directamente desde las filas, sin modelos Pydantic
+    FAST_JSON_RESPONSES: bool = False
+    # Buffer write-behind para POST /api/user/history: agrupa por (usuario, anime)
+    # y escribe en lote al llegar a HISTORY_FLUSH_SIZE o cada HISTORY_FLUSH_SECONDS;
+    # una entrada que falla HISTORY_FLUSH_MAX_ATTEMPTS veces se descarta
+    HISTORY_WRITE_BEHIND: bool = False
+    HISTORY_FLUSH_SIZE: int = 500
+    HISTORY_FLUSH_SECONDS: float = 1.0
+    HISTORY_FLUSH_MAX_ATTEMPTS: int = 10
+    # Exportación/importación NDJSON de la biblioteca del usuario: filas leídas por
+    # vuelta del cursor del servidor y entradas escritas por transacción
+    LIBRARY_EXPORT_YIELD_PER: int = 1000
+    LIBRARY_IMPORT_BATCH_SIZE: int = 1000
+    # Top de animes por favoritos/estado en memoria: tamaño y cada cuánto se refresca
+    ANIME_TOP_SIZE: int = 100
+    ANIME_TOP_REFRESH_SECONDS: float = 10.0
+    # Índice de recomendaciones por co-ocurrencia de favoritos: vecinos guardados
+    # por anime, favoritos del usuario con los que se empareja cada cambio y cada
+    # cuánto se reconstruye desde la base de datos
+    RECOMMENDATIONS_ENABLED: bool = True
+    RECOMMENDATIONS_NEIGHBORS: int = 50
+    RECOMMENDATIONS_PAIR_SAMPLE: int = 200
+    RECOMMENDATIONS_REFRESH_SECONDS: float = 3600.0
+    # Latencia y conteo por ruta en /metrics (formato Prometheus); apagado, 404
+    METRICS_ENABLED: bool = True
+    # Perfilado de SQL por solicitud (Server-Timing y log de consultas lentas)
+    QUERY_PROFILER_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 100.0
+    # Presupuesto de consultas por endpoint, p. ej. {"GET /api/user/history": 3}.
+    # Con QUERY_BUDGET_ENFORCE (desarrollo/tests) la solicitud que lo supera falla.
+    QUERY_BUDGETS: Dict[str, int] = {}
+    QUERY_BUDGET_DEFAULT: int = 0
+    QUERY_BUDGET_ENFORCE: bool = False
 
     class Config:
         env_file = ".env"
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Settings are read from the environment once per process and shared."""
+    return Settings()
@@ -0,0 +1,224 @@
+"""
+Bulk load of the anime catalog from a CSV or NDJSON file:
+
+    python -m app.ingest catalog.csv
+    python -m app.ingest catalog.ndjson --format ndjson
+    zcat catalog.csv.gz | python -m app.ingest - --format csv
+
+Each record has a `title` and optionally an `id`. The file is streamed into a
+staging table (`COPY` on PostgreSQL, batched executemany elsewhere) and merged
+into `animes` in the same transaction: records with an `id` update that anime's
+title or create it, and records without one are added only when no anime has
+that title yet. Duplicated titles in the file are loaded once. Running the same
+file twice changes nothing. The catalog version is bumped, so the workers pick
+up the new titles on their next refresh.
+"""
+import argparse
+import csv
+import io
+import logging
+import sys
+import time
+
+import orjson
+from sqlalchemy import text
+
+from .models import anime, catalog, denylist, history, stats, user  # noqa: F401
+from .models.database import engine
+from .services.catalog import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Filas por COPY / executemany; acota la memoria usada al leer el archivo
+BATCH = 100_000
+STAGING = "anime_ingest"
+
+
+def read_csv(stream):
+    """Yields `(id, title)` from a CSV with a header row containing `title`."""
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None or "title" not in reader.fieldnames:
+        raise ValueError("El CSV debe tener una columna 'title'")
+    for row in reader:
+        anime_id = (row.get("id") or "").strip()
+        if anime_id and not anime_id.isdigit():
+            raise ValueError(f"Línea {reader.line_num}: id inválido")
+        yield (int(anime_id) if anime_id else None), row["title"]
+
+
+def read_ndjson(stream):
+    """Yields `(id, title)` from one JSON object per line."""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+            anime_id, title = record.get("id"), record["title"]
+        except (orjson.JSONDecodeError, AttributeError, KeyError):
+            raise ValueError(f"Línea {number}: se esperaba un objeto JSON con 'title'")
+        if anime_id is not None and type(anime_id) is not int:
+            raise ValueError(f"Línea {number}: id inválido")
+        yield anime_id, title
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def staged_rows(records, report):
+    """`(line, id, title)` rows for the staging table; empty titles are skipped."""
+    for line, (anime_id, title) in enumerate(records, 1):
+        report["read"] += 1
+        title = (title or "").strip()
+        if not title:
+            report["skipped"] += 1
+            continue
+        yield line, anime_id, title
+
+
+def copy_staging(connection, rows) -> int:
+    cursor = connection.connection.cursor()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {STAGING} (line, id, title) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % BATCH == 0:
+            flush()
+    flush()
+    return count
+
+
+def insert_staging(connection, rows) -> int:
+    statement = text(f"INSERT INTO {STAGING} (line, id, title) VALUES (:line, :id, :title)")
+    count = 0
+    batch = []
+    for line, anime_id, title in rows:
+        batch.append({"line": line, "id": anime_id, "title": title})
+        if len(batch) == BATCH:
+            connection.execute(statement, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        connection.execute(statement, batch)
+        count += len(batch)
+    return count
+
+
+def merge_staging(connection, postgres: bool):
+    """
+    Applies the staging table to `animes`. Returns how many animes were created or
+    renamed by id and how many were added by title.
+    """
+    # Con id: el último registro de cada id gana y solo se escribe si cambia el título
+    upserted = connection.execute(text(
+        f"""
+        INSERT INTO animes (id, title)
+        SELECT id, title FROM (
+            SELECT id, title,
+                   ROW_NUMBER() OVER (PARTITION BY id ORDER BY line DESC) AS position
+            FROM {STAGING} WHERE id IS NOT NULL
+        ) latest
+        WHERE position = 1
+        ON CONFLICT (id) DO UPDATE SET title = excluded.title
+        WHERE animes.title <> excluded.title
+        """
+    )).rowcount
+    if postgres:
+        # Los ids explícitos no avanzan la secuencia de animes.id
+        connection.execute(text(
+            "SELECT setval(pg_get_serial_sequence('animes', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM animes), 1))"
+        ))
+    # Sin id: un título nuevo se agrega una vez, en el orden del archivo
+    added = connection.execute(text(
+        f"""
+        INSERT INTO animes (title)
+        SELECT title FROM {STAGING} staged
+        WHERE id IS NULL
+          AND NOT EXISTS (SELECT 1 FROM animes WHERE animes.title = staged.title)
+        GROUP BY title
+        ORDER BY MIN(line)
+        """
+    )).rowcount
+    return upserted, added
+
+
+def ingest(records, connection) -> dict:
+    report = {"read": 0, "skipped": 0}
+    postgres = connection.dialect.name == "postgresql"
+    connection.execute(text(
+        f"CREATE TEMPORARY TABLE {STAGING} (line BIGINT, id INTEGER, title TEXT)"
+        + (" ON COMMIT DROP" if postgres else "")
+    ))
+    started = time.perf_counter()
+    rows = staged_rows(records, report)
+    report["staged"] = (
+        copy_staging(connection, rows) if postgres else insert_staging(connection, rows)
+    )
+    report["load_seconds"] = time.perf_counter() - started
+    connection.execute(text(f"CREATE INDEX ix_{STAGING}_title ON {STAGING} (title)"))
+
+    started = time.perf_counter()
+    upserted, added = merge_staging(connection, postgres)
+    report["merge_seconds"] = time.perf_counter() - started
+    if not postgres:
+        connection.execute(text(f"DROP TABLE {STAGING}"))
+    report["inserted"] = added
+    report["upserted"] = upserted
+    if upserted or added:
+        bump_catalog_version(connection)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga masiva del catálogo de animes")
+    parser.add_argument("path", help="Archivo CSV o NDJSON; '-' lee de la entrada estándar")
+    parser.add_argument("--format", choices=sorted(READERS))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    file_format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    stream = (
+        sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    )
+    started = time.perf_counter()
+    try:
+        with engine.begin() as connection:
+            report = ingest(READERS[file_format](stream), connection)
+    except ValueError as error:
+        logger.error("Archivo inválido: %s", error)
+        sys.exit(1)
+    finally:
+        stream.close()
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Leídos %d registros (%d sin título) y cargados %d en %.1f s (%.0f filas/s)",
+        report["read"],
+        report["skipped"],
+        report["staged"],
+        report["load_seconds"],
+        report["staged"] / report["load_seconds"] if report["load_seconds"] else 0,
+    )
+    logger.info(
+        "Catálogo: %d animes nuevos por título, %d creados o renombrados por id "
+        "en %.1f s; total %.1f s (%.0f filas/s)",
+        report["inserted"],
+        report["upserted"],
+        report["merge_seconds"],
+        elapsed,
+        report["read"] / elapsed if elapsed else 0,
+    )
+
+
+if __name__ == "__main__":
+    main()
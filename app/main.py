@@ -1,9 +1,103 @@
-from fastapi import FastAPI
-from .api import auth, anime, favorites, history
-from .models.database import Base, engine
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+IMPORTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse
+from .api import auth, anime, favorites, history, internal, library, recommendations, transfer
+from .models.database import (
+    async_engine,
+    engine,
+    replica_async_engines,
+    replica_engines,
+    settings,
+)
+from .models.pool import prewarm, prewarm_async
+from .models.replicas import PIN_HEADER, ReplicaPinMiddleware
+from .services.auth import hashing_pool
+from .services.catalog import catalog, refresh_periodically
+from .services.history_buffer import history_buffer
+from .services.popularity import refresh_top_periodically, top_animes
+from .services.revocation import refresh_revocations_periodically, revocations
+from .services.title_search import refresh_search_periodically, title_search
+from .services.cooccurrence import rebuild_periodically
+from .services.metrics import MetricsMiddleware
+from .services.profiler import (
+    QueryBudgetExceeded,
+    QueryProfiler,
+    QueryProfilerMiddleware,
+)
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+sync_engines = [engine, *replica_engines]
+async_engines = (
+    [async_engine, *replica_async_engines] if async_engine is not None else []
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El esquema lo aplica `python -m app.migrate`; aquí solo se calientan pools y cachés
+    app.state.ready = False
+    warmup_started = time.perf_counter()
+    for sync_engine in sync_engines:
+        await run_in_threadpool(prewarm, sync_engine, settings.DB_POOL_SIZE)
+    for pooled_engine in async_engines:
+        await prewarm_async(pooled_engine, settings.DB_POOL_SIZE)
+    await run_in_threadpool(revocations.load, engine)
+    revocation_refresher = asyncio.create_task(
+        refresh_revocations_periodically(engine, settings.AUTH_DENYLIST_REFRESH_SECONDS)
+    )
+    refresher = None
+    if settings.CATALOG_SNAPSHOT_ENABLED:
+        await run_in_threadpool(catalog.load, engine)
+        refresher = asyncio.create_task(
+            refresh_periodically(engine, settings.CATALOG_REFRESH_SECONDS)
+        )
+    search_refresher = None
+    if settings.SEARCH_INDEX_ENABLED:
+        await run_in_threadpool(title_search.load, engine)
+        search_refresher = asyncio.create_task(
+            refresh_search_periodically(engine, settings.SEARCH_REFRESH_SECONDS)
+        )
+    await run_in_threadpool(top_animes.load, engine)
+    top_refresher = asyncio.create_task(
+        refresh_top_periodically(engine, settings.ANIME_TOP_REFRESH_SECONDS)
+    )
+    rebuilder = None
+    if settings.RECOMMENDATIONS_ENABLED:
+        # Se construye en segundo plano: un catálogo grande no demora el arranque
+        rebuilder = asyncio.create_task(
+            rebuild_periodically(engine, settings.RECOMMENDATIONS_REFRESH_SECONDS)
+        )
+    if history_buffer is not None:
+        history_buffer.start()
+    ready_at = time.perf_counter()
+    app.state.startup = {
+        "startup_seconds": round(ready_at - IMPORTED_AT, 3),
+        "warmup_seconds": round(ready_at - warmup_started, 3),
+    }
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    for task in (
+        revocation_refresher, refresher, search_refresher, top_refresher, rebuilder
+    ):
+        if task is not None:
+            task.cancel()
+    if history_buffer is not None:
+        await history_buffer.close()
+    hashing_pool.shutdown()
+
+
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=(
+        ORJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse
+    ),
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,15 +105,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "Server-Timing", PIN_HEADER],
 )
 
-Base.metadata.create_all(bind=engine)
+if settings.DATABASE_REPLICA_URLS:
+    app.add_middleware(ReplicaPinMiddleware, sticky_seconds=settings.REPLICA_STICKY_SECONDS)
+
+if settings.QUERY_PROFILER_ENABLED:
+    profiler = QueryProfiler(
+        settings.SLOW_QUERY_MS,
+        settings.QUERY_BUDGETS,
+        settings.QUERY_BUDGET_DEFAULT,
+        settings.QUERY_BUDGET_ENFORCE,
+    )
+    for sync_engine in sync_engines:
+        profiler.instrument(sync_engine)
+    for pooled_engine in async_engines:
+        profiler.instrument(pooled_engine.sync_engine)
+    app.add_middleware(QueryProfilerMiddleware, profiler=profiler)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(QueryBudgetExceeded)
+async def query_budget_exceeded_handler(request: Request, exc: QueryBudgetExceeded):
+    return JSONResponse(status_code=500, content={"detail": str(exc)})
 
 app.include_router(auth.router)
 app.include_router(anime.router)
 app.include_router(favorites.router)
 app.include_router(history.router)
+app.include_router(recommendations.router)
+app.include_router(transfer.router)
+app.include_router(library.router)
+app.include_router(internal.router)
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to SparkyRoll API!"}
\ No newline at end of file
+    return {"message": "Welcome to SparkyRoll API!"}
@@ -0,0 +1,51 @@
+"""
+One-shot schema step, run once per deploy before the workers start:
+
+    python -m app.migrate
+
+Creates missing tables from the models and, on PostgreSQL, applies the scripts
+in `migrations/` that have not been applied yet, recording them in
+`schema_migrations`. The application itself never touches the schema.
+"""
+import logging
+from pathlib import Path
+
+from .models import anime, catalog, denylist, history, stats, user  # noqa: F401
+from .models.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+
+def apply_migrations(connection):
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " name TEXT PRIMARY KEY,"
+        " applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    )
+    applied = {
+        row[0] for row in connection.exec_driver_sql("SELECT name FROM schema_migrations")
+    }
+    for script in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        if script.name in applied:
+            continue
+        logger.info("Aplicando migración %s", script.name)
+        connection.exec_driver_sql(script.read_text())
+        connection.exec_driver_sql(
+            "INSERT INTO schema_migrations (name) VALUES (%(name)s)",
+            {"name": script.name},
+        )
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            apply_migrations(connection)
+    logger.info("Esquema al día")
+
+
+if __name__ == "__main__":
+    main()
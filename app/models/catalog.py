@@ -0,0 +1,8 @@
+from sqlalchemy import BigInteger, Column, Integer
+from .database import Base
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
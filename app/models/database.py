@@ -1,13 +1,27 @@
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from ..config import Settings
+from ..config import get_settings
+from .pool import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    PoolStats,
+    pool_options,
+)
+from .replicas import PIN_COOKIE, PIN_HEADER, ReplicaRouter
 
-settings = Settings()
+settings = get_settings()
 
 # Crear el motor de base de datos
 engine = create_engine(
-    settings.DATABASE_URL
+    settings.DATABASE_URL,
+    **pool_options(settings.DATABASE_URL, settings, InstrumentedQueuePool)
 )
+pool_stats = {"sync": PoolStats()}
+pool_stats["sync"].attach(engine.pool)
 
 # Crear una clase de sesión local
 SessionLocal = sessionmaker(
@@ -19,6 +33,94 @@ SessionLocal = sessionmaker(
 # Base para las clases de modelos
 Base = declarative_base()
 
+
+def dialect_insert(db, table):
+    """`INSERT` construct with `on_conflict_do_*` support for the session's backend."""
+    bind = db.get_bind() if hasattr(db, "get_bind") else db
+    if bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
+
+
+def to_async_url(url: str) -> str:
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+
+# Motor asíncrono opcional (DB_ASYNC=true)
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_url = settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(
+        async_url, **pool_options(async_url, settings, InstrumentedAsyncQueuePool)
+    )
+    pool_stats["async"] = PoolStats()
+    pool_stats["async"].attach(async_engine.sync_engine.pool)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+# Réplicas de solo lectura opcionales (DATABASE_REPLICA_URLS)
+replica_engines = []
+replica_async_engines = []
+_replica_factories = []
+for _index, _url in enumerate(settings.DATABASE_REPLICA_URLS):
+    _replica = create_engine(
+        _url, **pool_options(_url, settings, InstrumentedQueuePool)
+    )
+    pool_stats[f"replica-{_index}"] = PoolStats()
+    pool_stats[f"replica-{_index}"].attach(_replica.pool)
+    replica_engines.append(_replica)
+    _async_factory = None
+    if settings.DB_ASYNC:
+        _async_url = to_async_url(_url)
+        _async_replica = create_async_engine(
+            _async_url,
+            **pool_options(_async_url, settings, InstrumentedAsyncQueuePool)
+        )
+        pool_stats[f"replica-{_index}-async"] = PoolStats()
+        pool_stats[f"replica-{_index}-async"].attach(_async_replica.sync_engine.pool)
+        replica_async_engines.append(_async_replica)
+        _async_factory = async_sessionmaker(
+            _async_replica, autoflush=False, expire_on_commit=False
+        )
+    _replica_factories.append((
+        sessionmaker(autocommit=False, autoflush=False, bind=_replica),
+        _async_factory,
+    ))
+replica_router = ReplicaRouter(
+    _replica_factories, settings.REPLICA_STICKY_SECONDS, settings.SECRET_KEY
+)
+
+# Métodos que pueden leer de una réplica; el resto va siempre al primario
+READ_METHODS = ("GET", "HEAD")
+
+
+class ThreadedSession:
+    """
+    Wraps a synchronous `Session` behind the `run_sync` interface of `AsyncSession`,
+    so handlers are written once and run on either engine. Work is sent to the
+    Starlette threadpool, which is what the sync stack did before.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
 # Dependencia para obtener una sesión de base de datos
 def get_db():
     db = SessionLocal()
@@ -26,3 +128,60 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@asynccontextmanager
+async def open_session(sync_factory, async_factory=None):
+    if async_factory is not None:
+        async with async_factory() as session:
+            yield session
+    else:
+        db = sync_factory()
+        try:
+            yield ThreadedSession(db)
+        finally:
+            await run_in_threadpool(db.close)
+
+
+# Dependencia para los routers: AsyncSession o Session síncrona envuelta
+async def get_session():
+    async with open_session(SessionLocal, AsyncSessionLocal) as session:
+        yield session
+
+
+def pin_to_primary(request: Request, user_id: int):
+    """
+    Sends `user_id`'s reads to the primary for `REPLICA_STICKY_SECONDS`, in this
+    worker and, through the pin returned with the response, in any other.
+    """
+    pin = replica_router.pin(user_id)
+    if pin is not None:
+        request.state.primary_until = pin
+
+
+def client_pin(request: Request):
+    """The primary pin the client sent back, if any (header first, then cookie)."""
+    return request.headers.get(PIN_HEADER) or request.cookies.get(PIN_COOKIE)
+
+
+@asynccontextmanager
+async def read_session(primary, user_id: int = None, pin=None):
+    """
+    A replica session picked by `replica_router`, or `primary` when it says so;
+    `pin` is the one sent back by the client, which only counts for its `user_id`.
+    """
+    replica = replica_router.choose(user_id, pin)
+    if replica is None:
+        yield primary
+    else:
+        async with open_session(*replica) as session:
+            yield session
+
+
+# Dependencia para lecturas que no dependen del usuario (catálogo)
+async def get_read_session(request: Request, primary=Depends(get_session)):
+    if request.method not in READ_METHODS:
+        yield primary
+        return
+    async with read_session(primary) as session:
+        yield session
@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Column, Integer, String
+from .database import Base
+
+class TokenDenylist(Base):
+    """Tokens revocados antes de expirar: `jti:<id>` o `user:<id>:<versión>`."""
+    __tablename__ = "token_denylist"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, nullable=False, unique=True)
+    # Epoch en segundos, como el `exp` del JWT; pasada esa hora la entrada sobra
+    expires_at = Column(BigInteger, nullable=False, index=True)
@@ -1,13 +1,39 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Enum, Integer, ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from .database import Base
 
+# Estados válidos del historial; en PostgreSQL es el tipo enum `history_status`
+HISTORY_STATUSES = ("viendo", "visto")
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
 class UserHistory(Base):
     __tablename__ = "user_history"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'anime_id', name='uq_user_history_user_id_anime_id'),
+        # Un índice por forma de listado: orden de inserción o de actualización,
+        # con o sin filtro de estado; `id` desempata el cursor
+        Index('ix_user_history_user_id_id', 'user_id', 'id'),
+        Index('ix_user_history_user_id_status_id', 'user_id', 'status', 'id'),
+        Index('ix_user_history_user_id_updated_at', 'user_id', 'updated_at', 'id'),
+        Index(
+            'ix_user_history_user_id_status_updated_at',
+            'user_id', 'status', 'updated_at', 'id',
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     anime_id = Column(Integer, ForeignKey('animes.id'))
-    status = Column(String)
+    status = Column(Enum(*HISTORY_STATUSES, name='history_status'))
+    # Lo fija la aplicación en cada escritura (también al actualizar el estado)
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now()
+    )
     user = relationship("UserDB", back_populates="history_items")
-    anime = relationship("AnimeDB")
\ No newline at end of file
+    anime = relationship("AnimeDB")
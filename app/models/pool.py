@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """
+    Checkout wait time and connection gauges for one engine's pool, fed by pool
+    events and by the instrumented pool classes below.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pool = None
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def attach(self, pool):
+        self.pool = pool
+        pool._pool_stats = self
+
+        @event.listens_for(pool, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.checkouts += 1
+
+        @event.listens_for(pool, "invalidate")
+        def _on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": (
+                    self.wait_seconds_total / self.waits if self.waits else 0.0
+                ),
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+        if isinstance(self.pool, QueuePool):
+            stats.update(
+                size=self.pool.size(),
+                in_use=self.pool.checkedout(),
+                idle=self.pool.checkedin(),
+                overflow=self.pool.overflow(),
+            )
+        return stats
+
+
+class _TimedCheckoutMixin:
+    # No hay evento para "inicio de checkout": se mide alrededor de _do_get
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self._pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self._pool_stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url: str, settings, poolclass) -> dict:
+    # SQLite usa sus propios pools (sin tamaño ni overflow)
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def prewarm(engine, size: int):
+    """Opens `size` connections up front so the first requests don't pay for them."""
+    connections = [engine.connect() for _ in range(size)]
+    for connection in connections:
+        connection.close()
+
+
+async def prewarm_async(engine, size: int):
+    connections = await asyncio.gather(*(engine.connect() for _ in range(size)))
+    for connection in connections:
+        await connection.close()
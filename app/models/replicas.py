@@ -0,0 +1,133 @@
+import hashlib
+import hmac
+import itertools
+import math
+import threading
+import time
+
+# El pin también viaja con el cliente, así vale en cualquier worker: hora (epoch)
+# hasta la que sus lecturas van al primario y su firma, en cookie o en cabecera
+PIN_COOKIE = "primary_until"
+PIN_HEADER = "X-Primary-Until"
+
+
+class ReplicaRouter:
+    """
+    Picks the session factories for a read: round-robin across the configured
+    replicas, or `None` (the primary) for users that wrote recently.
+
+    A write pins its user to the primary for `sticky_seconds`, which should be
+    above the usual replication lag, so a GET right after a POST sees its own
+    write. The pin is kept in this worker's memory and also handed to the client
+    (`PIN_COOKIE` / `PIN_HEADER`, see `ReplicaPinMiddleware`), which sends it back
+    so the read is pinned whichever worker serves it. That pin is
+    `until.signature`, an HMAC of `user_id|until` with `secret`: a client can
+    neither extend it nor reuse another user's.
+    """
+
+    # Por encima de este tamaño se purgan los pines vencidos al agregar uno
+    PRUNE_AT = 10000
+
+    def __init__(self, replicas, sticky_seconds: float, secret: str = ""):
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self._secret = secret.encode()
+        self._next = itertools.count()
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self.reads = {"primary": 0, "replica": 0, "pinned": 0}
+
+    def pin(self, user_id: int):
+        """Pins `user_id`; returns the signed pin for the client (see `client_pinned`)."""
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if len(self._pinned) >= self.PRUNE_AT:
+                self._pinned = {
+                    uid: until for uid, until in self._pinned.items() if until > now
+                }
+            self._pinned[user_id] = now + self.sticky_seconds
+        # Truncado: redondeado hacia arriba pasaría el tope de client_pinned
+        until = f"{math.floor((time.time() + self.sticky_seconds) * 1000) / 1000:.3f}"
+        return f"{until}.{self._sign(user_id, until)}"
+
+    def _sign(self, user_id: int, until: str) -> str:
+        message = f"{user_id}|{until}".encode()
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def pinned(self, user_id: int) -> bool:
+        until = self._pinned.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def client_pinned(self, value, user_id: int) -> bool:
+        """
+        Whether a pin sent back by the client (`PIN_COOKIE` / `PIN_HEADER`) was
+        issued to `user_id` and is current.
+        """
+        until, _, signature = str(value).rpartition(".")
+        if not hmac.compare_digest(signature, self._sign(user_id, until)):
+            return False
+        try:
+            until = float(until)
+        except ValueError:
+            return False
+        now = time.time()
+        # Uno más lejano que sticky_seconds no lo emitió este servidor
+        return now < until <= now + self.sticky_seconds
+
+    def choose(self, user_id: int = None, client_pin=None):
+        if not self.replicas:
+            self.reads["primary"] += 1
+            return None
+        if user_id is not None and (
+            self.pinned(user_id)
+            or (client_pin is not None and self.client_pinned(client_pin, user_id))
+        ):
+            self.reads["pinned"] += 1
+            return None
+        self.reads["replica"] += 1
+        return self.replicas[next(self._next) % len(self.replicas)]
+
+    def stats(self):
+        return {
+            "replicas": len(self.replicas),
+            "sticky_seconds": self.sticky_seconds,
+            "pinned_users": sum(1 for uid in list(self._pinned) if self.pinned(uid)),
+            "reads": dict(self.reads),
+        }
+
+
+class ReplicaPinMiddleware:
+    """
+    ASGI middleware handing the pin set while serving a write (`primary_until` in
+    the request state) back to the client, as a cookie that expires with it and
+    as the `PIN_HEADER` header for clients that do not keep cookies.
+    """
+
+    def __init__(self, app, sticky_seconds: float):
+        self.app = app
+        self.max_age = math.ceil(sticky_seconds)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                until = scope.get("state", {}).get("primary_until")
+                if until is not None:
+                    value = until.encode()
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (PIN_HEADER.lower().encode(), value),
+                        (
+                            b"set-cookie",
+                            b"%s=%s; Max-Age=%d; Path=/; HttpOnly; SameSite=Lax"
+                            % (PIN_COOKIE.encode(), value, self.max_age),
+                        ),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
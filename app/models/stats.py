@@ -0,0 +1,11 @@
+from sqlalchemy import Column, ForeignKey, Integer
+from .database import Base
+
+class AnimeStats(Base):
+    """Contadores por anime que mantienen las escrituras de favoritos e historial."""
+    __tablename__ = "anime_stats"
+
+    anime_id = Column(Integer, ForeignKey('animes.id', ondelete='CASCADE'), primary_key=True)
+    favorites_count = Column(Integer, nullable=False, default=0, server_default='0', index=True)
+    watching_count = Column(Integer, nullable=False, default=0, server_default='0', index=True)
+    watched_count = Column(Integer, nullable=False, default=0, server_default='0', index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Index, Table
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -6,8 +6,10 @@ from .database import Base
 user_favorites = Table(
     'user_favorites',
     Base.metadata,
-    Column('user_id', Integer, ForeignKey('users.id')),
-    Column('anime_id', Integer, ForeignKey('animes.id'))
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('anime_id', Integer, ForeignKey('animes.id'), primary_key=True),
+    # La PK cubre (user_id, anime_id); este índice cubre la búsqueda inversa
+    Index('ix_user_favorites_anime_id_user_id', 'anime_id', 'user_id')
 )
 
 class UserDB(Base):
@@ -16,6 +18,15 @@ class UserDB(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+    # Se incrementan en cada escritura; sirven de ETag para las listas del usuario
+    favorites_version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    history_version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    # Va en el claim `ver` del JWT; subirla revoca todos los tokens del usuario
+    token_version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    # Entradas del historial por estado; las mantienen las escrituras del historial
+    # y sirven `X-Total-Count` sin contar filas
+    watching_count = Column(Integer, nullable=False, default=0, server_default='0')
+    watched_count = Column(Integer, nullable=False, default=0, server_default='0')
     favorites = relationship(
         "AnimeDB",
         secondary=user_favorites,
@@ -0,0 +1,44 @@
+"""
+Fixes drift in the denormalized counters: popularity (`anime_stats`) and the
+per-user history counts (`users.watching_count` / `watched_count`), and deletes
+the expired entries of `token_denylist`:
+
+    python -m app.reconcile
+
+Recomputes favorites and per-status history counts with one `GROUP BY` pass
+over `user_favorites` and `user_history`, then each user's counts from the
+`(user_id, status, ...)` index, and rewrites only the rows that differ. Safe to
+run from cron; best run off-peak on large tables, since writes racing with it
+can be overwritten until the next run.
+"""
+import logging
+import time
+
+from .models import anime, catalog, denylist, history, stats, user  # noqa: F401
+from .models.database import engine
+from .services.history import reconcile_user_history_counts
+from .services.popularity import reconcile_anime_stats
+from .services.revocation import prune_denylist
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        fixed = reconcile_anime_stats(connection)
+        users_fixed = reconcile_user_history_counts(connection)
+        pruned = prune_denylist(connection)
+    logger.info(
+        "Contadores reconciliados: %d animes y %d usuarios corregidos, %d revocaciones "
+        "vencidas borradas en %.1f s",
+        fixed,
+        users_fixed,
+        pruned,
+        time.perf_counter() - started,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,36 @@ class Anime(BaseModel):
                 "id": 1,
                 "title": "Naruto"
             }
-        }
\ No newline at end of file
+        }
+
+class AnimeSearchResult(BaseModel):
+
+    anime_id: int
+    title: str
+    score: float
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "anime_id": 12,
+                "title": "Re:Zero - Starting Life in Another World",
+                "score": 1.0
+            }
+        }
+
+class AnimeTop(BaseModel):
+
+    anime_id: int
+    title: str
+    count: int
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "anime_id": 1,
+                "title": "Naruto",
+                "count": 1520
+            }
+        }
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
 
 
 class AnimeFavoriteRequest(BaseModel):
@@ -10,4 +12,32 @@ class AnimeFavoriteResponse(BaseModel):
     title: str
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class AnimeFavoriteBatchRequest(BaseModel):
+    add: List[int] = Field(default_factory=list, max_length=1000)
+    remove: List[int] = Field(default_factory=list, max_length=1000)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "add": [1, 2, 3],
+                "remove": [4]
+            }
+        }
+
+
+class AnimeFavoriteBatchResult(BaseModel):
+    anime_id: int
+    action: str
+    result: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "anime_id": 1,
+                "action": "add",
+                "result": "added"
+            }
+        }
@@ -0,0 +1,28 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from .favorite import AnimeFavoriteResponse
+from .history import AnimeHistoryResponse
+
+
+class LibraryCounts(BaseModel):
+    favorites: int
+    history: int
+    viendo: int
+    visto: int
+
+
+class UserLibrary(BaseModel):
+    favorites: Optional[List[AnimeFavoriteResponse]] = None
+    history: Optional[List[AnimeHistoryResponse]] = None
+    counts: Optional[LibraryCounts] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "favorites": [{"anime_id": 1, "title": "Naruto"}],
+                "history": [{"anime_id": 2, "title": "One Piece", "status": "viendo"}],
+                "counts": {"favorites": 1, "history": 1, "viendo": 1, "visto": 0}
+            }
+        }
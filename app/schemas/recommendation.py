@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+
+class AnimeRecommendation(BaseModel):
+    anime_id: int
+    title: str
+    score: float
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "anime_id": 20,
+                "title": "Naruto",
+                "score": 0.42
+            }
+        }
@@ -0,0 +1,33 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class LibraryImportError(BaseModel):
+    line: int
+    detail: str
+
+
+class LibraryImportReport(BaseModel):
+    lines: int
+    favorites_added: int
+    history_written: int
+    ignored: int
+    invalid: int
+    errors: List[LibraryImportError]
+    seconds: float
+    rows_per_second: int
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "lines": 100000,
+                "favorites_added": 39998,
+                "history_written": 60000,
+                "ignored": 1,
+                "invalid": 1,
+                "errors": [{"line": 17, "detail": "Estado inválido"}],
+                "seconds": 4.2,
+                "rows_per_second": 23810
+            }
+        }
@@ -36,7 +36,19 @@ class Token(BaseModel):
         }
 
 class TokenData(BaseModel):
+    # Los tokens emitidos antes de tener `user_id` solo traen el email en `sub`
+    user_id: Optional[int] = None
     email: Optional[str] = None
+    version: Optional[int] = None
+    token_id: Optional[str] = None
+    expires_at: int
+
+
+class Principal(User):
+    """Authenticated user plus the token fields needed to check revocation."""
+    token_id: Optional[str] = None
+    token_version: Optional[int] = None
+    token_expires_at: Optional[int] = None
 
 class LoginRequest(BaseModel):
     email: EmailStr
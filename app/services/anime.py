@@ -0,0 +1,106 @@
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.anime import AnimeDB
+from .catalog import catalog
+from .title_search import title_search
+
+
+def get_anime(db: Session, anime_id: int):
+    return db.query(AnimeDB).filter(AnimeDB.id == anime_id).first()
+
+
+def anime_exists(db: Session, anime_id: int) -> bool:
+    known = catalog.contains(anime_id)
+    if known is not None:
+        return known
+    return db.scalar(select(AnimeDB.id).where(AnimeDB.id == anime_id)) is not None
+
+
+def existing_anime_ids(db: Session, anime_ids, snapshot: bool = True) -> set:
+    """Ids of `anime_ids` that exist; `snapshot=False` asks only the database."""
+    existing = set()
+    unknown = []
+    for anime_id in anime_ids:
+        known = catalog.contains(anime_id) if snapshot else None
+        if known is None:
+            unknown.append(anime_id)
+        elif known:
+            existing.add(anime_id)
+    if unknown:
+        existing.update(db.scalars(select(AnimeDB.id).where(AnimeDB.id.in_(unknown))))
+    return existing
+
+
+def anime_not_found(db: Session) -> HTTPException:
+    """
+    For a foreign key violation on a write: the catalog snapshot let through an
+    anime deleted since it was loaded. Rolls back, marks the snapshot stale and
+    returns the 404 to raise.
+    """
+    db.rollback()
+    catalog.invalidate()
+    return HTTPException(status_code=404, detail="Anime no encontrado")
+
+
+def write_existing_animes(db: Session, anime_ids, write):
+    """
+    Runs `write(existing)` with the ids of `anime_ids` that exist according to the
+    catalog snapshot. If the snapshot let a deleted anime through, runs it again
+    with the ids read from the database, so the valid ones are still written; a
+    violation after that is a 404.
+    """
+    try:
+        return write(existing_anime_ids(db, anime_ids))
+    except IntegrityError:
+        db.rollback()
+        catalog.invalidate()
+    try:
+        return write(existing_anime_ids(db, anime_ids, snapshot=False))
+    except IntegrityError:
+        raise anime_not_found(db)
+
+
+def list_animes(db: Session, size: int, skip: int = 0, after: Optional[int] = None):
+    query = db.query(AnimeDB.id, AnimeDB.title).order_by(AnimeDB.id)
+    if after is not None:
+        query = query.filter(AnimeDB.id > after)
+    else:
+        query = query.offset(skip)
+    return query.limit(size).all()
+
+
+def anime_titles(db: Session, anime_ids) -> dict:
+    """`{id: title}` for the given ids, from the catalog snapshot when it has them."""
+    titles = {}
+    unknown = []
+    for anime_id in anime_ids:
+        title = catalog.title(anime_id)
+        if title is None:
+            unknown.append(anime_id)
+        else:
+            titles[anime_id] = title
+    if unknown:
+        titles.update(
+            db.execute(
+                select(AnimeDB.id, AnimeDB.title).where(AnimeDB.id.in_(unknown))
+            ).tuples().all()
+        )
+    return titles
+
+
+def search_animes(db: Session, query: str, limit: int):
+    if not title_search.loaded:
+        raise HTTPException(status_code=503, detail="Búsqueda no disponible")
+    scored = title_search.search(query, limit)
+    titles = anime_titles(db, [anime_id for anime_id, _ in scored])
+    return [
+        {"anime_id": anime_id, "title": titles[anime_id], "score": round(score, 4)}
+        for anime_id, score in scored
+        # Un anime borrado sigue en el índice hasta la siguiente sincronización
+        if anime_id in titles
+    ]
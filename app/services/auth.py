@@ -1,25 +1,52 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 
 from jose import JWTError, jwt
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 
+import secrets
 from datetime import datetime, timedelta, timezone
 
 
 from ..models.user import UserDB
-from ..schemas.user import TokenData
-from ..models.database import get_db
-from ..config import Settings
+from ..schemas.user import Principal, TokenData, User
+from ..models.database import (
+    READ_METHODS,
+    client_pin,
+    get_read_session,
+    get_session,
+    pin_to_primary,
+    read_session,
+)
+from ..config import get_settings
+from .hashing import HashingPool
+from .principal_cache import PrincipalCache
+from .revocation import denylist_contains, revocations, token_key, user_version_key
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-settings = Settings()
+settings = get_settings()
 SECRET_KEY = settings.SECRET_KEY
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+hashing_pool = HashingPool(settings.HASH_WORKERS, settings.HASH_QUEUE_DEPTH)
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+@event.listens_for(UserDB, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    principal_cache.invalidate_user(target.id)
+
+
+@event.listens_for(UserDB, "after_update")
+def _invalidate_changed_password(mapper, connection, target):
+    if inspect(target).attrs.hashed_password.history.has_changes():
+        principal_cache.invalidate_user(target.id)
 
 
 def verify_password(plain_password, hashed_password):
@@ -34,13 +61,34 @@ def get_user(db: Session, email: str):
     return db.query(UserDB).filter(UserDB.email == email).first()
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(UserDB).filter(UserDB.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+def get_user_by_id(db: Session, user_id: int):
+    return db.get(UserDB, user_id)
+
+
+async def authenticate_user(db, email: str, password: str):
+    user = await db.run_sync(get_user, email)
+    # bcrypt es CPU puro: nunca en el event loop
+    if not user or not await hashing_pool.run(
+        verify_password, password, user.hashed_password
+    ):
         return None
     return user
 
 
+def token_claims(user) -> dict:
+    """
+    Claims of a new access token: the user id in `sub`, and the email and token
+    version so that stateless mode can authenticate without reading `users`.
+    `jti` identifies the token when it is revoked on its own.
+    """
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "ver": user.token_version,
+        "jti": secrets.token_urlsafe(12),
+    }
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -52,23 +100,130 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 
-async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-):
-    credentials_exception = HTTPException(
+def credentials_error():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Not authenticated",
         headers={"Autorization": "Bearer"},
     )
+
+
+def decode_token(token: str) -> TokenData:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
     except JWTError:
-        raise credentials_exception
-    user = get_user(db, email=token_data.email)
+        raise credentials_error()
+    subject = payload.get("sub")
+    if not isinstance(subject, str):
+        raise credentials_error()
+    if not subject.isdigit():
+        # Token anterior a los claims por id: se resuelve por email hasta que expire
+        return TokenData(email=subject, expires_at=payload["exp"])
+    return TokenData(
+        user_id=int(subject),
+        email=payload.get("email"),
+        version=payload.get("ver"),
+        token_id=payload.get("jti"),
+        expires_at=payload["exp"],
+    )
+
+
+async def load_principal(claims: TokenData, db, primary, request: Request) -> Principal:
+    token = {
+        "token_id": claims.token_id,
+        "token_version": claims.version,
+        "token_expires_at": claims.expires_at,
+    }
+    if (
+        settings.AUTH_STATELESS
+        and claims.user_id is not None
+        and claims.email is not None
+        and claims.version is not None
+    ):
+        # Los claims están firmados: no hace falta leer users para saber quién es
+        return Principal(id=claims.user_id, email=claims.email, **token)
+    if claims.user_id is not None:
+        lookup = (get_user_by_id, claims.user_id)
+    else:
+        lookup = (get_user, claims.email)
+    user = await db.run_sync(*lookup)
+    if user is None and db is not primary:
+        # Un usuario recién registrado puede no haber llegado aún a la réplica:
+        # sus lecturas se quedan en el primario hasta que llegue
+        user = await primary.run_sync(*lookup)
+        if user is not None:
+            pin_to_primary(request, user.id)
     if user is None:
-        raise credentials_exception
-    return user
+        raise credentials_error()
+    if claims.version is not None and claims.version != user.token_version:
+        raise credentials_error()
+    return Principal(id=user.id, email=user.email, **token)
+
+
+async def is_revoked(primary, principal: Principal) -> bool:
+    """
+    Checks the token against the revocation filter; only a possible match costs a
+    query, on the primary so a revocation made a moment ago is already there.
+    """
+    keys = []
+    if principal.token_id is not None:
+        keys.append(token_key(principal.token_id))
+    if principal.token_version is not None:
+        keys.append(user_version_key(principal.id, principal.token_version))
+    keys = [key for key in keys if revocations.might_contain(key)]
+    if not keys:
+        return False
+    revoked = await primary.run_sync(denylist_contains, keys)
+    if revoked:
+        revocations.revoked += 1
+    return revoked
+
+
+async def get_current_user(
+    request: Request,
+    db=Depends(get_read_session),
+    primary=Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+):
+    principal = principal_cache.get(token)
+    if principal is None:
+        claims = decode_token(token)
+        principal = await load_principal(claims, db, primary, request)
+        principal_cache.put(token, claims.expires_at, principal)
+    if await is_revoked(primary, principal):
+        principal_cache.discard(token)
+        raise credentials_error()
+    if request.method not in READ_METHODS:
+        pin_to_primary(request, principal.id)
+    return principal
+
+
+def require_internal_token(request: Request):
+    """
+    Guards `/internal/*`: it answers only with `Authorization: Bearer
+    <INTERNAL_TOKEN>`, and not at all (404) while the setting is unset.
+    """
+    if not settings.INTERNAL_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode(), settings.INTERNAL_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token interno inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def get_user_read_session(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    primary=Depends(get_session),
+):
+    """
+    Session for reading the current user's data: a replica, unless the user
+    wrote recently, in which case the primary (read-your-writes).
+    """
+    async with read_session(primary, current_user.id, client_pin(request)) as session:
+        yield session
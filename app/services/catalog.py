@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, select
+
+from ..models.anime import AnimeDB
+from ..models.catalog import CatalogVersion
+from ..models.database import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+CatalogEntry = namedtuple("CatalogEntry", ["id", "title"])
+
+
+def get_catalog_version(connection) -> int:
+    version = connection.execute(
+        select(CatalogVersion.version).where(CatalogVersion.id == 1)
+    ).scalar()
+    return version or 0
+
+
+def bump_catalog_version(connection):
+    """
+    Marks the catalog as changed. Runs on the caller's connection, so the bump
+    commits or rolls back together with the write that caused it.
+    """
+    # Upsert: la primera escritura crea la fila sin competir con otra por el INSERT
+    table = CatalogVersion.__table__
+    statement = dialect_insert(connection, table).values(id=1, version=1)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=["id"], set_={"version": table.c.version + 1}
+        )
+    )
+    catalog.invalidate()
+
+
+class CatalogSnapshot:
+    """
+    Read-only in-process copy of `animes(id, title)`.
+
+    Ids live in a sorted `array('i')` and titles in one UTF-8 blob indexed by an
+    `array('I')` of offsets, which costs a few bytes per title instead of one Python
+    object per row. A reload builds new arrays and swaps them in a single assignment,
+    so readers never see a half-built snapshot.
+    """
+
+    def __init__(self):
+        self._data = None
+        self._dirty = False
+        self.loaded_at = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def version(self) -> Optional[int]:
+        data = self._data
+        return data[0] if data is not None else None
+
+    def replace(self, rows, version: int):
+        ids = array("i")
+        offsets = array("I", [0])
+        chunks = bytearray()
+        for anime_id, title in rows:
+            ids.append(anime_id)
+            chunks += (title or "").encode("utf-8")
+            offsets.append(len(chunks))
+        self._data = (version, ids, offsets, bytes(chunks))
+        self._dirty = False
+        self.loaded_at = time.time()
+
+    def load(self, engine):
+        with engine.connect() as connection:
+            version = get_catalog_version(connection)
+            rows = connection.execution_options(yield_per=50_000).execute(
+                select(AnimeDB.id, AnimeDB.title).order_by(AnimeDB.id)
+            )
+            self.replace(rows, version)
+        logger.info("Catálogo cargado: %d títulos (versión %d)", len(self), version)
+
+    def refresh(self, engine) -> bool:
+        with engine.connect() as connection:
+            version = get_catalog_version(connection)
+        if self._dirty or version != self.version:
+            self.load(engine)
+            return True
+        return False
+
+    def invalidate(self):
+        self._dirty = True
+
+    def __len__(self):
+        data = self._data
+        return len(data[1]) if data is not None else 0
+
+    def contains(self, anime_id: int) -> Optional[bool]:
+        """`None` means the snapshot cannot tell (not loaded, or id newer than it)."""
+        data = self._data
+        if data is None:
+            return None
+        ids = data[1]
+        if not ids or anime_id > ids[-1]:
+            return None
+        index = bisect_left(ids, anime_id)
+        return index < len(ids) and ids[index] == anime_id
+
+    def page(self, size: int, skip: int = 0, after: Optional[int] = None):
+        _, ids, offsets, blob = self._data
+        start = bisect_right(ids, after) if after is not None else skip
+        stop = min(start + size, len(ids))
+        return [
+            CatalogEntry(ids[i], blob[offsets[i]:offsets[i + 1]].decode("utf-8"))
+            for i in range(start, stop)
+        ]
+
+    def title(self, anime_id: int) -> Optional[str]:
+        data = self._data
+        if data is None:
+            return None
+        _, ids, offsets, blob = data
+        index = bisect_left(ids, anime_id)
+        if index < len(ids) and ids[index] == anime_id:
+            return blob[offsets[index]:offsets[index + 1]].decode("utf-8")
+        return None
+
+    def stats(self):
+        data = self._data
+        if data is None:
+            return {"loaded": False}
+        version, ids, offsets, blob = data
+        nbytes = (
+            ids.buffer_info()[1] * ids.itemsize
+            + offsets.buffer_info()[1] * offsets.itemsize
+            + len(blob)
+        )
+        return {
+            "loaded": True,
+            "version": version,
+            "titles": len(ids),
+            "bytes": nbytes,
+            "bytes_per_title": nbytes / len(ids) if ids else 0,
+            "loaded_at": self.loaded_at,
+        }
+
+
+catalog = CatalogSnapshot()
+
+
+@event.listens_for(AnimeDB, "after_insert")
+@event.listens_for(AnimeDB, "after_update")
+@event.listens_for(AnimeDB, "after_delete")
+def _catalog_changed(mapper, connection, target):
+    bump_catalog_version(connection)
+
+
+async def refresh_periodically(engine, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(catalog.refresh, engine)
+        except Exception:
+            logger.exception("No se pudo refrescar el catálogo")
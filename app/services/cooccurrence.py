@@ -0,0 +1,447 @@
+import asyncio
+import logging
+import threading
+import time
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from scipy import sparse
+from sqlalchemy import select
+
+from ..config import get_settings
+from ..models.user import user_favorites
+
+logger = logging.getLogger(__name__)
+
+# Filas de user_favorites leídas por lote al construir el índice
+LOAD_BATCH = 500_000
+
+
+def build_cooccurrence(user_ids, anime_ids, neighbors: int, block: int = 1024):
+    """
+    Item-to-item co-occurrence from `(user_id, anime_id)` pairs, pruned to the
+    `neighbors` most similar items per anime.
+
+    The favorites are a sparse users x animes matrix `X`; `X.T @ X` counts, for
+    every pair of animes, how many users favorited both. It is computed in blocks
+    of `block` animes so the unpruned product never has to fit in memory at once.
+    Returns CSR-style `(indptr, indices, counts)` plus the favorites per anime.
+    """
+    n_items = int(anime_ids.max()) + 1 if len(anime_ids) else 1
+    _, user_rows = np.unique(user_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(anime_ids), dtype=np.int32), (user_rows, anime_ids)),
+        shape=(int(user_rows.max()) + 1 if len(user_rows) else 0, n_items),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    popularity = np.asarray(matrix.sum(axis=0), dtype=np.int64).ravel()
+    transposed = matrix.T.tocsr()
+
+    indptr = np.zeros(n_items + 1, dtype=np.int64)
+    indices, counts = [], []
+    for start in range(0, n_items, block):
+        product = (transposed[start:start + block] @ matrix).tocsr()
+        for row in range(product.shape[0]):
+            lo, hi = product.indptr[row], product.indptr[row + 1]
+            item = start + row
+            if lo == hi:
+                indptr[item + 1] = indptr[item]
+                continue
+            cols = product.indices[lo:hi]
+            cnt = product.data[lo:hi]
+            keep = cols != item
+            cols, cnt = cols[keep], cnt[keep]
+            cols, cnt = _prune(cols, cnt, popularity, neighbors)
+            indices.append(cols.astype(np.int32))
+            counts.append(cnt.astype(np.int32))
+            indptr[item + 1] = indptr[item] + len(cols)
+    return (
+        indptr,
+        np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+        np.concatenate(counts) if counts else np.zeros(0, dtype=np.int32),
+        popularity,
+    )
+
+
+def _prune(cols, cnt, popularity, neighbors: int):
+    """Keeps the `neighbors` columns of one row with the highest cosine similarity."""
+    if len(cols) <= neighbors:
+        return cols, cnt
+    # popularity[fila] es constante en la fila: basta con el denominador de cada columna
+    top = np.argpartition(-cnt / np.sqrt(np.maximum(popularity[cols], 1)), neighbors)
+    return cols[top[:neighbors]], cnt[top[:neighbors]]
+
+
+def _pairs(changed, members):
+    """Unordered pairs of `members` that involve at least one id of `changed`."""
+    for anime_id in changed:
+        for other in members:
+            if other != anime_id and not (other in changed and other < anime_id):
+                yield anime_id, other
+
+
+class CooccurrenceIndex:
+    """
+    In-memory "users who favorited this also favorited" index.
+
+    The batch part is the pruned co-occurrence matrix from `build_cooccurrence`,
+    scored as cosine similarity `count / sqrt(favorites_i * favorites_j)` at query
+    time. Favorites added or removed since the last build go to an overlay of pair
+    deltas; since counts add up, queries just append the overlay rows they touch.
+    A change only pairs the changed ids with at most `pair_sample` of the user's
+    other favorites, so its cost does not grow with the user's list; below that
+    size the overlay is exact. Above it the sample of an add and of a later remove
+    can differ, so a pair may go negative: queries clamp each pair at 0. Once the
+    overlay grows past `COMPACT_AT` entries (or a quarter of the matrix, on large
+    ones) a background thread folds it into the matrix, and a full rebuild from
+    the database recovers the pairs that the sampling and the pruning left out.
+    """
+
+    # Entradas del overlay a partir de las cuales se integra en la matriz
+    COMPACT_AT = 10_000
+
+    def __init__(self, neighbors: int = 50, pair_sample: int = 200):
+        self.neighbors = neighbors
+        self.pair_sample = pair_sample
+        self._data = None
+        # `_folding` es el overlay que se está integrando; las lecturas usan ambos
+        self._delta = {}
+        self._folding = {}
+        self._delta_size = 0
+        # Cambios aplicados desde que empezó la reconstrucción en curso (o None):
+        # se reaplican sobre la matriz nueva, que se leyó antes de ellos
+        self._since_build = None
+        self._generation = 0
+        self._compacting = False
+        self._lock = threading.Lock()
+        self.compactions = 0
+        self.built_at = None
+        self.build_seconds = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def tracking(self) -> bool:
+        """Whether `favorites_changed` has any effect: loaded or being built."""
+        return self._data is not None or self._since_build is not None
+
+    def replace(self, user_ids, anime_ids):
+        """
+        Builds the matrix from `(user_id, anime_id)` pairs and swaps it in. The
+        changes recorded since `load` started reading are replayed on top of it;
+        without a `load` in progress the overlay is simply dropped.
+        """
+        started = time.perf_counter()
+        data = build_cooccurrence(
+            np.asarray(user_ids, dtype=np.int64),
+            np.asarray(anime_ids, dtype=np.int64),
+            self.neighbors,
+        )
+        with self._lock:
+            replay = self._since_build or {"pairs": {}, "popularity": {}}
+            indptr, indices, counts, popularity = data
+            needed = max(replay["popularity"], default=-1) + 1
+            if needed > len(popularity):
+                popularity = np.concatenate(
+                    [popularity, np.zeros(needed - len(popularity), dtype=np.int64)]
+                )
+            for anime_id, delta in replay["popularity"].items():
+                popularity[anime_id] += delta
+            self._data = (indptr, indices, counts, popularity)
+            self._delta = replay["pairs"]
+            self._folding = {}
+            self._delta_size = sum(len(row) for row in self._delta.values())
+            self._since_build = None
+            self._generation += 1
+        self.built_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+
+    def load(self, engine):
+        with self._lock:
+            if self._since_build is not None:
+                return
+            # Desde aquí los cambios se anotan también para reaplicarlos
+            self._since_build = {"pairs": {}, "popularity": {}}
+        try:
+            user_ids, anime_ids = [], []
+            with engine.connect() as connection:
+                result = connection.execution_options(yield_per=LOAD_BATCH).execute(
+                    select(user_favorites.c.user_id, user_favorites.c.anime_id)
+                )
+                for rows in result.partitions():
+                    pairs = np.array(rows, dtype=np.int64)
+                    user_ids.append(pairs[:, 0])
+                    anime_ids.append(pairs[:, 1])
+            self.replace(
+                np.concatenate(user_ids) if user_ids else [],
+                np.concatenate(anime_ids) if anime_ids else [],
+            )
+        finally:
+            with self._lock:
+                self._since_build = None
+        logger.info(
+            "Índice de recomendaciones: %d favoritos en %.1f s",
+            sum(len(chunk) for chunk in anime_ids),
+            self.build_seconds,
+        )
+
+    @staticmethod
+    def _add_pairs(overlay, changed, members, step) -> int:
+        """Adds `step` to the overlay pairs of `changed` x `members`; returns new entries."""
+        added = 0
+        for a, b in _pairs(changed, members):
+            for i, j in ((a, b), (b, a)):
+                row = overlay.setdefault(i, {})
+                if j not in row:
+                    added += 1
+                row[j] = row.get(j, 0) + step
+        return added
+
+    def favorites_changed(self, others, added=(), removed=()):
+        """
+        Applies one user's favorites change: `added`/`removed` are the ids that
+        changed and `others` the user's other favorites, which the caller may cut
+        to the `pair_sample` smallest ids (see `favorites.favorite_sample`). Each
+        changed id is paired with those and with up to `pair_sample` of the other
+        changed ids. While the user has fewer than `pair_sample` favorites every
+        pair is counted, so an add and a later remove cancel out exactly.
+        """
+        if not self.tracking or not (added or removed):
+            return
+        added, removed = set(added), set(removed)
+        others = sorted(set(others) - added - removed)[: self.pair_sample]
+        with self._lock:
+            replay = self._since_build
+            loaded = self._data is not None
+            if loaded:
+                indptr, indices, counts, popularity = self._data
+                needed = max(max(added | removed), max(others, default=0)) + 1
+                if needed > len(popularity):
+                    popularity = np.concatenate(
+                        [popularity, np.zeros(needed - len(popularity), dtype=np.int64)]
+                    )
+                    self._data = (indptr, indices, counts, popularity)
+            for changed, step in ((added, 1), (removed, -1)):
+                members = set(others).union(sorted(changed)[: self.pair_sample])
+                if loaded:
+                    popularity[list(changed)] += step
+                    self._delta_size += self._add_pairs(self._delta, changed, members, step)
+                if replay is not None:
+                    for anime_id in changed:
+                        replay["popularity"][anime_id] = (
+                            replay["popularity"].get(anime_id, 0) + step
+                        )
+                    self._add_pairs(replay["pairs"], changed, members, step)
+            if not loaded:
+                return
+            start_compaction = (
+                self._delta_size >= max(self.COMPACT_AT, len(indices) // 4)
+                and not self._compacting
+            )
+        if start_compaction:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def _overlay_rows(self, anime_ids):
+        """`(anime_id, cols, counts)` of the overlay rows of `anime_ids`."""
+        rows = []
+        with self._lock:
+            for overlay in (self._folding, self._delta):
+                for anime_id in anime_ids:
+                    row = overlay.get(anime_id)
+                    if row:
+                        rows.append((
+                            anime_id,
+                            np.fromiter(row.keys(), np.int64, len(row)),
+                            np.fromiter(row.values(), np.int64, len(row)),
+                        ))
+        return rows
+
+    @staticmethod
+    def _base_rows(data, anime_ids):
+        """Base-matrix entries of `anime_ids` as flat `(sources, cols, counts)`."""
+        indptr, indices, counts, _ = data
+        anime_ids = anime_ids[(anime_ids >= 0) & (anime_ids + 1 < len(indptr))]
+        starts = indptr[anime_ids]
+        lengths = indptr[anime_ids + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = offsets + np.arange(int(lengths.sum()))
+        return (
+            np.repeat(anime_ids, lengths),
+            indices[positions].astype(np.int64),
+            counts[positions].astype(np.int64),
+        )
+
+    def _entries(self, data, anime_ids):
+        """Base plus overlay entries; a pair may appear more than once."""
+        sources, cols, cnt = self._base_rows(data, anime_ids)
+        overlay = self._overlay_rows(anime_ids.tolist())
+        if overlay:
+            sources = np.concatenate(
+                [sources] + [np.full(len(c), a) for a, c, _ in overlay]
+            )
+            cols = np.concatenate([cols] + [c for _, c, _ in overlay])
+            cnt = np.concatenate([cnt] + [n for _, _, n in overlay])
+            # `data` puede ser anterior a un cambio que amplió `popularity`
+            known = (cols < len(data[3])) & (sources < len(data[3]))
+            sources, cols, cnt = sources[known], cols[known], cnt[known]
+        return sources, cols, cnt
+
+    def compact(self):
+        """
+        Folds the overlay into the pruned matrix. The heavy part runs without the
+        lock; meanwhile readers see the folded overlay through `_folding`.
+        """
+        with self._lock:
+            if self._compacting or self._data is None:
+                return
+            self._compacting = True
+            data, generation = self._data, self._generation
+            folding = self._folding = self._delta
+            self._delta = {}
+            self._delta_size = 0
+        touched = np.fromiter(folding.keys(), np.int64, len(folding))
+        try:
+            indptr, indices, counts, _ = data
+            popularity = self._data[3]
+            lengths = np.diff(indptr)
+            rows = np.repeat(np.arange(len(lengths)), lengths)
+            untouched = ~np.isin(rows, touched)
+            parts = [(rows[untouched], indices[untouched], counts[untouched])]
+
+            # Las filas tocadas se suman con el overlay y se vuelven a podar
+            sources, cols, cnt = self._base_rows(data, touched)
+            sources = np.concatenate(
+                [sources] + [np.full(len(row), anime_id) for anime_id, row in folding.items()]
+            )
+            cols = np.concatenate(
+                [cols] + [np.fromiter(row.keys(), np.int64, len(row)) for row in folding.values()]
+            )
+            cnt = np.concatenate(
+                [cnt] + [np.fromiter(row.values(), np.int64, len(row)) for row in folding.values()]
+            )
+            width = len(popularity)
+            keys, inverse = np.unique(sources * width + cols, return_inverse=True)
+            totals = np.bincount(inverse, weights=cnt).astype(np.int64)
+            positive = totals > 0
+            keys, totals = keys[positive], totals[positive]
+            bounds = np.flatnonzero(np.diff(keys // width)) + 1
+            for source_cols, source_cnt, source in zip(
+                np.split(keys % width, bounds),
+                np.split(totals, bounds),
+                np.split(keys // width, bounds),
+            ):
+                if not len(source):
+                    continue
+                kept_cols, kept_cnt = _prune(
+                    source_cols, source_cnt, popularity, self.neighbors
+                )
+                parts.append((np.full(len(kept_cols), source[0]), kept_cols, kept_cnt))
+
+            rows = np.concatenate([part[0] for part in parts])
+            order = np.argsort(rows, kind="stable")
+            n_rows = max(len(lengths), int(touched.max()) + 1 if len(touched) else 0)
+            indptr = np.zeros(n_rows + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+            indices = np.concatenate([part[1] for part in parts])[order].astype(np.int32)
+            counts = np.concatenate([part[2] for part in parts])[order].astype(np.int32)
+            with self._lock:
+                if self._generation == generation:
+                    self._data = (indptr, indices, counts, self._data[3])
+                    self._folding = {}
+                    self._generation += 1
+                    self.compactions += 1
+        except Exception:
+            logger.exception("No se pudo compactar el índice de recomendaciones")
+        finally:
+            with self._lock:
+                # Si falló, el overlay vuelve a `_delta` para no perder cambios
+                if self._folding:
+                    for anime_id, row in self._folding.items():
+                        target = self._delta.setdefault(anime_id, {})
+                        for other, step in row.items():
+                            target[other] = target.get(other, 0) + step
+                    self._folding = {}
+                self._compacting = False
+
+    @staticmethod
+    def _top(cols, scores, limit: int):
+        positive = scores > 0
+        cols, scores = cols[positive], scores[positive]
+        if len(cols) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            cols, scores = cols[top], scores[top]
+        order = np.lexsort((cols, -scores))
+        return list(zip(cols[order].tolist(), scores[order].tolist()))
+
+    def _scores(self, data, anime_ids):
+        """Similarity of every candidate to `anime_ids`, summed per candidate."""
+        popularity = data[3]
+        sources, cols, cnt = self._entries(data, anime_ids)
+        if not len(cols):
+            return cols, np.zeros(0)
+        # Cada par se suma (base + overlay) y se acota a 0 antes de puntuar
+        width = len(popularity)
+        keys, inverse = np.unique(sources * width + cols, return_inverse=True)
+        cnt = np.maximum(np.bincount(inverse, weights=cnt), 0)
+        sources, cols = keys // width, keys % width
+        scores = cnt / np.sqrt(
+            np.maximum(popularity[sources], 1) * np.maximum(popularity[cols], 1)
+        )
+        candidates, inverse = np.unique(cols, return_inverse=True)
+        return candidates, np.bincount(inverse, weights=scores)
+
+    def similar(self, anime_id: int, limit: int = 10):
+        """`[(anime_id, score), ...]` most similar to `anime_id`, best first."""
+        candidates, scores = self._scores(
+            self._data, np.array([anime_id], dtype=np.int64)
+        )
+        return self._top(candidates, scores, limit)
+
+    def recommend(self, favorites, limit: int = 10):
+        """
+        Animes most similar to the user's `favorites` as a whole: the sum of their
+        similarities to each favorite, leaving out the favorites themselves.
+        """
+        seeds = np.unique(np.asarray(favorites, dtype=np.int64))
+        if not len(seeds):
+            return []
+        candidates, scores = self._scores(self._data, seeds)
+        fresh = ~np.isin(candidates, seeds)
+        return self._top(candidates[fresh], scores[fresh], limit)
+
+    def stats(self):
+        data = self._data
+        if data is None:
+            return {"loaded": False}
+        indptr, indices, counts, popularity = data
+        return {
+            "loaded": True,
+            "animes": int((indptr[1:] > indptr[:-1]).sum()),
+            "pairs": len(indices),
+            "neighbors": self.neighbors,
+            "bytes": indptr.nbytes + indices.nbytes + counts.nbytes + popularity.nbytes,
+            "delta_pairs": self._delta_size,
+            "compactions": self.compactions,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+        }
+
+
+settings = get_settings()
+recommendations = CooccurrenceIndex(
+    settings.RECOMMENDATIONS_NEIGHBORS, settings.RECOMMENDATIONS_PAIR_SAMPLE
+)
+
+
+async def rebuild_periodically(engine, interval: float):
+    # La primera construcción también corre aquí, sin demorar el arranque: hasta
+    # que termine, los endpoints de recomendaciones responden 503
+    while True:
+        try:
+            await run_in_threadpool(recommendations.load, engine)
+        except Exception:
+            logger.exception("No se pudo reconstruir el índice de recomendaciones")
+        await asyncio.sleep(interval)
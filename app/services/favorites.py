@@ -0,0 +1,219 @@
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.anime import AnimeDB
+from ..models.database import dialect_insert
+from ..models.user import user_favorites
+from .anime import anime_exists, anime_not_found, write_existing_animes
+from .cooccurrence import recommendations
+from .popularity import bump_anime_counters
+from .user import bump_favorites_version
+
+
+def favorite_anime_ids(db: Session, user_id: int) -> List[int]:
+    return db.scalars(
+        select(user_favorites.c.anime_id).where(user_favorites.c.user_id == user_id)
+    ).all()
+
+
+def favorite_sample(db: Session, user_id: int, changed=()) -> Optional[List[int]]:
+    """
+    Up to `recommendations.pair_sample` of the user's favorites outside `changed`,
+    smallest ids first: one bounded range read on the (user_id, anime_id) PK,
+    whatever the size of the list. `None` while the index is neither loaded nor
+    being built.
+
+    Called after `bump_favorites_version`, whose row lock serializes the user's
+    concurrent changes, so each one sees the others' and no pair counts twice.
+    Past `pair_sample` favorites the sample of a remove may not be the one of the
+    earlier add; the index clamps the resulting pair counts at 0.
+    """
+    if not recommendations.tracking:
+        return None
+    changed = set(changed)
+    anime_ids = db.scalars(
+        select(user_favorites.c.anime_id)
+        .where(user_favorites.c.user_id == user_id)
+        .order_by(user_favorites.c.anime_id)
+        .limit(recommendations.pair_sample + len(changed))
+    ).all()
+    return [anime_id for anime_id in anime_ids if anime_id not in changed]
+
+
+def _update_recommendations(others, added=(), removed=()):
+    # Tras el commit; `others` es None si el índice no estaba cargado
+    if others is not None:
+        recommendations.favorites_changed(others, added, removed)
+
+
+def add_favorite(db: Session, user_id: int, anime_id: int):
+    if not anime_exists(db, anime_id):
+        raise HTTPException(status_code=404, detail="Anime no encontrado")
+    # La PK (user_id, anime_id) resuelve carreras: el duplicado no inserta filas
+    try:
+        result = db.execute(
+            dialect_insert(db, user_favorites)
+            .values(user_id=user_id, anime_id=anime_id)
+            .on_conflict_do_nothing()
+        )
+        if result.rowcount == 0:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="El anime ya está en favoritos")
+        bump_anime_counters(db, {anime_id: {"favorites_count": 1}})
+    except IntegrityError:
+        raise anime_not_found(db)
+    bump_favorites_version(db, user_id)
+    others = favorite_sample(db, user_id, [anime_id])
+    db.commit()
+    _update_recommendations(others, added=[anime_id])
+
+
+def remove_favorite(db: Session, user_id: int, anime_id: int):
+    if not anime_exists(db, anime_id):
+        raise HTTPException(status_code=404, detail="Anime no encontrado")
+    result = db.execute(
+        delete(user_favorites).where(
+            user_favorites.c.user_id == user_id,
+            user_favorites.c.anime_id == anime_id,
+        )
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="El anime no está en favoritos")
+    bump_anime_counters(db, {anime_id: {"favorites_count": -1}})
+    bump_favorites_version(db, user_id)
+    others = favorite_sample(db, user_id, [anime_id])
+    db.commit()
+    _update_recommendations(others, removed=[anime_id])
+
+
+def list_favorites(
+    db: Session, user_id: int, size: int, skip: int = 0, after: Optional[int] = None
+):
+    query = (
+        db.query(AnimeDB.id, AnimeDB.title)
+        .join(user_favorites, user_favorites.c.anime_id == AnimeDB.id)
+        .filter(user_favorites.c.user_id == user_id)
+        .order_by(AnimeDB.id)
+    )
+    if after is not None:
+        query = query.filter(AnimeDB.id > after)
+    else:
+        query = query.offset(skip)
+    return query.limit(size).all()
+
+
+def batch_update_favorites(db: Session, user_id: int, add: List[int], remove: List[int]):
+    """
+    Applies a set of additions and removals in one transaction with set-based SQL:
+    ids are validated against the catalog (one query at most), and the change is a
+    single multi-row `INSERT ... ON CONFLICT DO NOTHING RETURNING` plus a single
+    `DELETE ... RETURNING`. Results and counters come from the returned rows, so a
+    concurrent change to the same favorites is never counted twice.
+    """
+    add_ids = list(dict.fromkeys(add))
+    remove_ids = list(dict.fromkeys(remove))
+    if set(add_ids) & set(remove_ids):
+        raise HTTPException(
+            status_code=400, detail="Un anime no puede agregarse y removerse a la vez"
+        )
+    requested = add_ids + remove_ids
+    if not requested:
+        return []
+    return write_existing_animes(
+        db,
+        requested,
+        lambda existing: _write_favorites_batch(db, user_id, add_ids, remove_ids, existing),
+    )
+
+
+def _write_favorites_batch(db: Session, user_id: int, add_ids, remove_ids, existing):
+    to_insert = sorted(anime_id for anime_id in add_ids if anime_id in existing)
+    to_delete = sorted(anime_id for anime_id in remove_ids if anime_id in existing)
+    added = (
+        db.scalars(
+            dialect_insert(db, user_favorites)
+            .on_conflict_do_nothing()
+            .returning(user_favorites.c.anime_id),
+            [{"user_id": user_id, "anime_id": anime_id} for anime_id in to_insert],
+        ).all()
+        if to_insert
+        else []
+    )
+    removed = (
+        db.scalars(
+            delete(user_favorites)
+            .where(
+                user_favorites.c.user_id == user_id,
+                user_favorites.c.anime_id.in_(to_delete),
+            )
+            .returning(user_favorites.c.anime_id)
+        ).all()
+        if to_delete
+        else []
+    )
+
+    results = []
+    added_ids, removed_ids = set(added), set(removed)
+    for anime_id in add_ids:
+        if anime_id not in existing:
+            result = "not_found"
+        elif anime_id in added_ids:
+            result = "added"
+        else:
+            result = "already_favorite"
+        results.append({"anime_id": anime_id, "action": "add", "result": result})
+    for anime_id in remove_ids:
+        if anime_id not in existing:
+            result = "not_found"
+        elif anime_id in removed_ids:
+            result = "removed"
+        else:
+            result = "not_favorite"
+        results.append({"anime_id": anime_id, "action": "remove", "result": result})
+
+    if added or removed:
+        deltas = {anime_id: {"favorites_count": 1} for anime_id in added}
+        deltas.update({anime_id: {"favorites_count": -1} for anime_id in removed})
+        bump_anime_counters(db, deltas)
+        bump_favorites_version(db, user_id)
+        others = favorite_sample(db, user_id, added + removed)
+        db.commit()
+        _update_recommendations(others, added, removed)
+    else:
+        db.commit()
+    return results
+
+
+def import_favorites(db: Session, user_id: int, anime_ids) -> int:
+    """
+    Adds `anime_ids` to the user's favorites with one batched INSERT,
+    skipping unknown animes and the ones already there. Returns how many were added.
+    """
+    return write_existing_animes(
+        db, anime_ids, lambda existing: _insert_favorites(db, user_id, sorted(existing))
+    )
+
+
+def _insert_favorites(db: Session, user_id: int, existing) -> int:
+    if not existing:
+        return 0
+    added = db.scalars(
+        dialect_insert(db, user_favorites)
+        .on_conflict_do_nothing()
+        .returning(user_favorites.c.anime_id),
+        [{"user_id": user_id, "anime_id": anime_id} for anime_id in existing],
+    ).all()
+    if added:
+        bump_anime_counters(db, {anime_id: {"favorites_count": 1} for anime_id in added})
+        bump_favorites_version(db, user_id)
+        others = favorite_sample(db, user_id, added)
+        db.commit()
+        _update_recommendations(others, added)
+    else:
+        db.commit()
+    return len(added)
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+
+class HashingPool:
+    """
+    Fixed-size executor for bcrypt work with admission control.
+
+    At most `workers` hashes run at once and at most `queue_depth` more wait for a
+    worker; anything beyond that is rejected right away with a 503 instead of
+    queueing behind a burst of logins. bcrypt releases the GIL, so threads give
+    real parallelism without the pickling cost of a process pool.
+    """
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _timed(self, enqueued_at, fn, args):
+        waited = time.perf_counter() - enqueued_at
+        with self._lock:
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        try:
+            return fn(*args)
+        finally:
+            # Se cuenta en el hilo: el hash terminó aunque ya nadie espere el resultado
+            with self._lock:
+                self.completed += 1
+
+    def _release(self, future):
+        # Al terminar o cancelarse antes de empezar, no cuando se cancela quien espera
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_depth:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servidor ocupado, intenta de nuevo",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += 1
+        future = self._executor.submit(self._timed, time.perf_counter(), fn, args)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds_avg": (
+                    self.wait_seconds_total / self.completed if self.completed else 0.0
+                ),
+                "wait_seconds_max": self.wait_seconds_max,
+            }
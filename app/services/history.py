@@ -0,0 +1,189 @@
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.anime import AnimeDB
+from ..models.database import dialect_insert
+from ..models.history import UserHistory
+from ..models.user import UserDB
+from .anime import anime_exists, anime_not_found, write_existing_animes
+from .popularity import STATUS_COUNTERS, bump_anime_counters, status_change
+from .user import bump_history_version, bump_history_versions
+
+# Órdenes de GET /api/user/history: por inserción o por última actualización
+HISTORY_ORDERS = ("added", "updated")
+
+
+def upsert_history(db: Session, user_id: int, anime_id: int, status: str):
+    if not anime_exists(db, anime_id):
+        raise HTTPException(status_code=404, detail="Anime no encontrado")
+    # El estado anterior decide qué contador de anime_stats se mueve
+    previous = db.scalar(
+        select(UserHistory.status)
+        .where(UserHistory.user_id == user_id, UserHistory.anime_id == anime_id)
+        .with_for_update()
+    )
+    statement = dialect_insert(db, UserHistory.__table__).values(
+        user_id=user_id, anime_id=anime_id, status=status
+    )
+    changes = status_change(previous, status)
+    try:
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "anime_id"],
+                set_={
+                    "status": statement.excluded.status,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+        )
+        if changes:
+            bump_anime_counters(db, {anime_id: changes})
+    except IntegrityError:
+        raise anime_not_found(db)
+    bump_history_version(db, user_id, changes)
+    db.commit()
+
+
+def upsert_history_batch(db: Session, entries) -> int:
+    """
+    Writes `(user_id, anime_id, status, updated_at)` entries, one per key, with a
+    single batched upsert and the matching counter and version bumps, in one
+    transaction. `updated_at` is when each entry was written by the user, which
+    for buffered or imported entries is earlier than now. Entries for animes
+    deleted in the meantime are dropped. Returns how many entries were written.
+    """
+    return write_existing_animes(
+        db,
+        {entry[1] for entry in entries},
+        lambda existing: _write_history_batch(
+            db, sorted(entry for entry in entries if entry[1] in existing)
+        ),
+    )
+
+
+def _write_history_batch(db: Session, entries) -> int:
+    if not entries:
+        return 0
+    keys = [(user_id, anime_id) for user_id, anime_id, _, _ in entries]
+    previous = {
+        (user_id, anime_id): status
+        for user_id, anime_id, status in db.execute(
+            select(UserHistory.user_id, UserHistory.anime_id, UserHistory.status)
+            .where(tuple_(UserHistory.user_id, UserHistory.anime_id).in_(keys))
+            .with_for_update()
+        )
+    }
+    statement = dialect_insert(db, UserHistory.__table__)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["user_id", "anime_id"],
+            set_={
+                "status": statement.excluded.status,
+                "updated_at": statement.excluded.updated_at,
+            },
+        ),
+        [
+            {
+                "user_id": user_id,
+                "anime_id": anime_id,
+                "status": status,
+                "updated_at": updated_at,
+            }
+            for user_id, anime_id, status, updated_at in entries
+        ],
+    )
+    # Los mismos deltas mueven anime_stats (por anime) y los contadores de users
+    deltas, user_deltas = {}, {}
+    for user_id, anime_id, status, _ in entries:
+        user_changes = user_deltas.setdefault(user_id, {})
+        for name, delta in status_change(previous.get((user_id, anime_id)), status).items():
+            changes = deltas.setdefault(anime_id, {})
+            changes[name] = changes.get(name, 0) + delta
+            user_changes[name] = user_changes.get(name, 0) + delta
+    bump_anime_counters(db, deltas)
+    bump_history_versions(db, user_deltas)
+    db.commit()
+    return len(entries)
+
+
+def remove_history(db: Session, user_id: int, anime_id: int):
+    removed = db.execute(
+        delete(UserHistory)
+        .where(UserHistory.user_id == user_id, UserHistory.anime_id == anime_id)
+        .returning(UserHistory.status)
+    ).first()
+    if removed is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=404, detail="Anime no encontrado en el historial"
+        )
+    changes = status_change(removed.status, None)
+    bump_anime_counters(db, {anime_id: changes})
+    bump_history_version(db, user_id, changes)
+    db.commit()
+
+
+def list_history(
+    db: Session,
+    user_id: int,
+    size: int,
+    skip: int = 0,
+    after=None,
+    status: Optional[str] = None,
+    order: str = "added",
+):
+    """
+    Returns `(anime_id, title, status, id, updated_at)` rows, optionally only those
+    with `status`. `order="added"` goes by history id, oldest first, and `after` is
+    the last id seen; `order="updated"` goes by `updated_at`, newest first, and
+    `after` is the last `(updated_at, id)` seen. The columns after `status` are only
+    needed for the cursor, not in the response body.
+    """
+    query = (
+        db.query(
+            UserHistory.anime_id,
+            AnimeDB.title,
+            UserHistory.status,
+            UserHistory.id,
+            UserHistory.updated_at,
+        )
+        .join(AnimeDB, AnimeDB.id == UserHistory.anime_id)
+        .filter(UserHistory.user_id == user_id)
+    )
+    if status is not None:
+        query = query.filter(UserHistory.status == status)
+    if order == "updated":
+        query = query.order_by(UserHistory.updated_at.desc(), UserHistory.id.desc())
+        if after is not None:
+            query = query.filter(
+                tuple_(UserHistory.updated_at, UserHistory.id) < tuple_(*after)
+            )
+    else:
+        query = query.order_by(UserHistory.id)
+        if after is not None:
+            query = query.filter(UserHistory.id > after)
+    if after is None:
+        query = query.offset(skip)
+    return query.limit(size).all()
+
+
+def reconcile_user_history_counts(connection) -> int:
+    """
+    Recomputes the per-user history counters of `users` from `user_history` and
+    writes only the users that drifted. Returns how many were fixed.
+    """
+    counts = {
+        name: select(func.count())
+        .where(UserHistory.user_id == UserDB.id, UserHistory.status == status)
+        .scalar_subquery()
+        for status, name in STATUS_COUNTERS.items()
+    }
+    return connection.execute(
+        update(UserDB)
+        .where(or_(*(getattr(UserDB, name) != count for name, count in counts.items())))
+        .values(**counts)
+    ).rowcount
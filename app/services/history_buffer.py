@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import time
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import DataError, IntegrityError
+
+from ..config import get_settings
+from ..models.database import SessionLocal
+from ..models.history import utcnow
+from .anime import anime_exists
+from .catalog import catalog
+from .history import remove_history, upsert_history_batch
+
+logger = logging.getLogger(__name__)
+
+# Errores de una escritura que dependen de sus datos, no de la conexión
+REJECTED = (DataError, IntegrityError, HTTPException)
+
+
+def _write_batch(entries):
+    """
+    Writes `entries` in one transaction and returns `(written, failed)`. If the
+    batch is rejected for its data (or an anime was deleted meanwhile, the 404),
+    the entries are written one by one so that a bad entry only fails itself;
+    connection errors still raise.
+    """
+    db = SessionLocal()
+    try:
+        try:
+            return upsert_history_batch(db, entries), []
+        except REJECTED:
+            db.rollback()
+            if len(entries) == 1:
+                return 0, entries
+        written, failed = 0, []
+        for entry in entries:
+            try:
+                written += upsert_history_batch(db, [entry])
+            except REJECTED:
+                db.rollback()
+                failed.append(entry)
+        return written, failed
+    finally:
+        db.close()
+
+
+class HistoryBuffer:
+    """
+    Write-behind buffer for `POST /api/user/history`.
+
+    Updates are kept per `(user_id, anime_id)` with only the last status and the
+    time it was received, which becomes the entry's `updated_at`, and written by a
+    background task in one transaction once `max_size` keys are
+    pending or every `interval` seconds. A user's pending updates are flushed
+    before their history is read or an entry is deleted, so neither sees stale
+    data. Everything runs on the event loop; only the batch write goes to a thread.
+
+    An entry whose write fails is retried with the next flush; after `max_attempts`
+    failed writes it is dropped and logged. A failed flush before a read is logged
+    and the read goes on with what is already in the database.
+
+    The buffer lives in one worker: with several workers, two updates of the same
+    entry sent within one `interval` to different workers may land in either order.
+    """
+
+    def __init__(self, max_size: int, interval: float, max_attempts: int):
+        self.max_size = max_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self._pending = {}
+        self._size = 0
+        # Serializa las escrituras del buffer con los DELETE de historial
+        self._lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._task = None
+        self.buffered = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_flush_seconds = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            # Con el lock tomado la tarea no está a mitad de una escritura
+            async with self._lock:
+                self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def add(self, db, user_id: int, anime_id: int, status: str):
+        known = catalog.contains(anime_id)
+        if known is None:
+            known = await db.run_sync(anime_exists, anime_id)
+        if not known:
+            raise HTTPException(status_code=404, detail="Anime no encontrado")
+        entries = self._pending.setdefault(user_id, {})
+        if anime_id in entries:
+            self.coalesced += 1
+        else:
+            self._size += 1
+        # Se sella al recibirla: es la hora de la actualización, no la de la escritura.
+        # Un estado nuevo empieza sin intentos fallidos
+        entries[anime_id] = (status, utcnow(), 0)
+        self.buffered += 1
+        if self._size >= self.max_size:
+            self._full.set()
+
+    def has_pending(self, user_id: int) -> bool:
+        return user_id in self._pending
+
+    async def flush(self, user_id: int = None):
+        """Writes everything pending, or only `user_id`'s entries."""
+        async with self._lock:
+            await self._flush_locked(user_id)
+
+    async def flush_before_read(self, user_id: int):
+        """
+        Writes `user_id`'s pending entries before a read of their history. A failed
+        write is logged instead of raised: the entries stay queued and the read
+        sees the database without them.
+        """
+        if not self.has_pending(user_id):
+            return
+        try:
+            await self.flush(user_id)
+        except Exception:
+            logger.exception(
+                "No se pudo escribir el historial pendiente del usuario %s antes de leerlo",
+                user_id,
+            )
+
+    async def _flush_locked(self, user_id: int = None):
+        if user_id is None:
+            batch, self._pending = self._pending, {}
+        elif user_id in self._pending:
+            batch = {user_id: self._pending.pop(user_id)}
+        else:
+            return
+        attempts = {}
+        entries = []
+        for uid, statuses in batch.items():
+            for anime_id, (status, updated_at, tries) in statuses.items():
+                attempts[uid, anime_id] = tries
+                entries.append((uid, anime_id, status, updated_at))
+        if not entries:
+            return
+        self._size -= len(entries)
+        started = time.perf_counter()
+        try:
+            written, failed = await run_in_threadpool(_write_batch, entries)
+        except Exception:
+            self.failed_flushes += 1
+            self._requeue(entries, attempts)
+            raise
+        self.flushed_rows += written
+        if failed:
+            self.failed_flushes += 1
+            self._requeue(failed, attempts)
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - started
+
+    def _requeue(self, entries, attempts):
+        # Se reencolan sin pisar estados más nuevos que hayan llegado entretanto;
+        # tras max_attempts escrituras fallidas la entrada se descarta
+        for uid, anime_id, status, updated_at in entries:
+            statuses = self._pending.setdefault(uid, {})
+            newer = statuses.get(anime_id)
+            if newer is not None and newer[1] >= updated_at:
+                continue
+            tries = attempts[uid, anime_id] + 1
+            if tries >= self.max_attempts:
+                self.dropped += 1
+                logger.error(
+                    "Descartada la entrada de historial usuario=%s anime=%s estado=%s "
+                    "updated_at=%s tras %s intentos fallidos",
+                    uid, anime_id, status, updated_at.isoformat(), tries,
+                )
+                if not statuses:
+                    del self._pending[uid]
+                continue
+            if newer is None:
+                self._size += 1
+            statuses[anime_id] = (status, updated_at, tries)
+
+    async def remove(self, db, user_id: int, anime_id: int):
+        async with self._lock:
+            statuses = self._pending.get(user_id, {})
+            pending = statuses.pop(anime_id, None)
+            if pending is not None:
+                self._size -= 1
+                if not statuses:
+                    del self._pending[user_id]
+            try:
+                await db.run_sync(remove_history, user_id, anime_id)
+            except HTTPException:
+                # Solo estaba en el buffer: borrarlo de ahí ya basta
+                if pending is None:
+                    raise
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("No se pudo escribir el buffer de historial")
+
+    def stats(self):
+        return {
+            "max_size": self.max_size,
+            "interval": self.interval,
+            "pending": self._size,
+            "buffered": self.buffered,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_flushes": self.failed_flushes,
+            "max_attempts": self.max_attempts,
+            "dropped": self.dropped,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+settings = get_settings()
+history_buffer = (
+    HistoryBuffer(
+        settings.HISTORY_FLUSH_SIZE,
+        settings.HISTORY_FLUSH_SECONDS,
+        settings.HISTORY_FLUSH_MAX_ATTEMPTS,
+    )
+    if settings.HISTORY_WRITE_BEHIND
+    else None
+)
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from fastapi import Request, Response
+
+CATALOG_CACHE_CONTROL = "public, no-cache"
+USER_CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Comparación débil (RFC 9110): se ignora el prefijo W/
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def cache_headers(etag: str, cache_control: str, vary: Optional[str] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = vary
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,124 @@
+from fastapi import HTTPException
+from sqlalchemy import BigInteger, Integer, String, cast, func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from ..models.anime import AnimeDB
+from ..models.history import UserHistory
+from ..models.user import UserDB, user_favorites
+from .popularity import STATUS_COUNTERS
+from .user import catalog_version_subquery
+
+LIBRARY_FIELDS = ("favorites", "history", "counts")
+
+
+def parse_fields(fields):
+    """`fields=favorites,counts` -> `{"favorites", "counts"}`; every part by default."""
+    if fields is None:
+        return set(LIBRARY_FIELDS)
+    wanted = {field.strip() for field in fields.split(",") if field.strip()}
+    invalid = wanted.difference(LIBRARY_FIELDS)
+    if invalid:
+        raise HTTPException(
+            status_code=400, detail=f"Campo inválido: {', '.join(sorted(invalid))}"
+        )
+    if not wanted:
+        raise HTTPException(status_code=400, detail="Campo inválido")
+    return wanted
+
+
+def _row(kind, anime_id=None, title=None, status=None, number=None):
+    # Todas las ramas del UNION ALL comparten columnas; las que no aplican van en NULL
+    return (
+        literal(kind).label("kind"),
+        (cast(null(), Integer) if anime_id is None else anime_id).label("anime_id"),
+        (cast(null(), String) if title is None else title).label("title"),
+        (cast(null(), String) if status is None else status).label("status"),
+        (cast(null(), BigInteger) if number is None else number).label("number"),
+    )
+
+
+def _page(query):
+    # Cada página va en una subconsulta: SQLite no admite LIMIT dentro de un UNION
+    return select(query.subquery())
+
+
+def get_library(db: Session, user_id: int, size: int, fields):
+    """
+    Reads the parts of the library named in `fields` in one `UNION ALL` statement,
+    together with the user's list versions and the catalog version for the ETag.
+    Returns `((favorites_version, history_version, catalog_version), library)`;
+    `library` only has the requested keys.
+    """
+    parts = [
+        select(*_row("favorites_version", number=UserDB.favorites_version)).where(
+            UserDB.id == user_id
+        ),
+        select(*_row("history_version", number=UserDB.history_version)).where(
+            UserDB.id == user_id
+        ),
+        select(*_row("catalog_version", number=catalog_version_subquery())),
+    ]
+    if "favorites" in fields:
+        parts.append(_page(
+            select(*_row("favorite", AnimeDB.id, AnimeDB.title, number=AnimeDB.id))
+            .join(user_favorites, user_favorites.c.anime_id == AnimeDB.id)
+            .where(user_favorites.c.user_id == user_id)
+            .order_by(AnimeDB.id)
+            .limit(size)
+        ))
+    if "history" in fields:
+        parts.append(_page(
+            select(*_row(
+                "history",
+                UserHistory.anime_id,
+                AnimeDB.title,
+                # El enum pasa a texto: todas las ramas del UNION usan el mismo tipo
+                cast(UserHistory.status, String),
+                UserHistory.id,
+            ))
+            .join(AnimeDB, AnimeDB.id == UserHistory.anime_id)
+            .where(UserHistory.user_id == user_id)
+            .order_by(UserHistory.id)
+            .limit(size)
+        ))
+    if "counts" in fields:
+        parts.append(
+            select(*_row("favorites_count", number=func.count())).where(
+                user_favorites.c.user_id == user_id
+            )
+        )
+        # Por estado salen de los contadores de users: no hace falta contar filas
+        parts.extend(
+            select(
+                *_row("history_count", status=literal(status), number=getattr(UserDB, name))
+            ).where(UserDB.id == user_id)
+            for status, name in STATUS_COUNTERS.items()
+        )
+
+    versions = {"favorites_version": 0, "history_version": 0, "catalog_version": 0}
+    favorites, history = [], []
+    counts = {"favorites": 0, "history": 0, **{status: 0 for status in STATUS_COUNTERS}}
+    for kind, anime_id, title, status, number in db.execute(union_all(*parts)):
+        if kind == "favorite":
+            favorites.append((number, {"anime_id": anime_id, "title": title}))
+        elif kind == "history":
+            history.append(
+                (number, {"anime_id": anime_id, "title": title, "status": status})
+            )
+        elif kind == "favorites_count":
+            counts["favorites"] = number
+        elif kind == "history_count":
+            counts[status] = number
+            counts["history"] += number
+        else:
+            versions[kind] = number or 0
+
+    # UNION ALL no garantiza el orden entre ramas: cada página se ordena aquí
+    library = {}
+    if "favorites" in fields:
+        library["favorites"] = [item for _, item in sorted(favorites, key=lambda row: row[0])]
+    if "history" in fields:
+        library["history"] = [item for _, item in sorted(history, key=lambda row: row[0])]
+    if "counts" in fields:
+        library["counts"] = counts
+    return tuple(versions.values()), library
@@ -0,0 +1,90 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+UNMATCHED_ROUTE = "unmatched"
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template, method and status code.",
+    ["route", "method", "status"],
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and method.",
+    ["route", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and request counts per route template
+    (`/api/user/favorites`, not the raw URL). Labelled children are resolved once
+    per (route, method, status) and cached, so the hot path does a dict lookup
+    instead of building label strings on every request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._latency = {}
+        self._requests = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = route.path if route is not None else UNMATCHED_ROUTE
+            method = scope["method"]
+
+            key = (path, method)
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = LATENCY.labels(path, method)
+            latency.observe(elapsed)
+
+            key = (path, method, status_code)
+            requests = self._requests.get(key)
+            if requests is None:
+                requests = self._requests[key] = REQUESTS.labels(
+                    path, method, str(status_code)
+                )
+            requests.inc()
+
+
+def render_metrics():
+    """
+    Exposition text for `/metrics`. With `PROMETHEUS_MULTIPROC_DIR` set (before the
+    workers start) every uvicorn worker writes to its own files in that directory
+    and this aggregates all of them; otherwise it reports the current process.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,57 @@
+import base64
+import binascii
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> str:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii")
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def encode_cursor(last_id: int) -> str:
+    return _encode(str(last_id))
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        last_id = int(_decode(cursor))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if last_id < 0:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return last_id
+
+
+def encode_timestamp_cursor(key) -> str:
+    """Cursor for lists ordered by a timestamp, with the row id breaking ties."""
+    timestamp, last_id = key
+    return _encode(f"{timestamp.isoformat()}|{last_id}")
+
+
+def decode_timestamp_cursor(cursor: str):
+    """Returns the `(timestamp, id)` encoded by `encode_timestamp_cursor`."""
+    timestamp, _, last_id = _decode(cursor).partition("|")
+    try:
+        return datetime.fromisoformat(timestamp), int(last_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def set_next_cursor(
+    response: Response, last_key, size: int, count: int, encode=encode_cursor
+):
+    # Solo hay siguiente página si la actual vino llena
+    if last_key is not None and count == size:
+        response.headers[NEXT_CURSOR_HEADER] = encode(last_key)
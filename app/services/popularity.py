@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_, select, true
+
+from ..config import get_settings
+from ..models.anime import AnimeDB
+from ..models.database import dialect_insert
+from ..models.history import UserHistory
+from ..models.stats import AnimeStats
+from ..models.user import user_favorites
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("favorites_count", "watching_count", "watched_count")
+# Contador de anime_stats que corresponde a cada estado del historial
+STATUS_COUNTERS = {"viendo": "watching_count", "visto": "watched_count"}
+# Criterios de /api/anime/top
+TOP_METRICS = {
+    "favorites": "favorites_count",
+    "viendo": "watching_count",
+    "visto": "watched_count",
+}
+
+TopEntry = namedtuple("TopEntry", ["anime_id", "title", "count"])
+
+
+def bump_anime_counters(db, deltas):
+    """
+    Adds `deltas` (`{anime_id: {counter: delta}}`) to `anime_stats` with one
+    batched upsert, in the caller's transaction. Rows go in `anime_id` order so
+    two concurrent batches lock them in the same order and cannot deadlock.
+    """
+    if not deltas:
+        return
+    rows = [
+        {"anime_id": anime_id, **{name: changes.get(name, 0) for name in COUNTERS}}
+        for anime_id, changes in sorted(deltas.items())
+    ]
+    # Parámetros aparte (executemany): la sentencia compilada se reutiliza en caché
+    # en lugar de compilar un VALUES con miles de parámetros en cada lote
+    statement = dialect_insert(db, AnimeStats.__table__)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["anime_id"],
+            set_={
+                name: AnimeStats.__table__.c[name] + statement.excluded[name]
+                for name in COUNTERS
+            },
+        ),
+        rows,
+    )
+
+
+def status_change(old_status, new_status) -> dict:
+    """Counter deltas for a history entry that goes from `old_status` to `new_status`."""
+    changes = {}
+    if old_status == new_status:
+        return changes
+    if old_status in STATUS_COUNTERS:
+        changes[STATUS_COUNTERS[old_status]] = -1
+    if new_status in STATUS_COUNTERS:
+        changes[STATUS_COUNTERS[new_status]] = 1
+    return changes
+
+
+def reconcile_anime_stats(connection) -> int:
+    """
+    Recomputes every counter from `user_favorites` and `user_history` and writes
+    only the rows that drifted (or are missing). Returns how many were fixed.
+    """
+    favorites = (
+        select(user_favorites.c.anime_id, func.count().label("total"))
+        .group_by(user_favorites.c.anime_id)
+        .subquery()
+    )
+    history = (
+        select(
+            UserHistory.anime_id,
+            func.count().filter(UserHistory.status == "viendo").label("watching"),
+            func.count().filter(UserHistory.status == "visto").label("watched"),
+        )
+        .group_by(UserHistory.anime_id)
+        .subquery()
+    )
+    source = (
+        select(
+            AnimeDB.id,
+            func.coalesce(favorites.c.total, 0),
+            func.coalesce(history.c.watching, 0),
+            func.coalesce(history.c.watched, 0),
+        )
+        .outerjoin(favorites, favorites.c.anime_id == AnimeDB.id)
+        .outerjoin(history, history.c.anime_id == AnimeDB.id)
+        # SQLite necesita un WHERE para distinguir el ON CONFLICT de un JOIN
+        .where(true())
+    )
+    table = AnimeStats.__table__
+    statement = dialect_insert(connection, table).from_select(
+        ["anime_id", *COUNTERS], source
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["anime_id"],
+        set_={name: statement.excluded[name] for name in COUNTERS},
+        where=or_(*(table.c[name] != statement.excluded[name] for name in COUNTERS)),
+    )
+    return connection.execute(statement).rowcount
+
+
+class TopAnimes:
+    """
+    The `size` most favorited / watched animes per criterion, kept in memory.
+    A refresh is one `ORDER BY counter DESC LIMIT size` per criterion, served by
+    the counter indexes, so it can run every few seconds.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lists = None
+        self.loaded_at = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._lists is not None
+
+    def load(self, engine):
+        lists = {}
+        with engine.connect() as connection:
+            for metric, name in TOP_METRICS.items():
+                counter = AnimeStats.__table__.c[name]
+                rows = connection.execute(
+                    select(AnimeStats.anime_id, AnimeDB.title, counter)
+                    .join(AnimeDB, AnimeDB.id == AnimeStats.anime_id)
+                    .where(counter > 0)
+                    .order_by(counter.desc(), AnimeStats.anime_id)
+                    .limit(self.size)
+                )
+                lists[metric] = [TopEntry(*row) for row in rows]
+        self._lists = lists
+        self.loaded_at = time.time()
+
+    def top(self, metric: str, limit: int):
+        return self._lists[metric][:limit]
+
+    def stats(self):
+        if self._lists is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "size": self.size,
+            "entries": {metric: len(rows) for metric, rows in self._lists.items()},
+            "loaded_at": self.loaded_at,
+        }
+
+
+top_animes = TopAnimes(get_settings().ANIME_TOP_SIZE)
+
+
+async def refresh_top_periodically(engine, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(top_animes.load, engine)
+        except Exception:
+            logger.exception("No se pudo refrescar el top de animes")
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of raw bearer token -> authenticated principal.
+
+    Entries expire at the token's own `exp` or after `ttl` seconds, whichever comes
+    first, so a principal is never served past the life of its token. The cache is
+    per process: invalidation only reaches the worker that saw the change, and the
+    TTL bounds staleness on the others.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        if self.maxsize <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, exp: float, principal):
+        if self.maxsize <= 0:
+            return
+        expires_at = min(exp, time.time() + self.ttl)
+        with self._lock:
+            self._entries[token] = (expires_at, principal)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            stale = [
+                token
+                for token, (_, principal) in self._entries.items()
+                if principal.id == user_id
+            ]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,129 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "request_profile", default=None
+)
+
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, route: str, budget: int):
+        super().__init__(f"{route} superó su presupuesto de {budget} consultas SQL")
+        self.route = route
+        self.budget = budget
+
+
+class RequestProfile:
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slow = []
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        path = route.path if route is not None else self.scope["path"]
+        return f"{self.scope['method']} {path}"
+
+
+class QueryProfiler:
+    """
+    Counts SQL statements and DB time per request through engine events.
+
+    The active request is tracked in a context variable, which follows the request
+    into the threadpool and into `run_sync`, so every statement is attributed to the
+    request that issued it. Statements slower than `slow_ms` are logged with their
+    route once the request ends. With `enforce` on, a statement that takes a route
+    over its budget raises `QueryBudgetExceeded` at the offending call site.
+    """
+
+    def __init__(
+        self,
+        slow_ms: float,
+        budgets: Dict[str, int],
+        default_budget: int = 0,
+        enforce: bool = False,
+    ):
+        self.slow_seconds = slow_ms / 1000
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.enforce = enforce
+
+    def instrument(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        if profile is None:
+            return
+        profile.queries += 1
+        if self.enforce:
+            budget = self.budgets.get(profile.route, self.default_budget)
+            if budget and profile.queries > budget:
+                raise QueryBudgetExceeded(profile.route, budget)
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        if profile is None:
+            return
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        profile.db_seconds += elapsed
+        if elapsed >= self.slow_seconds:
+            profile.slow.append((elapsed, statement))
+
+    def log_slow(self, profile: RequestProfile):
+        for elapsed, statement in sorted(profile.slow, reverse=True)[:3]:
+            logger.warning(
+                "Consulta lenta en %s: %.1f ms: %s",
+                profile.route,
+                elapsed * 1000,
+                " ".join(statement.split())[:500],
+            )
+
+
+class QueryProfilerMiddleware:
+    """
+    Opens a `RequestProfile` per HTTP request and reports it in a `Server-Timing`
+    header (`db` time and query count, plus total `app` time).
+    """
+
+    def __init__(self, app, profiler: QueryProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope)
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - start) * 1000
+                timing = (
+                    f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.queries} queries", '
+                    f"app;dur={total_ms:.1f}"
+                )
+                message.setdefault("headers", []).append(
+                    (b"server-timing", timing.encode("latin-1"))
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            if profile.slow:
+                self.profiler.log_slow(profile)
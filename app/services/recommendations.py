@@ -0,0 +1,34 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .anime import anime_exists, anime_titles
+from .cooccurrence import recommendations
+from .favorites import favorite_anime_ids
+
+
+def _require_index():
+    if not recommendations.loaded:
+        raise HTTPException(status_code=503, detail="Recomendaciones no disponibles")
+
+
+def _with_titles(db: Session, scored):
+    titles = anime_titles(db, [anime_id for anime_id, _ in scored])
+    return [
+        {"anime_id": anime_id, "title": titles[anime_id], "score": round(score, 6)}
+        for anime_id, score in scored
+        # Un anime borrado sigue en el índice hasta la siguiente reconstrucción
+        if anime_id in titles
+    ]
+
+
+def similar_animes(db: Session, anime_id: int, limit: int):
+    _require_index()
+    if not anime_exists(db, anime_id):
+        raise HTTPException(status_code=404, detail="Anime no encontrado")
+    return _with_titles(db, recommendations.similar(anime_id, limit))
+
+
+def recommended_animes(db: Session, user_id: int, limit: int):
+    _require_index()
+    favorites = favorite_anime_ids(db, user_id)
+    return _with_titles(db, recommendations.recommend(favorites, limit))
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models.database import dialect_insert
+from ..models.denylist import TokenDenylist
+from ..models.user import UserDB
+
+logger = logging.getLogger(__name__)
+
+
+def token_key(token_id: str) -> str:
+    return f"jti:{token_id}"
+
+
+def user_version_key(user_id: int, version: int) -> str:
+    return f"user:{user_id}:{version}"
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings: `bits` bits and `hashes` positions per
+    key, taken from one blake2b digest by double hashing. Never gives a false
+    negative; false positives happen at about the rate it was sized for.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        capacity = max(capacity, 1)
+        self.bits = max(
+            64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        array = self._array
+        return all(
+            array[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationList:
+    """
+    In-memory Bloom filter over `token_denylist`, so checking whether a token was
+    revoked costs no query unless the filter says it might be: only then is the
+    key looked up in the table, which rules out the filter's false positives.
+
+    Revocations made in this worker are added to the filter right away; the ones
+    made in other workers are seen once `refresh` notices that the table changed
+    (its row count or highest id), which rebuilds the filter from the live rows.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self._filter = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.maybe_revoked = 0
+        self.revoked = 0
+        self.rebuilds = 0
+        self.built_at = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._filter is not None
+
+    def load(self, engine):
+        # Solo lee: las entradas vencidas las borra `python -m app.reconcile`
+        now = int(time.time())
+        with engine.connect() as connection:
+            signature = self._read_signature(connection)
+            keys = connection.scalars(
+                select(TokenDenylist.key).where(TokenDenylist.expires_at >= now)
+            ).all()
+        bloom = BloomFilter(max(self.capacity, 2 * len(keys)), self.false_positive_rate)
+        for key in keys:
+            bloom.add(key)
+        with self._lock:
+            self._filter = bloom
+            self._signature = signature
+        self.rebuilds += 1
+        self.built_at = time.time()
+        logger.info("Lista de tokens revocados: %d entradas", len(keys))
+
+    def refresh(self, engine) -> bool:
+        with engine.connect() as connection:
+            signature = self._read_signature(connection)
+        if signature != self._signature:
+            self.load(engine)
+            return True
+        return False
+
+    @staticmethod
+    def _read_signature(connection):
+        return tuple(
+            connection.execute(
+                select(func.count(), func.max(TokenDenylist.id))
+            ).one()
+        )
+
+    def add(self, key: str):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(key)
+
+    def might_contain(self, key: str) -> bool:
+        """`True` when `key` may be revoked (or the filter is not loaded yet)."""
+        self.checks += 1
+        bloom = self._filter
+        if bloom is None or key in bloom:
+            self.maybe_revoked += 1
+            return True
+        return False
+
+    def stats(self):
+        bloom = self._filter
+        if bloom is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "entries": bloom.count,
+            "bits": bloom.bits,
+            "hashes": bloom.hashes,
+            "bytes": len(bloom._array),
+            "checks": self.checks,
+            "maybe_revoked": self.maybe_revoked,
+            "revoked": self.revoked,
+            "rebuilds": self.rebuilds,
+            "built_at": self.built_at,
+        }
+
+
+def denylist_contains(db: Session, keys) -> bool:
+    return (
+        db.scalar(
+            select(TokenDenylist.id).where(TokenDenylist.key.in_(keys)).limit(1)
+        )
+        is not None
+    )
+
+
+def prune_denylist(connection) -> int:
+    """
+    Deletes the denylist entries whose token has expired anyway. Returns how many
+    were deleted. Run from `app.reconcile`, not by the workers: each delete changes
+    the table signature and makes every worker rebuild its filter.
+    """
+    return connection.execute(
+        delete(TokenDenylist).where(TokenDenylist.expires_at < int(time.time()))
+    ).rowcount
+
+
+def _deny(db: Session, key: str, expires_at: int):
+    db.execute(
+        dialect_insert(db, TokenDenylist.__table__)
+        .values(key=key, expires_at=expires_at)
+        .on_conflict_do_nothing()
+    )
+
+
+def revoke_token(db: Session, token_id: str, expires_at: int):
+    """Revokes one token until its own expiry."""
+    key = token_key(token_id)
+    _deny(db, key, expires_at)
+    db.commit()
+    revocations.add(key)
+
+
+def revoke_user_tokens(db: Session, user_id: int, lifetime_seconds: int):
+    """
+    Revokes every token issued so far to the user: their `token_version` goes up,
+    so new tokens carry the new one, and the previous version is denylisted for
+    as long as a token issued just now could live.
+    """
+    version = db.scalar(
+        update(UserDB)
+        .where(UserDB.id == user_id)
+        .values(token_version=UserDB.token_version + 1)
+        .returning(UserDB.token_version)
+    )
+    key = user_version_key(user_id, version - 1)
+    _deny(db, key, int(time.time()) + lifetime_seconds)
+    db.commit()
+    revocations.add(key)
+
+
+async def refresh_revocations_periodically(engine, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(revocations.refresh, engine)
+        except Exception:
+            logger.exception("No se pudo actualizar la lista de tokens revocados")
+
+
+settings = get_settings()
+revocations = RevocationList(
+    settings.AUTH_DENYLIST_CAPACITY, settings.AUTH_DENYLIST_FALSE_POSITIVE_RATE
+)
@@ -0,0 +1,539 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from ..config import get_settings
+from ..models.anime import AnimeDB
+from .catalog import get_catalog_version
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase words without accents or punctuation: "Re:Zero - Kara" -> "re zero kara"."""
+    if not text.isascii():
+        text = "".join(
+            char
+            for char in unicodedata.normalize("NFKD", text)
+            if not unicodedata.combining(char)
+        )
+    return _SEPARATORS.sub(" ", text.casefold()).strip()
+
+
+def title_terms(words) -> set:
+    """
+    Terms indexed for a title: its words plus each pair of neighbours joined when
+    one of them is short, so "rezero" or "drstone" find "Re:Zero" and "Dr. Stone".
+    """
+    terms = set(words)
+    for first, second in zip(words, words[1:]):
+        if min(len(first), len(second)) <= 3:
+            terms.add(first + second)
+    return terms
+
+
+def trigrams(word: str, prefix: bool = False) -> set:
+    """
+    pg_trgm-style trigrams of a word ("  w", " wo", ..., "rd "), each one the
+    three code points packed in an int. With `prefix` the word may be incomplete,
+    so the trigram that marks its end is left out.
+    """
+    codes = [32, 32, *map(ord, word)] + ([] if prefix else [32])
+    return {
+        (codes[i] << 42) | (codes[i + 1] << 21) | codes[i + 2]
+        for i in range(len(codes) - 2)
+    }
+
+
+def build_gram_index(words):
+    """Trigram -> word positions, as sorted `grams` with CSR-style `(indptr, postings)`."""
+    if not words:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros(1, dtype=np.int64), empty.astype(np.int32)
+    text = "".join(f"  {word} \0" for word in words)
+    lengths = np.fromiter((len(word) + 4 for word in words), np.int64, len(words))
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    # Un NUL separa las palabras: ninguna ventana válida lo contiene
+    first, second, third = codes[:-2], codes[1:-1], codes[2:]
+    valid = (first != 0) & (second != 0) & (third != 0)
+    owners = np.repeat(np.arange(len(words), dtype=np.int32), lengths)[:-2]
+    grams, owners = ((first << 42) | (second << 21) | third)[valid], owners[valid]
+    # Una palabra puede repetir un trigrama ("nana"): se queda una sola vez
+    pairs = np.unique(np.stack([grams, owners.astype(np.int64)]), axis=1)
+    grams, owners = pairs[0], pairs[1].astype(np.int32)
+    starts = np.flatnonzero(np.r_[True, grams[1:] != grams[:-1]])
+    return grams[starts], np.append(starts, len(grams)).astype(np.int64), owners
+
+
+def edit_distance(a: str, b: str, limit: int, prefix: bool = False) -> int:
+    """
+    Optimal string alignment distance (a swap counts as one edit), capped at
+    `limit + 1`. With `prefix`, the distance from `a` to the closest start of `b`.
+    """
+    if prefix:
+        b = b[:len(a) + limit]
+    elif abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous = previous, current
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    if prefix:
+        return min(current[max(len(a) - limit, 0):])
+    return current[-1]
+
+
+def allowed_typos(word: str) -> int:
+    return 0 if len(word) < 4 else 1 if len(word) < 8 else 2
+
+
+class TitleSearchIndex:
+    """
+    In-memory search index over anime titles for `/api/anime/search`.
+
+    Titles are normalized (lowercase, no accents or punctuation) and split into
+    terms; each term has a sorted posting list of the titles that contain it. A
+    query word matches the same term, any term it is a prefix of when it is the
+    last word being typed, or, when neither exists, the terms within one or two
+    edits, found through a trigram index over the distinct terms and checked
+    with an edit distance. A title's score is the mean over the query words of
+    the best match it has (1 for exact/prefix, less per typo); ties go to the
+    title with fewer words and then to the lower id. Titles scoring less than
+    `RELATIVE_SCORE` times the best one are left out.
+
+    When the catalog version changes the titles are diffed against the index:
+    changed or new titles go to a small overlay and their old entries are
+    masked out, and only once the overlay passes `COMPACT_AT` is the index
+    rebuilt. Every update swaps in a whole new state, so readers never see a
+    half-applied change.
+    """
+
+    # Títulos en el overlay a partir de los cuales se reconstruye el índice
+    COMPACT_AT = 5_000
+    # Puntaje mínimo relativo al mejor resultado de la misma búsqueda
+    RELATIVE_SCORE = 0.5
+    # Términos más frecuentes que completan la última palabra
+    PREFIX_EXPANSIONS = 20
+    # Términos parecidos revisados con distancia de edición por palabra
+    TYPO_CANDIDATES = 100
+    # Títulos candidatos hasta los que se puntúa buscando en las listas; por
+    # encima se suman todas las listas en un arreglo denso
+    PROBE_AT = 50_000
+
+    def __init__(self, min_score: float = 0.3):
+        self.min_score = min_score
+        self._data = None
+        self._lock = threading.Lock()
+        self.built_at = None
+        self.build_seconds = None
+        self.synced_at = None
+        self.rebuilds = 0
+        self.incremental_syncs = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def version(self):
+        data = self._data
+        return data["version"] if data is not None else None
+
+    def replace(self, ids, titles, version: int):
+        started = time.perf_counter()
+        vocabulary = {}
+        term_ids, docs = [], []
+        doc_words = np.zeros(len(titles), dtype=np.uint16)
+        for doc, title in enumerate(titles):
+            words = normalize(title).split()
+            doc_words[doc] = min(len(words), np.iinfo(np.uint16).max)
+            for term in title_terms(words):
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                docs.append(doc)
+        terms = sorted(vocabulary)
+        rank = np.empty(len(terms), dtype=np.int32)
+        rank[np.fromiter((vocabulary[term] for term in terms), np.int64, len(terms))] = (
+            np.arange(len(terms), dtype=np.int32)
+        )
+        term_ids = rank[np.asarray(term_ids, dtype=np.int64)]
+        # Estable: los títulos se recorrieron en orden, así cada lista queda ordenada
+        order = np.argsort(term_ids, kind="stable")
+        postings = np.asarray(docs, dtype=np.int32)[order]
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=indptr[1:])
+        grams, gram_indptr, gram_postings = build_gram_index(terms)
+        self._data = {
+            "version": version,
+            "ids": np.asarray(ids, dtype=np.int32),
+            "fingerprints": np.fromiter(
+                (hash(title) for title in titles), np.int64, len(titles)
+            ),
+            "alive": np.ones(len(titles), dtype=bool),
+            "doc_words": doc_words,
+            "terms": terms,
+            "indptr": indptr,
+            "postings": postings,
+            "grams": grams,
+            "gram_indptr": gram_indptr,
+            "gram_postings": gram_postings,
+            # anime_id -> (huella del título, términos, palabras)
+            "overlay": {},
+            # Términos del overlay ordenados, sus trigramas y término -> anime_ids
+            "overlay_terms": [],
+            "overlay_grams": build_gram_index([]),
+            "overlay_postings": {},
+        }
+        self.rebuilds += 1
+        self.built_at = self.synced_at = time.time()
+        self.build_seconds = time.perf_counter() - started
+
+    def sync(self, ids, titles, version: int):
+        """
+        Brings the index up to `(ids, titles)`, sorted by id. Only the titles that
+        changed are re-indexed, unless the overlay grows past `COMPACT_AT`.
+        """
+        with self._lock:
+            data = self._data
+            if data is None:
+                self.replace(ids, titles, version)
+                return
+            ids = np.asarray(ids, dtype=np.int32)
+            fingerprints = np.fromiter(
+                (hash(title) for title in titles), np.int64, len(titles)
+            )
+            base_ids, alive = data["ids"], data["alive"].copy()
+            overlay = dict(data["overlay"])
+
+            # Entradas del índice base que siguen igual
+            same = np.zeros(len(ids), dtype=bool)
+            if len(base_ids):
+                positions = np.minimum(np.searchsorted(base_ids, ids), len(base_ids) - 1)
+                same = (
+                    (base_ids[positions] == ids)
+                    & alive[positions]
+                    & (data["fingerprints"][positions] == fingerprints)
+                )
+                kept = np.zeros(len(base_ids), dtype=bool)
+                kept[positions[same]] = True
+                alive &= kept
+
+            current = set(ids[~same].tolist())
+            for anime_id in list(overlay):
+                if anime_id not in current:
+                    del overlay[anime_id]
+            for index in np.flatnonzero(~same).tolist():
+                anime_id = int(ids[index])
+                fingerprint = int(fingerprints[index])
+                entry = overlay.get(anime_id)
+                if entry is None or entry[0] != fingerprint:
+                    words = normalize(titles[index]).split()
+                    overlay[anime_id] = (fingerprint, title_terms(words), len(words))
+            if len(overlay) > self.COMPACT_AT:
+                self.replace(ids, titles, version)
+                return
+            overlay_postings = {}
+            for anime_id, (_, terms, _) in overlay.items():
+                for term in terms:
+                    overlay_postings.setdefault(term, []).append(anime_id)
+            overlay_terms = sorted(overlay_postings)
+            self._data = {
+                **data,
+                "version": version,
+                "alive": alive,
+                "overlay": overlay,
+                "overlay_terms": overlay_terms,
+                "overlay_grams": build_gram_index(overlay_terms),
+                "overlay_postings": overlay_postings,
+            }
+            self.incremental_syncs += 1
+            self.synced_at = time.time()
+
+    def _read(self, connection):
+        rows = connection.execution_options(yield_per=50_000).execute(
+            select(AnimeDB.id, AnimeDB.title).order_by(AnimeDB.id)
+        )
+        ids, titles = [], []
+        for anime_id, title in rows:
+            ids.append(anime_id)
+            titles.append(title or "")
+        return ids, titles
+
+    def load(self, engine):
+        with engine.connect() as connection:
+            version = get_catalog_version(connection)
+            ids, titles = self._read(connection)
+        with self._lock:
+            self.replace(ids, titles, version)
+        logger.info(
+            "Índice de búsqueda: %d títulos en %.1f s", len(ids), self.build_seconds
+        )
+
+    def refresh(self, engine) -> bool:
+        with engine.connect() as connection:
+            version = get_catalog_version(connection)
+            if version == self.version:
+                return False
+            ids, titles = self._read(connection)
+        self.sync(ids, titles, version)
+        return True
+
+    @staticmethod
+    def _prefixed(terms, word: str):
+        """Range of the sorted `terms` that start with `word`."""
+        start = bisect_left(terms, word)
+        return start, bisect_left(terms, word + "\U0010ffff", start)
+
+    def _expand(self, data, word: str, prefix: bool) -> dict:
+        """`{term: similarity}` of the terms that `word` matches."""
+        terms, indptr = data["terms"], data["indptr"]
+        start, stop = self._prefixed(terms, word) if prefix else (0, 0)
+        if stop - start > self.PREFIX_EXPANSIONS:
+            # Demasiadas formas de completar: se quedan las más frecuentes
+            frequency = indptr[start + 1:stop + 1] - indptr[start:stop]
+            top = np.argpartition(-frequency, self.PREFIX_EXPANSIONS)
+            matches = {terms[start + i]: 1.0 for i in top[:self.PREFIX_EXPANSIONS].tolist()}
+        else:
+            matches = {terms[i]: 1.0 for i in range(start, stop)}
+        exact = bisect_left(terms, word)
+        if exact < len(terms) and terms[exact] == word:
+            matches[word] = 1.0
+        start, stop = self._prefixed(data["overlay_terms"], word) if prefix else (0, 0)
+        matches.update((term, 1.0) for term in data["overlay_terms"][start:stop])
+        if word in data["overlay_postings"]:
+            matches[word] = 1.0
+        if not matches and allowed_typos(word):
+            matches = self._typos(data, word, prefix)
+        return matches
+
+    def _typos(self, data, word: str, prefix: bool) -> dict:
+        """Terms within `allowed_typos(word)` edits; for a prefix, of their start."""
+        matches = self._close_terms(
+            data["terms"], data["grams"], data["gram_indptr"], data["gram_postings"],
+            word, prefix,
+        )
+        # Los títulos nuevos o renombrados desde la última reconstrucción
+        matches.update(
+            self._close_terms(data["overlay_terms"], *data["overlay_grams"], word, prefix)
+        )
+        return matches
+
+    def _close_terms(self, terms, grams, gram_indptr, gram_postings, word, prefix):
+        """`_typos` over one sorted term list and its trigram index."""
+        limit = allowed_typos(word)
+        keys = np.fromiter(trigrams(word, prefix), np.int64)
+        found = np.searchsorted(grams, keys)
+        inside = found < len(grams)
+        found = found[inside][grams[found[inside]] == keys[inside]]
+        if not len(found):
+            return {}
+        shared = np.bincount(np.concatenate(
+            [gram_postings[gram_indptr[i]:gram_indptr[i + 1]] for i in found.tolist()]
+        ))
+        # Cada edición cambia como mucho cuatro trigramas (un intercambio)
+        candidates = np.flatnonzero(shared >= len(keys) - 4 * limit)
+        if len(candidates) > self.TYPO_CANDIDATES:
+            top = np.argpartition(-shared[candidates], self.TYPO_CANDIDATES)
+            candidates = candidates[top[:self.TYPO_CANDIDATES]]
+        matches = {}
+        for index in candidates.tolist():
+            term = terms[index]
+            distance = edit_distance(word, term, limit, prefix)
+            if distance <= limit:
+                matches[term] = 1 - distance / len(word)
+        return matches
+
+    def search(self, query: str, limit: int = 10):
+        """`[(anime_id, score), ...]` best first; `score` is between 0 and 1."""
+        data = self._data
+        words = normalize(query).split()
+        if data is None or not words:
+            return []
+        # Si la consulta no termina en separador, la última palabra se está escribiendo
+        typing = not _SEPARATORS.match(query[-1])
+        expansions = [
+            self._expand(data, word, typing and i == len(words) - 1)
+            for i, word in enumerate(words)
+        ]
+        needed = self.min_score * len(words) - 1e-6
+
+        candidates = self._base_matches(data, expansions, needed, limit)
+        overlay_scores = {}
+        for matches in expansions:
+            best = {}
+            for term, similarity in matches.items():
+                for anime_id in data["overlay_postings"].get(term, ()):
+                    best[anime_id] = max(best.get(anime_id, 0), similarity)
+            for anime_id, similarity in best.items():
+                overlay_scores[anime_id] = overlay_scores.get(anime_id, 0) + similarity
+        candidates.extend(
+            (anime_id, score, data["overlay"][anime_id][2])
+            for anime_id, score in overlay_scores.items()
+            if score >= needed
+        )
+        candidates.sort(key=lambda item: (-round(item[1], 3), item[2], item[0]))
+        cutoff = self.RELATIVE_SCORE * candidates[0][1] - 1e-6 if candidates else 0
+        return [
+            (anime_id, score / len(words))
+            for anime_id, score, _ in candidates[:limit]
+            if score >= cutoff
+        ]
+
+    def _base_matches(self, data, expansions, needed: float, limit: int):
+        """
+        `(anime_id, score, words)` of the best base titles scoring at least `needed`.
+
+        Each query word adds at most 1 to a title's score, so scoring the titles
+        of the rarest word first gives a floor `t` for the results, and any title
+        reaching `t` contains one of the `m - t + 1` rarest of the `m` words. Only
+        those words' titles are scored, probing the lists of the common words with
+        a binary search; when even they are too many, every list is added up into
+        a dense array of scores instead.
+        """
+        terms, indptr, postings = data["terms"], data["indptr"], data["postings"]
+        words = []
+        for matches in expansions:
+            lists = []
+            for term, similarity in matches.items():
+                index = bisect_left(terms, term)
+                if index < len(terms) and terms[index] == term:
+                    lists.append((similarity, postings[indptr[index]:indptr[index + 1]]))
+            if lists:
+                words.append(lists)
+        if not words:
+            return []
+        sizes = sorted((sum(len(docs) for _, docs in lists), n) for n, lists in enumerate(words))
+        words = [words[n] for _, n in sizes]
+
+        if sizes[0][0] <= self.PROBE_AT:
+            docs = self._union(words[0])
+            scores = self._probe(words, docs)
+            ranked = np.sort(scores[data["alive"][docs]])[::-1]
+            if not len(ranked):
+                ranked = np.zeros(1, dtype=np.float32)
+            floor = max(
+                needed,
+                self.RELATIVE_SCORE * float(ranked[0]) - 1e-6,
+                float(ranked[limit - 1]) - 1e-6 if len(ranked) >= limit else 0,
+            )
+            essential = int(len(words) - floor + 1e-6) + 1
+            if sum(size for size, _ in sizes[:essential]) <= self.PROBE_AT:
+                essential = words[:essential]
+                if len(essential) > 1:
+                    docs = np.unique(np.concatenate([self._union(lists) for lists in essential]))
+                    scores = self._probe(words, docs)
+                return self._top(data, docs, scores, floor, limit)
+        scores = self._dense(len(data["ids"]), words)
+        scores *= data["alive"]
+        floor = max(needed, self.RELATIVE_SCORE * float(scores.max()) - 1e-6, 1e-6)
+        docs = np.flatnonzero(scores >= floor)
+        return self._top(data, docs, scores[docs], floor, limit)
+
+    @staticmethod
+    def _union(lists):
+        if len(lists) == 1:
+            return lists[0][1]
+        return np.unique(np.concatenate([docs for _, docs in lists]))
+
+    @staticmethod
+    def _probe(words, docs):
+        """Scores of the sorted `docs`: for each word, the best of its lists they are in."""
+        scores = np.zeros(len(docs), dtype=np.float32)
+        for lists in words:
+            best = np.zeros(len(docs), dtype=np.float32)
+            for similarity, posting in lists:
+                at = np.minimum(np.searchsorted(posting, docs), len(posting) - 1)
+                np.maximum(best, (posting[at] == docs) * np.float32(similarity), out=best)
+            scores += best
+        return scores
+
+    @staticmethod
+    def _dense(size: int, words):
+        scores = np.zeros(size, dtype=np.float32)
+        for lists in words:
+            if len(lists) == 1:
+                similarity, docs = lists[0]
+                scores[docs] += similarity
+                continue
+            # Cada título suma solo su mejor coincidencia para esta palabra
+            best = np.zeros(size, dtype=np.float32)
+            for similarity, docs in sorted(lists, key=lambda item: item[0]):
+                best[docs] = similarity
+            scores += best
+        return scores
+
+    @staticmethod
+    def _top(data, docs, scores, floor: float, limit: int):
+        keep = (scores >= floor) & data["alive"][docs]
+        docs, scores = docs[keep], scores[keep]
+        if len(docs) > limit:
+            # Mayor puntaje primero; a igualdad, el título con menos palabras y luego
+            # el id más bajo (los documentos van en orden de id)
+            quantized = np.rint(scores * 1000).astype(np.int64)
+            order = (
+                ((0xFFFF - quantized) << 47)
+                | (data["doc_words"][docs].astype(np.int64) << 31)
+                | docs
+            )
+            top = np.argpartition(order, limit)[:limit]
+            docs, scores = docs[top], scores[top]
+        return list(zip(
+            data["ids"][docs].tolist(),
+            scores.astype(float).tolist(),
+            data["doc_words"][docs].tolist(),
+        ))
+
+    def stats(self):
+        data = self._data
+        if data is None:
+            return {"loaded": False}
+        nbytes = sum(
+            data[name].nbytes
+            for name in (
+                "ids", "fingerprints", "alive", "doc_words", "indptr", "postings",
+                "grams", "gram_indptr", "gram_postings",
+            )
+        )
+        return {
+            "loaded": True,
+            "version": data["version"],
+            "titles": int(data["alive"].sum()) + len(data["overlay"]),
+            "terms": len(data["terms"]),
+            "postings": len(data["postings"]),
+            "bytes": nbytes,
+            "terms_bytes": sum(len(term) for term in data["terms"]),
+            "overlay_titles": len(data["overlay"]),
+            "rebuilds": self.rebuilds,
+            "incremental_syncs": self.incremental_syncs,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+            "synced_at": self.synced_at,
+        }
+
+
+title_search = TitleSearchIndex(get_settings().SEARCH_MIN_SCORE)
+
+
+async def refresh_search_periodically(engine, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(title_search.refresh, engine)
+        except Exception:
+            logger.exception("No se pudo actualizar el índice de búsqueda")
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from ..models.anime import AnimeDB
+from ..models.history import UserHistory, utcnow
+from ..models.user import user_favorites
+from .favorites import import_favorites
+from .history import upsert_history_batch
+from .popularity import STATUS_COUNTERS
+
+# Una línea más larga que esto no es una entrada válida: evita acumular el cuerpo entero
+MAX_LINE_BYTES = 64 * 1024
+# Errores por línea incluidos en el reporte; el resto solo se cuenta
+MAX_REPORTED_ERRORS = 20
+
+
+def export_library(session_factory, user_id: int, yield_per: int):
+    """
+    Yields the user's favorites and then their history as NDJSON, one chunk of
+    lines per `yield_per` rows read from a server-side cursor, so memory stays
+    constant however long the library is.
+
+    Runs on its own session: it outlives the request's dependencies, which are
+    closed before a streaming body is sent.
+    """
+    db = session_factory()
+    try:
+        favorites = db.execute(
+            select(AnimeDB.id, AnimeDB.title)
+            .join(user_favorites, user_favorites.c.anime_id == AnimeDB.id)
+            .where(user_favorites.c.user_id == user_id)
+            .order_by(AnimeDB.id)
+            .execution_options(yield_per=yield_per)
+        )
+        for rows in favorites.partitions():
+            yield b"".join(
+                orjson.dumps({"type": "favorite", "anime_id": anime_id, "title": title})
+                + b"\n"
+                for anime_id, title in rows
+            )
+        history = db.execute(
+            select(
+                UserHistory.anime_id, AnimeDB.title, UserHistory.status, UserHistory.updated_at
+            )
+            .join(AnimeDB, AnimeDB.id == UserHistory.anime_id)
+            .where(UserHistory.user_id == user_id)
+            .order_by(UserHistory.id)
+            .execution_options(yield_per=yield_per)
+        )
+        for rows in history.partitions():
+            # SQLite devuelve fechas sin zona: se escriben como UTC
+            yield b"".join(
+                orjson.dumps(
+                    {
+                        "type": "history",
+                        "anime_id": anime_id,
+                        "title": title,
+                        "status": status,
+                        "updated_at": updated_at,
+                    },
+                    option=orjson.OPT_NAIVE_UTC,
+                )
+                + b"\n"
+                for anime_id, title, status, updated_at in rows
+            )
+    finally:
+        db.close()
+
+
+def parse_entry(line: bytes):
+    """
+    `(type, anime_id, status, updated_at)` of an exported line; `title` is ignored
+    and `updated_at` is None when the line has none.
+    """
+    try:
+        entry = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        raise ValueError("JSON inválido")
+    if not isinstance(entry, dict):
+        raise ValueError("Se esperaba un objeto JSON")
+    anime_id = entry.get("anime_id")
+    if type(anime_id) is not int:
+        raise ValueError("anime_id inválido")
+    kind = entry.get("type")
+    if kind == "favorite":
+        return kind, anime_id, None, None
+    if kind == "history":
+        status = entry.get("status")
+        if status not in STATUS_COUNTERS:
+            raise ValueError("Estado inválido")
+        return kind, anime_id, status, _parse_updated_at(entry.get("updated_at"))
+    raise ValueError("Tipo inválido, se esperaba 'favorite' o 'history'")
+
+
+def _parse_updated_at(value):
+    if value is None:
+        return None
+    try:
+        updated_at = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError("updated_at inválido")
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return updated_at.astimezone(timezone.utc)
+
+
+def write_import_batch(db, user_id: int, favorites, history) -> tuple:
+    """
+    Writes one batch: `favorites` anime ids and `history`
+    {anime_id: (status, updated_at)}.
+    """
+    added = import_favorites(db, user_id, favorites) if favorites else 0
+    written = (
+        upsert_history_batch(
+            db,
+            [
+                (user_id, anime_id, status, updated_at)
+                for anime_id, (status, updated_at) in history.items()
+            ],
+        )
+        if history
+        else 0
+    )
+    return added, written
+
+
+async def import_library(db, user_id: int, chunks, batch_size: int):
+    """
+    Reads NDJSON from the async iterator of byte `chunks` as it arrives and writes
+    it in batches of `batch_size` entries (a batched insert for favorites and a
+    batched upsert for history, in one transaction per batch). The next batch is
+    parsed while the previous one is being written.
+
+    Invalid lines are skipped and reported; batches already written stay written
+    if the upload is cut. Within a batch the last status of an anime wins. History
+    lines without `updated_at` are stamped when they are read, so the file order is
+    kept by `order=updated`.
+    """
+    report = {
+        "lines": 0,
+        "favorites_added": 0,
+        "history_written": 0,
+        "ignored": 0,
+        "invalid": 0,
+        "errors": [],
+    }
+    favorites, history = {}, {}
+    writing = None
+    valid = 0
+
+    async def wait_for_write():
+        nonlocal writing
+        task, writing = writing, None
+        added, written = await task
+        report["favorites_added"] += added
+        report["history_written"] += written
+
+    async def write_batch():
+        nonlocal writing, favorites, history
+        if writing is not None:
+            await wait_for_write()
+        writing = asyncio.ensure_future(
+            db.run_sync(write_import_batch, user_id, list(favorites), history)
+        )
+        favorites, history = {}, {}
+
+    started = time.perf_counter()
+    pending = b""
+    try:
+        async for chunk in chunks:
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            if len(pending) > MAX_LINE_BYTES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Línea {report['lines'] + len(lines) + 1} demasiado larga",
+                )
+            for line in lines:
+                valid += _add_line(report, line, favorites, history)
+                if len(favorites) + len(history) >= batch_size:
+                    await write_batch()
+        if pending:
+            valid += _add_line(report, pending, favorites, history)
+        if favorites or history:
+            await write_batch()
+    finally:
+        # Nunca se deja una escritura a medias corriendo en segundo plano
+        if writing is not None:
+            await wait_for_write()
+
+    elapsed = time.perf_counter() - started
+    report["ignored"] = valid - report["favorites_added"] - report["history_written"]
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["lines"] / elapsed) if elapsed else 0
+    return report
+
+
+def _add_line(report, line: bytes, favorites, history) -> int:
+    report["lines"] += 1
+    if not line.strip():
+        return 0
+    try:
+        kind, anime_id, status, updated_at = parse_entry(line)
+    except ValueError as error:
+        report["invalid"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": report["lines"], "detail": str(error)})
+        return 0
+    if kind == "favorite":
+        favorites[anime_id] = None
+    else:
+        history[anime_id] = (status, updated_at or utcnow())
+    return 1
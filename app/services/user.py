@@ -0,0 +1,85 @@
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from ..models.catalog import CatalogVersion
+from ..models.user import UserDB
+from .popularity import STATUS_COUNTERS
+
+
+def create_user(db: Session, email: str, hashed_password: str):
+    db_user = UserDB(email=email, hashed_password=hashed_password)
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+def get_library_versions(db: Session, user_id: int):
+    """
+    Returns `(favorites_version, history_version, watching_count, watched_count,
+    catalog_version)` for the user: the list versions, the history counters and the
+    catalog version (the lists show titles, so a rename changes them too), in one
+    lookup.
+    """
+    return db.execute(
+        select(
+            UserDB.favorites_version,
+            UserDB.history_version,
+            UserDB.watching_count,
+            UserDB.watched_count,
+            func.coalesce(catalog_version_subquery(), 0).label("catalog_version"),
+        ).where(UserDB.id == user_id)
+    ).one()
+
+
+def catalog_version_subquery():
+    return (
+        select(CatalogVersion.version).where(CatalogVersion.id == 1).scalar_subquery()
+    )
+
+
+def bump_favorites_version(db: Session, user_id: int):
+    db.execute(
+        update(UserDB)
+        .where(UserDB.id == user_id)
+        .values(favorites_version=UserDB.favorites_version + 1)
+    )
+
+
+def bump_history_version(db: Session, user_id: int, changes=None):
+    """Bumps the history version and adds `changes` (`{counter: delta}`) to the counters."""
+    values = {"history_version": UserDB.history_version + 1}
+    for name, delta in (changes or {}).items():
+        values[name] = getattr(UserDB, name) + delta
+    db.execute(update(UserDB).where(UserDB.id == user_id).values(**values))
+
+
+def bump_history_versions(db: Session, deltas):
+    """
+    `bump_history_version` for many users (`{user_id: {counter: delta}}`) in one
+    executemany, in `user_id` order so concurrent batches lock rows alike.
+    """
+    statement = (
+        update(UserDB)
+        .where(UserDB.id == bindparam("user_id"))
+        .values(
+            history_version=UserDB.history_version + 1,
+            **{
+                name: getattr(UserDB, name) + bindparam(f"{name}_delta")
+                for name in STATUS_COUNTERS.values()
+            },
+        )
+    )
+    db.connection().execute(
+        statement,
+        [
+            {
+                "user_id": user_id,
+                **{
+                    f"{name}_delta": changes.get(name, 0)
+                    for name in STATUS_COUNTERS.values()
+                },
+            }
+            for user_id, changes in sorted(deltas.items())
+        ],
+    )
@@ -0,0 +1,129 @@
+"""
+Per-request cost of authentication (`get_current_user`) in the DB-backed and
+stateless (`AUTH_STATELESS`) modes, with and without the principal cache.
+
+Each request opens its sessions the way the routers do and authenticates one of
+`--users` tokens, picked at random, so the principal cache sees a realistic mix
+of hits and misses. `--revoked` tokens are revoked first, to show the cost of
+the Bloom filter check and of its rare confirmations in the database.
+
+    python -m benchmarks.bench_auth --url postgresql://... --users 10000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_auth.db")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import create_engine, event, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import anime, denylist, history  # noqa: E402,F401
+from app.models.database import Base, ThreadedSession  # noqa: E402
+from app.models.user import UserDB  # noqa: E402
+from app.services import auth  # noqa: E402
+from app.services.revocation import revocations, revoke_token  # noqa: E402
+
+REQUEST = SimpleNamespace(method="GET")
+
+
+def setup(engine, users):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(UserDB),
+            [
+                {"id": i, "email": f"user{i}@example.com", "hashed_password": "x"}
+                for i in range(1, users + 1)
+            ],
+        )
+
+
+def issue_tokens(session_factory, users, revoked):
+    tokens = []
+    db = session_factory()
+    try:
+        for user in db.query(UserDB).order_by(UserDB.id):
+            claims = auth.token_claims(user)
+            tokens.append(auth.create_access_token(claims, timedelta(minutes=30)))
+            if len(tokens) <= revoked:
+                revoke_token(db, claims["jti"], int(time.time()) + 1800)
+    finally:
+        db.close()
+    return tokens
+
+
+async def authenticate(session_factory, tokens, requests, rng):
+    samples = []
+    rejected = 0
+    for _ in range(requests):
+        token = rng.choice(tokens)
+        db = session_factory()
+        try:
+            session = ThreadedSession(db)
+            start = time.perf_counter()
+            try:
+                await auth.get_current_user(REQUEST, session, session, token)
+            except HTTPException:
+                rejected += 1
+            samples.append((time.perf_counter() - start) * 1e6)
+        finally:
+            db.close()
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1], rejected
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    # Se borran y recrean las tablas de --url: nunca se toma DATABASE_URL por defecto
+    parser.add_argument("--url", default="sqlite:///bench_auth.db")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--revoked", type=int, default=100)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    setup(engine, args.users)
+    revocations.load(engine)
+    tokens = issue_tokens(session_factory, args.users, args.revoked)
+
+    queries = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(*_):
+        nonlocal queries
+        queries += 1
+
+    print(f"{'mode':<22} {'p50 us':>8} {'p99 us':>8} {'queries/req':>12} {'rejected':>9}")
+    for stateless in (False, True):
+        for cache_size in (0, args.cache_size):
+            auth.settings.AUTH_STATELESS = stateless
+            auth.principal_cache.maxsize = cache_size
+            auth.principal_cache.clear()
+            queries = 0
+            p50, p99, rejected = asyncio.run(
+                authenticate(session_factory, tokens, args.requests, random.Random(args.seed))
+            )
+            name = ("stateless" if stateless else "db") + (" + cache" if cache_size else "")
+            print(
+                f"{name:<22} {p50:>8.1f} {p99:>8.1f} "
+                f"{queries / args.requests:>12.2f} {rejected:>9}"
+            )
+    stats = revocations.stats()
+    print(f"bloom filter: {stats['bytes'] / 1024:.0f} KiB, {stats['hashes']} hashes, "
+          f"{stats['maybe_revoked']} of {stats['checks']} checks went to the database")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Memory footprint and lookup cost of the in-memory catalog snapshot.
+
+Builds a snapshot from `--titles` synthetic rows (no database needed) and
+reports its size next to the equivalent list of `(id, title)` tuples.
+
+    python -m benchmarks.bench_catalog_memory --titles 1000000
+"""
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.services.catalog import CatalogSnapshot  # noqa: E402
+
+
+def synthetic_rows(count):
+    words = ["Shingeki", "no", "Kyojin", "Re:Zero", "Sword", "Art", "Online", "Season"]
+    rng = random.Random(0)
+    for anime_id in range(1, count + 1):
+        yield anime_id, " ".join(rng.choice(words) for _ in range(3)) + f" {anime_id}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    snapshot = CatalogSnapshot()
+    t0 = time.perf_counter()
+    snapshot.replace(synthetic_rows(args.titles), version=1)
+    build_s = time.perf_counter() - t0
+    snapshot_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    as_tuples = list(synthetic_rows(args.titles))
+    tuples_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del as_tuples
+
+    stats = snapshot.stats()
+    print(f"titles:                 {stats['titles']}")
+    print(f"build time:             {build_s:.2f} s")
+    print(f"snapshot bytes:         {snapshot_bytes / 2**20:.1f} MiB")
+    print(f"list of tuples bytes:   {tuples_bytes / 2**20:.1f} MiB")
+    print(f"snapshot per 1M titles: {stats['bytes_per_title'] * 1e6 / 2**20:.1f} MiB")
+
+    rng = random.Random(1)
+    probes = [rng.randint(1, args.titles) for _ in range(100_000)]
+    t0 = time.perf_counter()
+    for anime_id in probes:
+        snapshot.contains(anime_id)
+    print(f"contains:               {(time.perf_counter() - t0) / len(probes) * 1e6:.2f} us")
+    t0 = time.perf_counter()
+    for anime_id in probes[:10_000]:
+        snapshot.page(100, after=anime_id)
+    print(f"page(size=100):         {(time.perf_counter() - t0) / 10_000 * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Cost of adding and removing one favorite as a user's favorites grow.
+
+Seeds a single user with 0, 1k, 5k, 10k... favorites and times the
+`add_favorite`/`remove_favorite` service calls used by the endpoints, first
+with the recommendations index unloaded and then loaded (as it is by default
+in the app), counting the overlay compactions the writes triggered. Both
+should stay flat: membership is checked by the (user_id, anime_id) primary
+key and the index pairs each change with a bounded sample of the list.
+
+    python -m benchmarks.bench_favorites_growth --url postgresql://...
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import history  # noqa: E402,F401
+from app.models.anime import AnimeDB  # noqa: E402
+from app.models.database import Base  # noqa: E402
+from app.models.user import UserDB, user_favorites  # noqa: E402
+from app.services.cooccurrence import recommendations  # noqa: E402
+from app.services.favorites import add_favorite, remove_favorite  # noqa: E402
+
+
+def sweep(engine, sizes, repeat, with_index):
+    """`(size, add_ms, remove_ms, compactions)` per size, on a fresh database."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    catalog = max(sizes) + repeat
+    session.execute(insert(AnimeDB), [{"title": f"Anime {i}"} for i in range(catalog)])
+    user = UserDB(email="bench@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+
+    results = []
+    seeded = 0
+    for size in sizes:
+        if size > seeded:
+            session.execute(
+                insert(user_favorites),
+                [{"user_id": user.id, "anime_id": i} for i in range(seeded + 1, size + 1)],
+            )
+            session.commit()
+            seeded = size
+        if with_index:
+            recommendations.load(engine)
+        compactions = recommendations.compactions
+
+        probe_ids = range(catalog - repeat + 1, catalog + 1)
+        add_samples, remove_samples = [], []
+        for anime_id in probe_ids:
+            t0 = time.perf_counter()
+            add_favorite(session, user.id, anime_id)
+            add_samples.append((time.perf_counter() - t0) * 1000)
+        for anime_id in probe_ids:
+            t0 = time.perf_counter()
+            remove_favorite(session, user.id, anime_id)
+            remove_samples.append((time.perf_counter() - t0) * 1000)
+        results.append((
+            size,
+            statistics.median(add_samples),
+            statistics.median(remove_samples),
+            recommendations.compactions - compactions,
+        ))
+
+    session.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="sqlite:///bench_favorites.db")
+    parser.add_argument("--sizes", default="0,1000,5000,10000,50000")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    engine = create_engine(args.url)
+    without_index = sweep(engine, sizes, args.repeat, with_index=False)
+    with_index = sweep(engine, sizes, args.repeat, with_index=True)
+
+    print(
+        f"{'favorites':>10} {'add_ms':>8} {'remove_ms':>10} "
+        f"{'add_ms+idx':>11} {'remove_ms+idx':>14} {'compactions':>12}"
+    )
+    for (size, add_ms, remove_ms, _), (_, add_idx, remove_idx, compactions) in zip(
+        without_index, with_index
+    ):
+        print(
+            f"{size:>10} {add_ms:>8.3f} {remove_ms:>10.3f} "
+            f"{add_idx:>11.3f} {remove_idx:>14.3f} {compactions:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Write throughput of `POST /api/user/history` with and without the write-behind
+buffer (`HISTORY_WRITE_BEHIND`).
+
+Simulates `--players` concurrent players, each posting "viendo" updates for a
+few animes over and over, and measures the history write path: one upsert
+transaction per update, or buffered updates coalesced per `(user_id, anime_id)`
+and written in batches (the final flush is included in the time).
+
+    python -m benchmarks.bench_history_writes --url postgresql://... --updates 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_history.db")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import stats  # noqa: E402,F401
+from app.models.anime import AnimeDB  # noqa: E402
+from app.models.database import Base  # noqa: E402
+from app.models.user import UserDB  # noqa: E402
+from app.services import history_buffer as buffer_module  # noqa: E402
+from app.services.catalog import catalog  # noqa: E402
+from app.services.history import upsert_history  # noqa: E402
+from app.services.history_buffer import HistoryBuffer  # noqa: E402
+
+
+def setup(engine, players, animes):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(AnimeDB), [{"id": i, "title": f"Anime {i}"} for i in range(1, animes + 1)]
+        )
+        connection.execute(
+            insert(UserDB),
+            [
+                {"id": i, "email": f"player{i}@example.com", "hashed_password": "x"}
+                for i in range(1, players + 1)
+            ],
+        )
+    catalog.load(engine)
+
+
+def workload(players, animes, updates, per_player, seed):
+    rng = random.Random(seed)
+    watching = {
+        player: rng.sample(range(1, animes + 1), per_player)
+        for player in range(1, players + 1)
+    }
+    return [
+        (player, rng.choice(watching[player]), rng.choice(("viendo", "viendo", "visto")))
+        for player in (rng.randint(1, players) for _ in range(updates))
+    ]
+
+
+async def run_direct(session_factory, updates, concurrency):
+    def write(user_id, anime_id, status):
+        db = session_factory()
+        try:
+            upsert_history(db, user_id, anime_id, status)
+        finally:
+            db.close()
+
+    queue = iter(updates)
+
+    async def client():
+        for user_id, anime_id, status in queue:
+            await run_in_threadpool(write, user_id, anime_id, status)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return len(updates)
+
+
+async def run_buffered(buffer, updates, concurrency):
+    queue = iter(updates)
+
+    async def client():
+        for user_id, anime_id, status in queue:
+            await buffer.add(None, user_id, anime_id, status)
+            # Cede el loop como lo haría una solicitud HTTP real
+            await asyncio.sleep(0)
+
+    buffer.start()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    await buffer.close()
+    return buffer.flushes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    # Se borran y recrean las tablas de --url: nunca se toma DATABASE_URL por defecto
+    parser.add_argument("--url", default="sqlite:///bench_history.db")
+    parser.add_argument("--players", type=int, default=1_000)
+    parser.add_argument("--animes", type=int, default=10_000)
+    parser.add_argument("--animes-per-player", type=int, default=3)
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--flush-size", type=int, default=500)
+    parser.add_argument("--flush-seconds", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # SQLite admite un solo escritor: se serializan las transacciones en una conexión
+    pool = {"pool_size": 1, "max_overflow": 0} if args.url.startswith("sqlite") else {}
+    engine = create_engine(args.url, **pool)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    # El buffer escribe con la sesión del módulo: se apunta al motor del benchmark
+    buffer_module.SessionLocal = session_factory
+    updates = workload(
+        args.players, args.animes, args.updates, args.animes_per_player, args.seed
+    )
+
+    print(f"{'mode':<10} {'updates':>8} {'seconds':>8} {'updates/s':>10} {'transactions':>13}")
+    for mode in ("direct", "buffered"):
+        setup(engine, args.players, args.animes)
+        start = time.perf_counter()
+        if mode == "direct":
+            transactions = asyncio.run(
+                run_direct(session_factory, updates, args.concurrency)
+            )
+        else:
+            buffer = HistoryBuffer(
+                args.flush_size,
+                args.flush_seconds,
+                buffer_module.settings.HISTORY_FLUSH_MAX_ATTEMPTS,
+            )
+            transactions = asyncio.run(run_buffered(buffer, updates, args.concurrency))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{mode:<10} {len(updates):>8} {elapsed:>8.2f} "
+            f"{len(updates) / elapsed:>10.0f} {transactions:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Throughput of `POST /api/user/import` and `GET /api/user/export` for one user
+with a large library.
+
+Builds an NDJSON file of `--rows` lines (favorites and history entries over
+distinct animes), feeds it to the importer in 64 KiB chunks as uvicorn would,
+then streams the export back, with one or more import batch sizes.
+
+    python -m benchmarks.bench_import --url postgresql://... --rows 100000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_import.db")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import orjson  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import stats  # noqa: E402,F401
+from app.models.anime import AnimeDB  # noqa: E402
+from app.models.database import Base, ThreadedSession  # noqa: E402
+from app.models.user import UserDB  # noqa: E402
+from app.services.catalog import catalog  # noqa: E402
+from app.services.transfer import export_library, import_library  # noqa: E402
+
+CHUNK_BYTES = 64 * 1024
+
+
+def setup(engine, animes):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(AnimeDB), [{"id": i, "title": f"Anime {i}"} for i in range(1, animes + 1)]
+        )
+        connection.execute(
+            insert(UserDB), [{"id": 1, "email": "importer@example.com", "hashed_password": "x"}]
+        )
+    catalog.load(engine)
+
+
+def library_file(rows, animes, favorites_share, seed):
+    rng = random.Random(seed)
+    favorites = int(rows * favorites_share)
+    anime_ids = rng.sample(range(1, animes + 1), max(favorites, rows - favorites))
+    lines = [
+        orjson.dumps({"type": "favorite", "anime_id": anime_id, "title": f"Anime {anime_id}"})
+        for anime_id in anime_ids[:favorites]
+    ]
+    lines += [
+        orjson.dumps(
+            {
+                "type": "history",
+                "anime_id": anime_id,
+                "title": f"Anime {anime_id}",
+                "status": rng.choice(("viendo", "visto")),
+            }
+        )
+        for anime_id in anime_ids[:rows - favorites]
+    ]
+    return b"\n".join(lines) + b"\n"
+
+
+async def chunks(body):
+    for start in range(0, len(body), CHUNK_BYTES):
+        yield body[start:start + CHUNK_BYTES]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    # Se borran y recrean las tablas de --url: nunca se toma DATABASE_URL por defecto
+    parser.add_argument("--url", default="sqlite:///bench_import.db")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--animes", type=int, default=100_000)
+    parser.add_argument("--favorites-share", type=float, default=0.4)
+    parser.add_argument("--batch-sizes", default="1000")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    body = library_file(args.rows, args.animes, args.favorites_share, args.seed)
+    print(f"file: {args.rows} lines, {len(body) / 2**20:.1f} MiB")
+
+    print(f"{'step':<16} {'rows':>8} {'seconds':>8} {'rows/s':>9}")
+    for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+        setup(engine, args.animes)
+        db = session_factory()
+        try:
+            report = asyncio.run(
+                import_library(ThreadedSession(db), 1, chunks(body), batch_size)
+            )
+        finally:
+            db.close()
+        written = report["favorites_added"] + report["history_written"]
+        print(
+            f"{f'import ({batch_size})':<16} {written:>8} {report['seconds']:>8.2f} "
+            f"{report['rows_per_second']:>9}"
+        )
+
+    start = time.perf_counter()
+    size = lines = 0
+    for chunk in export_library(session_factory, 1, 1000):
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+    elapsed = time.perf_counter() - start
+    print(f"{'export':<16} {lines:>8} {elapsed:>8.2f} {lines / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Offset vs keyset pagination on /api/anime/list.
+
+Seeds an `animes` table with `--rows` titles and times fetching a page at
+increasing depths with `OFFSET` and with the `id > cursor` keyset query used
+by the list endpoints. Keyset latency should stay flat as depth grows.
+
+    python -m benchmarks.bench_pagination --rows 1000000 --url postgresql://...
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import history, user  # noqa: E402,F401
+from app.models.anime import AnimeDB  # noqa: E402
+from app.models.database import Base  # noqa: E402
+
+
+def seed(session, rows, batch=50_000):
+    for start in range(0, rows, batch):
+        chunk = [{"title": f"Anime {i}"} for i in range(start, min(rows, start + batch))]
+        session.execute(insert(AnimeDB), chunk)
+    session.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="sqlite:///bench_pagination.db")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, args.rows)
+
+    print(f"{'depth':>10} {'offset_ms':>10} {'keyset_ms':>10}")
+    depth = 1
+    while depth * args.size < args.rows:
+        skip = (depth - 1) * args.size
+        last_id = session.query(AnimeDB.id).order_by(AnimeDB.id).offset(skip).limit(1).scalar() - 1
+
+        offset_ms = timed(
+            lambda: session.query(AnimeDB).order_by(AnimeDB.id).offset(skip).limit(args.size).all(),
+            args.repeat,
+        )
+        keyset_ms = timed(
+            lambda: session.query(AnimeDB)
+            .filter(AnimeDB.id > last_id)
+            .order_by(AnimeDB.id)
+            .limit(args.size)
+            .all(),
+            args.repeat,
+        )
+        print(f"{depth:>10} {offset_ms:>10.3f} {keyset_ms:>10.3f}")
+        depth *= 10
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Build cost, memory and query latency of the co-occurrence recommendations index.
+
+Favorites are synthetic (no database needed) with a skewed popularity, so a few
+animes co-occur with almost everything, as in real data.
+
+    python -m benchmarks.bench_recommendations --users 100000 --animes 100000 \\
+        --favorites-per-user 200
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import numpy as np  # noqa: E402
+
+from app.services.cooccurrence import CooccurrenceIndex  # noqa: E402
+
+
+def synthetic_favorites(users, animes, per_user, rng):
+    # Zipf recortado: los ids bajos son los animes más populares
+    anime_ids = np.minimum(rng.zipf(1.3, size=users * per_user), animes)
+    user_ids = np.repeat(np.arange(1, users + 1), per_user)
+    return user_ids, anime_ids
+
+
+def timed(fn, probes):
+    start = time.perf_counter()
+    for probe in probes:
+        fn(probe)
+    return (time.perf_counter() - start) / len(probes) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--animes", type=int, default=50_000)
+    parser.add_argument("--favorites-per-user", type=int, default=100)
+    parser.add_argument("--neighbors", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    user_ids, anime_ids = synthetic_favorites(
+        args.users, args.animes, args.favorites_per_user, rng
+    )
+    index = CooccurrenceIndex(args.neighbors)
+    index.replace(user_ids, anime_ids)
+    stats = index.stats()
+    print(f"favorites:              {len(anime_ids)}")
+    print(f"build time:             {stats['build_seconds']:.2f} s")
+    print(f"animes indexed:         {stats['animes']}")
+    print(f"index bytes:            {stats['bytes'] / 2**20:.1f} MiB")
+
+    anime_probes = rng.integers(1, 1000, size=10_000).tolist()
+    print(f"similar (k=10):         {timed(lambda a: index.similar(a, 10), anime_probes):.1f} us")
+
+    per_user = args.favorites_per_user
+    user_probes = [
+        np.unique(anime_ids[u * per_user:(u + 1) * per_user]).tolist()
+        for u in rng.integers(0, args.users, size=1_000)
+    ]
+    print(f"recommend (k=10):       {timed(lambda f: index.recommend(f, 10), user_probes):.1f} us")
+
+    def add(favorites):
+        anime_id = int(rng.integers(1, args.animes))
+        index.favorites_changed(favorites + [anime_id], added=[anime_id])
+
+    print(f"incremental add:        {timed(add, user_probes):.1f} us")
+    print(f"background compactions: {index.compactions}")
+    print(f"recommend, big overlay:{timed(lambda f: index.recommend(f, 10), user_probes):.1f} us")
+    start = time.perf_counter()
+    index.compact()
+    print(f"compaction:             {time.perf_counter() - start:.2f} s")
+    print(f"recommend compacted:    {timed(lambda f: index.recommend(f, 10), user_probes):.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Build cost, memory and query latency of the title index behind
+`/api/anime/search`, plus the cost of applying a few catalog changes in place.
+
+Titles are synthetic (no database needed): two to six words drawn with a skewed
+frequency from a vocabulary of made-up words, so common words have long posting
+lists as in a real catalog.
+
+    python -m benchmarks.bench_search --titles 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.services.title_search import TitleSearchIndex  # noqa: E402
+
+ONSETS = "b br ch d dr f g gr h j k kr l m n p pr r s sh st t th tr v w y z".split()
+VOWELS = "a e i o u a e o ai ou ei".split()
+CODAS = ["", "", "", "n", "r", "s", "t", "x", "ng"]
+
+
+def synthetic_word(rng):
+    return "".join(
+        rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+        for _ in range(rng.randint(1, 3))
+    )
+
+
+def synthetic_titles(count, vocabulary, rng):
+    words = sorted({synthetic_word(rng) for _ in range(vocabulary * 2)})[:vocabulary]
+    rng.shuffle(words)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    return [
+        " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(2, 6))).title()
+        for _ in range(count)
+    ]
+
+
+def typo(text, rng):
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 2)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def latency(index, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, 10)
+        samples.append((time.perf_counter() - start) * 1e3)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=200_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--changes", type=int, default=1_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    titles = synthetic_titles(args.titles, args.vocabulary, rng)
+    ids = list(range(1, len(titles) + 1))
+    index = TitleSearchIndex()
+    index.replace(ids, titles, 0)
+    stats = index.stats()
+    print(f"titles:               {len(titles)}")
+    print(f"build time:           {stats['build_seconds']:.2f} s")
+    print(f"distinct terms:       {stats['terms']}")
+    print(f"index bytes:          {stats['bytes'] / 2**20:.1f} MiB arrays + {len(index._data['terms'])} term strings")
+
+    probes = rng.sample(titles, args.queries)
+    workloads = {
+        "full title": probes,
+        "prefix (6 chars)": [title[:6] for title in probes],
+        "two words": [" ".join(title.split()[:2]) for title in probes],
+        "typo": [typo(title, rng) for title in probes],
+        "short (2 chars)": [title[:2] for title in probes],
+    }
+    print(f"{'query':<20} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, queries in workloads.items():
+        p50, p99 = latency(index, queries)
+        print(f"{name:<20} {p50:>8.2f} {p99:>8.2f}")
+
+    # Cambios de catálogo: títulos editados, altas y bajas
+    changed = list(titles)
+    for position in rng.sample(range(len(changed)), args.changes):
+        changed[position] = changed[position] + " Season 2"
+    changed_ids = ids[args.changes:] + list(range(len(ids) + 1, len(ids) + 1 + args.changes))
+    changed = changed[args.changes:] + synthetic_titles(args.changes, args.vocabulary, rng)
+    start = time.perf_counter()
+    index.sync(changed_ids, changed, 1)
+    print(f"incremental sync:     {time.perf_counter() - start:.2f} s "
+          f"({index.stats()['overlay_titles']} titles in overlay)")
+    p50, p99 = latency(index, workloads["full title"])
+    print(f"{'full title, overlay':<20} {p50:>8.2f} {p99:>8.2f}")
+    start = time.perf_counter()
+    index.replace(changed_ids, changed, 1)
+    print(f"full rebuild:         {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-request serialization cost of the list endpoints at `size=100`.
+
+Compares the default path (build Pydantic models, validate them again
+through `response_model`, encode with the stdlib JSON encoder) with the
+`FAST_JSON_RESPONSES` path (orjson straight from the DB rows).
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+import os
+import timeit
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from fastapi import Response  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.schemas.anime import Anime  # noqa: E402
+from app.schemas.favorite import AnimeFavoriteResponse  # noqa: E402
+from app.schemas.history import AnimeHistoryResponse  # noqa: E402
+from app.services.catalog import CatalogEntry  # noqa: E402
+from app.services.serialization import rows_response  # noqa: E402
+
+SIZE = 100
+TITLE = "Re:Zero - Starting Life in Another World"
+
+anime_rows = [CatalogEntry(i, TITLE) for i in range(SIZE)]
+favorite_rows = [(i, TITLE) for i in range(SIZE)]
+history_rows = [(i, TITLE, "viendo", i) for i in range(SIZE)]
+
+anime_adapter = TypeAdapter(List[Anime])
+favorite_adapter = TypeAdapter(List[AnimeFavoriteResponse])
+history_adapter = TypeAdapter(List[AnimeHistoryResponse])
+
+
+def default_path(adapter, build):
+    content = adapter.validate_python(build(), from_attributes=True)
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+CASES = {
+    "/api/anime/list": (
+        lambda: default_path(anime_adapter, lambda: anime_rows),
+        lambda: rows_response(Response(), anime_rows, ("id", "title")).body,
+    ),
+    "/api/user/favorites": (
+        lambda: default_path(
+            favorite_adapter,
+            lambda: [
+                AnimeFavoriteResponse(anime_id=anime_id, title=title)
+                for anime_id, title in favorite_rows
+            ],
+        ),
+        lambda: rows_response(Response(), favorite_rows, ("anime_id", "title")).body,
+    ),
+    "/api/user/history": (
+        lambda: default_path(
+            history_adapter,
+            lambda: [
+                AnimeHistoryResponse(anime_id=anime_id, title=title, status=status)
+                for anime_id, title, status, _ in history_rows
+            ],
+        ),
+        lambda: rows_response(
+            Response(), history_rows, ("anime_id", "title", "status")
+        ).body,
+    ),
+}
+
+
+def main():
+    print(f"{'endpoint':<22} {'default_us':>11} {'fast_us':>9} {'speedup':>8}")
+    for path, (default, fast) in CASES.items():
+        assert json.loads(default()) == json.loads(fast()), path
+        runs = 2000
+        default_us = timeit.timeit(default, number=runs) / runs * 1e6
+        fast_us = timeit.timeit(fast, number=runs) / runs * 1e6
+        print(f"{path:<22} {default_us:>11.1f} {fast_us:>9.1f} {default_us / fast_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
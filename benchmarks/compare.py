@@ -0,0 +1,41 @@
+"""
+Compares two `benchmarks.loadtest` reports endpoint by endpoint.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+
+def change(before, after):
+    if not before:
+        return "    n/a"
+    return f"{(after - before) / before * 100:+7.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as before_file, open(args.after) as after_file:
+        before = json.load(before_file)["endpoints"]
+        after = json.load(after_file)["endpoints"]
+
+    print(f"{'endpoint':<34} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for label in sorted(set(before) | set(after)):
+        if label not in before or label not in after:
+            print(f"{label:<34} {'only in ' + ('after' if label in after else 'before'):>39}")
+            continue
+        old, new = before[label], after[label]
+        print(
+            f"{label:<34} {change(old['rps'], new['rps']):>9} "
+            f"{change(old['p50_ms'], new['p50_ms']):>9} "
+            f"{change(old['p95_ms'], new['p95_ms']):>9} "
+            f"{change(old['p99_ms'], new['p99_ms']):>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Drives every router in app/api with concurrent clients and reports
+p50/p95/p99 latency and RPS per endpoint as JSON.
+
+Seed the database with `benchmarks.seed` first, start the server, then:
+
+    python -m benchmarks.loadtest --base-url http://localhost:8000 \\
+        --users 1000 --concurrency 100 --duration 60 --output before.json
+
+Each virtual client logs in as one of the seeded users and runs a weighted
+mix of list, write and auth operations. Use `benchmarks.compare` to diff two
+result files.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.seed import PASSWORD, user_email
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, label, elapsed, status_code):
+        self.latencies.setdefault(label, []).append(elapsed)
+        if status_code >= 500 or status_code in (401, 422, 429):
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+    def report(self, duration):
+        endpoints = {}
+        for label, samples in sorted(self.latencies.items()):
+            samples.sort()
+            if len(samples) > 1:
+                quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+                p50, p95, p99 = quantiles[49], quantiles[94], quantiles[98]
+            else:
+                p50 = p95 = p99 = samples[0]
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(samples) / duration, 2),
+                "p50_ms": round(p50 * 1000, 3),
+                "p95_ms": round(p95 * 1000, 3),
+                "p99_ms": round(p99 * 1000, 3),
+            }
+        return endpoints
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, rng, animes, users, token):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.animes = animes
+        self.users = users
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.cursor = None
+
+    async def request(self, label, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.recorder.record(label, time.perf_counter() - start, response.status_code)
+        return response
+
+    async def list_animes(self):
+        page = self.rng.randint(1, max(1, self.animes // 100))
+        await self.request(
+            "GET /api/anime/list", "GET", "/api/anime/list", params={"page": page, "size": 100}
+        )
+
+    async def list_animes_cursor(self):
+        params = {"size": 100}
+        if self.cursor:
+            params["cursor"] = self.cursor
+        response = await self.request(
+            "GET /api/anime/list?cursor", "GET", "/api/anime/list", params=params
+        )
+        self.cursor = response.headers.get("x-next-cursor")
+
+    async def list_favorites(self):
+        await self.request(
+            "GET /api/user/favorites", "GET", "/api/user/favorites",
+            params={"size": 100}, headers=self.headers,
+        )
+
+    async def list_history(self):
+        await self.request(
+            "GET /api/user/history", "GET", "/api/user/history",
+            params={"size": 100}, headers=self.headers,
+        )
+
+    async def toggle_favorite(self):
+        body = {"anime_id": self.rng.randint(1, self.animes)}
+        await self.request(
+            "POST /api/user/favorites", "POST", "/api/user/favorites",
+            json=body, headers=self.headers,
+        )
+        await self.request(
+            "DELETE /api/user/favorites", "DELETE", "/api/user/favorites",
+            json=body, headers=self.headers,
+        )
+
+    async def batch_favorites(self):
+        ids = self.rng.sample(range(1, self.animes + 1), 20)
+        await self.request(
+            "POST /api/user/favorites/batch", "POST", "/api/user/favorites/batch",
+            json={"add": ids[:10], "remove": ids[10:]}, headers=self.headers,
+        )
+
+    async def update_history(self):
+        body = {
+            "anime_id": self.rng.randint(1, self.animes),
+            "status": self.rng.choice(("viendo", "visto")),
+        }
+        await self.request(
+            "POST /api/user/history", "POST", "/api/user/history",
+            json=body, headers=self.headers,
+        )
+        if self.rng.random() < 0.25:
+            await self.request(
+                "DELETE /api/user/history", "DELETE", "/api/user/history",
+                json={"anime_id": body["anime_id"]}, headers=self.headers,
+            )
+
+    async def login(self):
+        email = user_email(self.rng.randint(1, self.users))
+        await self.request(
+            "POST /api/auth/login", "POST", "/api/auth/login",
+            json={"email": email, "password": PASSWORD},
+        )
+
+    async def register(self):
+        email = f"load-{self.rng.getrandbits(64):x}@example.com"
+        await self.request(
+            "POST /api/auth/register", "POST", "/api/auth/register",
+            json={"email": email, "password": PASSWORD},
+        )
+
+    OPERATIONS = [
+        (list_animes, 3),
+        (list_animes_cursor, 1),
+        (list_favorites, 3),
+        (list_history, 3),
+        (toggle_favorite, 1),
+        (batch_favorites, 0.25),
+        (update_history, 2),
+        (login, 0.2),
+        (register, 0.05),
+    ]
+
+    async def run(self, deadline):
+        operations, weights = zip(*self.OPERATIONS)
+        while time.perf_counter() < deadline:
+            operation = self.rng.choices(operations, weights)[0]
+            await operation(self)
+
+
+async def login(client, email, semaphore):
+    async with semaphore:
+        response = await client.post(
+            "/api/auth/login", json={"email": email, "password": PASSWORD}
+        )
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        response = await client.get("/ready")
+        startup = response.json() if response.status_code == 200 else None
+
+        # El login usa bcrypt: se limita para no saturar el pool de hashing
+        semaphore = asyncio.Semaphore(8)
+        emails = [user_email(i % args.users + 1) for i in range(args.concurrency)]
+        tokens = await asyncio.gather(*(login(client, email, semaphore) for email in emails))
+
+        recorder = Recorder()
+        clients = [
+            VirtualUser(
+                client, recorder, random.Random(args.seed + i), args.animes, args.users, token
+            )
+            for i, token in enumerate(tokens)
+        ]
+        start = time.perf_counter()
+        await asyncio.gather(*(vu.run(start + args.duration) for vu in clients))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "meta": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 3),
+            "animes": args.animes,
+            "users": args.users,
+            "seed": args.seed,
+            "startup": startup,
+        },
+        "endpoints": recorder.report(elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--animes", type=int, default=100_000, help="Animes seeded")
+    parser.add_argument("--users", type=int, default=1_000, help="Users seeded")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Seeds a database with synthetic data at a configurable scale.
+
+Generation is deterministic for a given `--seed`, so two runs at the same
+scale produce the same data and their benchmark numbers are comparable.
+Postgres is loaded with `COPY`; any other backend (SQLite) uses batched
+executemany. Every seeded user has the password `bench`.
+
+    python -m benchmarks.seed --url postgresql://... --animes 1000000 --users 100000 \\
+        --favorites-per-user 2000 --history-per-user 2000
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+from app.models.anime import AnimeDB  # noqa: E402
+from app.models.database import Base  # noqa: E402
+from app.models.history import UserHistory  # noqa: E402
+from app.models.user import UserDB, user_favorites  # noqa: E402
+from app.services.auth import get_password_hash  # noqa: E402
+from app.services.catalog import bump_catalog_version  # noqa: E402
+from app.services.history import reconcile_user_history_counts  # noqa: E402
+from app.services.popularity import reconcile_anime_stats  # noqa: E402
+
+PASSWORD = "bench"
+BATCH = 100_000
+WORDS = [
+    "Shingeki", "no", "Kyojin", "Re:Zero", "Sword", "Art", "Online", "Dragon",
+    "Ball", "Hunter", "Academia", "Kaisen", "Slayer", "Tensei", "Stone", "Psycho",
+]
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@example.com"
+
+
+def animes(count, rng):
+    for anime_id in range(1, count + 1):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        yield anime_id, f"{title} {anime_id}"
+
+
+def users(count, hashed_password):
+    for user_id in range(1, count + 1):
+        yield user_id, user_email(user_id), hashed_password, 0, 0
+
+
+def favorites(user_count, anime_count, per_user, rng):
+    for user_id in range(1, user_count + 1):
+        for anime_id in sorted(rng.sample(range(1, anime_count + 1), per_user)):
+            yield user_id, anime_id
+
+
+def history(user_count, anime_count, per_user, rng):
+    history_id = 0
+    for user_id in range(1, user_count + 1):
+        for anime_id in rng.sample(range(1, anime_count + 1), per_user):
+            history_id += 1
+            yield history_id, user_id, anime_id, rng.choice(("viendo", "visto"))
+
+
+def copy_rows(raw_connection, table, columns, rows):
+    cursor = raw_connection.cursor()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % BATCH == 0:
+            flush()
+    flush()
+    raw_connection.commit()
+    return count
+
+
+def insert_rows(connection, table, columns, rows):
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(dict(zip(columns, row)))
+        if len(batch) == BATCH:
+            connection.execute(insert(table), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        connection.execute(insert(table), batch)
+        count += len(batch)
+    connection.commit()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    # Se borran y recrean las tablas de --url: nunca se toma DATABASE_URL por defecto
+    parser.add_argument("--url", default="sqlite:///bench.db")
+    parser.add_argument("--animes", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--favorites-per-user", type=int, default=200)
+    parser.add_argument("--history-per-user", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    rng = random.Random(args.seed)
+    hashed_password = get_password_hash(PASSWORD)
+    tables = [
+        (AnimeDB.__table__, ["id", "title"], animes(args.animes, rng)),
+        (
+            UserDB.__table__,
+            ["id", "email", "hashed_password", "favorites_version", "history_version"],
+            users(args.users, hashed_password),
+        ),
+        (
+            user_favorites,
+            ["user_id", "anime_id"],
+            favorites(args.users, args.animes, args.favorites_per_user, rng),
+        ),
+        (
+            UserHistory.__table__,
+            ["id", "user_id", "anime_id", "status"],
+            history(args.users, args.animes, args.history_per_user, rng),
+        ),
+    ]
+
+    postgres = engine.dialect.name == "postgresql"
+    for table, columns, rows in tables:
+        start = time.perf_counter()
+        if postgres:
+            raw_connection = engine.raw_connection()
+            try:
+                count = copy_rows(raw_connection, table.name, columns, rows)
+            finally:
+                raw_connection.close()
+        else:
+            with engine.connect() as connection:
+                count = insert_rows(connection, table, columns, rows)
+        elapsed = time.perf_counter() - start
+        print(f"{table.name:<16} {count:>12} rows {elapsed:>8.1f} s {count / elapsed:>12.0f} rows/s")
+
+    with engine.begin() as connection:
+        if postgres:
+            # COPY con ids explícitos no avanza las secuencias
+            for table in ("animes", "users", "user_history"):
+                connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                )
+            connection.exec_driver_sql("ANALYZE")
+        bump_catalog_version(connection)
+        reconcile_anime_stats(connection)
+        reconcile_user_history_counts(connection)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,12 @@ while ! nc -z $(echo $DATABASE_URL | sed -E 's/.*:\/\/(.*):.*@([a-zA-Z0-9.-]+):.
   sleep 1
 done
 
-echo "Base de datos disponible. Iniciando aplicación..."
+echo "Base de datos disponible. Aplicando esquema..."
 
-apt-get update && apt-get install -y postgresql-client && rm -rf /var/lib/apt/lists/*
+python -m app.migrate || exit 1
 
-python -m uvicorn app.main:app --host 0.0.0.0 --port 8000
+echo "Iniciando aplicación..."
 
-#psql $DATABASE_URL -f /app/init_data.sql
+exec python -m uvicorn app.main:app --host 0.0.0.0 --port 8000
 
+#psql $DATABASE_URL -f /app/init_data.sql
@@ -0,0 +1,23 @@
+-- Clave primaria compuesta e índice inverso en user_favorites.
+-- Elimina filas nulas y duplicadas antes de crear la PK. Es idempotente.
+
+DELETE FROM user_favorites WHERE user_id IS NULL OR anime_id IS NULL;
+
+DELETE FROM user_favorites a
+USING user_favorites b
+WHERE a.ctid < b.ctid
+  AND a.user_id = b.user_id
+  AND a.anime_id = b.anime_id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'user_favorites_pkey'
+    ) THEN
+        ALTER TABLE user_favorites
+            ADD CONSTRAINT user_favorites_pkey PRIMARY KEY (user_id, anime_id);
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS ix_user_favorites_anime_id_user_id
+    ON user_favorites (anime_id, user_id);
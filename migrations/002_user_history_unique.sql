@@ -0,0 +1,18 @@
+-- Restricción única (user_id, anime_id) en user_history para escribir con upsert.
+-- Conserva la fila más reciente de cada par duplicado. Es idempotente.
+
+DELETE FROM user_history a
+USING user_history b
+WHERE a.id < b.id
+  AND a.user_id = b.user_id
+  AND a.anime_id = b.anime_id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'uq_user_history_user_id_anime_id'
+    ) THEN
+        ALTER TABLE user_history
+            ADD CONSTRAINT uq_user_history_user_id_anime_id UNIQUE (user_id, anime_id);
+    END IF;
+END $$;
@@ -0,0 +1,4 @@
+-- Contadores de versión por usuario, usados como ETag de favoritos e historial.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS favorites_version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS history_version BIGINT NOT NULL DEFAULT 0;
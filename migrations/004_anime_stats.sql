@@ -0,0 +1,34 @@
+-- Contadores denormalizados de popularidad por anime (favoritos y estados del
+-- historial). Se rellenan aquí una vez; luego los mantienen las escrituras y
+-- `python -m app.reconcile` corrige cualquier deriva.
+
+CREATE TABLE IF NOT EXISTS anime_stats (
+    anime_id INTEGER PRIMARY KEY REFERENCES animes (id) ON DELETE CASCADE,
+    favorites_count INTEGER NOT NULL DEFAULT 0,
+    watching_count INTEGER NOT NULL DEFAULT 0,
+    watched_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS ix_anime_stats_favorites_count ON anime_stats (favorites_count);
+CREATE INDEX IF NOT EXISTS ix_anime_stats_watching_count ON anime_stats (watching_count);
+CREATE INDEX IF NOT EXISTS ix_anime_stats_watched_count ON anime_stats (watched_count);
+
+INSERT INTO anime_stats (anime_id, favorites_count, watching_count, watched_count)
+SELECT a.id,
+       COALESCE(f.total, 0),
+       COALESCE(h.watching, 0),
+       COALESCE(h.watched, 0)
+FROM animes a
+LEFT JOIN (
+    SELECT anime_id, COUNT(*) AS total FROM user_favorites GROUP BY anime_id
+) f ON f.anime_id = a.id
+LEFT JOIN (
+    SELECT anime_id,
+           COUNT(*) FILTER (WHERE status = 'viendo') AS watching,
+           COUNT(*) FILTER (WHERE status = 'visto') AS watched
+    FROM user_history GROUP BY anime_id
+) h ON h.anime_id = a.id
+ON CONFLICT (anime_id) DO UPDATE SET
+    favorites_count = EXCLUDED.favorites_count,
+    watching_count = EXCLUDED.watching_count,
+    watched_count = EXCLUDED.watched_count;
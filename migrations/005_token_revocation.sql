@@ -0,0 +1,12 @@
+-- Versión de token por usuario (sube al cerrar todas las sesiones) y lista de
+-- tokens revocados que respalda el filtro de Bloom de cada worker.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS token_denylist (
+    id SERIAL PRIMARY KEY,
+    key VARCHAR NOT NULL UNIQUE,
+    expires_at BIGINT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_token_denylist_expires_at ON token_denylist (expires_at);
@@ -0,0 +1,45 @@
+-- Historial: estado como enum, fecha de última actualización, índices compuestos
+-- por usuario para listar con filtro de estado y contadores por usuario y estado
+-- para `X-Total-Count`. Es idempotente.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'history_status') THEN
+        CREATE TYPE history_status AS ENUM ('viendo', 'visto');
+    END IF;
+    -- Un estado fuera del enum queda en NULL: no cuenta en ningún contador
+    IF (
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'user_history' AND column_name = 'status'
+    ) <> 'USER-DEFINED' THEN
+        ALTER TABLE user_history ALTER COLUMN status TYPE history_status
+            USING (CASE WHEN status IN ('viendo', 'visto') THEN status::history_status END);
+    END IF;
+END $$;
+
+ALTER TABLE user_history ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+-- El índice suelto sobre id repite la PK; los compuestos lo reemplazan
+DROP INDEX IF EXISTS ix_user_history_id;
+CREATE INDEX IF NOT EXISTS ix_user_history_user_id_id ON user_history (user_id, id);
+CREATE INDEX IF NOT EXISTS ix_user_history_user_id_status_id
+    ON user_history (user_id, status, id);
+CREATE INDEX IF NOT EXISTS ix_user_history_user_id_updated_at
+    ON user_history (user_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS ix_user_history_user_id_status_updated_at
+    ON user_history (user_id, status, updated_at, id);
+
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS watching_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS watched_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE users SET
+    watching_count = h.watching,
+    watched_count = h.watched
+FROM (
+    SELECT user_id,
+           COUNT(*) FILTER (WHERE status = 'viendo') AS watching,
+           COUNT(*) FILTER (WHERE status = 'visto') AS watched
+    FROM user_history GROUP BY user_id
+) h
+WHERE users.id = h.user_id;
@@ -0,0 +1,79 @@
+import itertools
+import os
+import tempfile
+from contextlib import contextmanager
+
+# La configuración se lee al importar la app: la base de pruebas va antes
+_database = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_database}?check_same_thread=false"
+os.environ.setdefault("SECRET_KEY", "test")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.migrate import main as migrate  # noqa: E402
+from app.models.anime import AnimeDB  # noqa: E402
+from app.models.database import SessionLocal, engine  # noqa: E402
+
+ANIMES = 20
+PASSWORD = "secret123"
+
+_users = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    migrate()
+    with SessionLocal() as db:
+        db.add_all(AnimeDB(title=f"Anime {i}") for i in range(1, ANIMES + 1))
+        db.commit()
+    with TestClient(app) as client:
+        yield client
+
+
+@contextmanager
+def count_queries():
+    """Collects the SQL statements run on `engine` inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def new_email():
+    return f"user{next(_users)}@example.com"
+
+
+def login(client, email):
+    """Headers with a fresh access token for `email`."""
+    token = client.post(
+        "/api/auth/login", json={"email": email, "password": PASSWORD}
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def register(client, email=None):
+    """Registers and logs in a new user; returns `(user_id, headers)`."""
+    email = email or new_email()
+    user_id = client.post(
+        "/api/auth/register", json={"email": email, "password": PASSWORD}
+    ).json()["id"]
+    return user_id, login(client, email)
+
+
+@pytest.fixture
+def user(client):
+    return register(client)
+
+
+@pytest.fixture
+def auth_headers(user):
+    return user[1]
@@ -0,0 +1,30 @@
+import pytest
+
+from app.services.catalog import CatalogSnapshot, catalog
+
+LIST = "/api/anime/list"
+
+
+@pytest.fixture(params=[True, False], ids=["snapshot", "database"])
+def snapshot(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(CatalogSnapshot, "loaded", property(lambda self: False))
+    return request.param
+
+
+def test_list_etag_revalidates_with_and_without_snapshot(client, snapshot):
+    first = client.get(LIST)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"catalog-')
+
+    again = client.get(LIST, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+def test_list_etag_matches_between_snapshot_and_database(client, monkeypatch):
+    assert catalog.loaded
+    etag = client.get(LIST).headers["ETag"]
+    monkeypatch.setattr(CatalogSnapshot, "loaded", property(lambda self: False))
+    assert client.get(LIST).headers["ETag"] == etag
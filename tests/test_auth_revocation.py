@@ -0,0 +1,134 @@
+import time
+
+from sqlalchemy import event, insert, select
+
+from app.models.database import engine, settings
+from app.models.denylist import TokenDenylist
+from app.services import auth
+from app.services.revocation import prune_denylist, revocations
+
+from .conftest import login, new_email, register
+
+PROTECTED = "/api/user/favorites"
+
+
+def denylist_queries(client, headers):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(PROTECTED, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return response, [s for s in statements if "token_denylist" in s]
+
+
+def test_token_fails_after_logout(client):
+    _, headers = register(client)
+    assert client.get(PROTECTED, headers=headers).status_code == 200
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+
+    assert client.get(PROTECTED, headers=headers).status_code == 401
+
+
+def test_logout_keeps_other_tokens(client):
+    email = new_email()
+    _, headers = register(client, email)
+    other = login(client, email)
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+
+    assert client.get(PROTECTED, headers=headers).status_code == 401
+    assert client.get(PROTECTED, headers=other).status_code == 200
+
+
+def test_logout_all_revokes_every_older_token(client):
+    email = new_email()
+    _, first = register(client, email)
+    second = login(client, email)
+    for headers in (first, second):
+        assert client.get(PROTECTED, headers=headers).status_code == 200
+
+    assert client.post("/api/auth/logout-all", headers=first).status_code == 200
+
+    # token_version subió: los dos tokens llevan la versión anterior
+    for headers in (first, second):
+        assert client.get(PROTECTED, headers=headers).status_code == 401
+    assert client.get(PROTECTED, headers=login(client, email)).status_code == 200
+
+
+def test_filter_miss_skips_the_denylist_query(client):
+    _, headers = register(client)
+
+    response, queries = denylist_queries(client, headers)
+
+    assert response.status_code == 200
+    assert queries == []
+
+
+def test_bloom_false_positive_falls_back_to_the_denylist(client, monkeypatch):
+    _, headers = register(client)
+    # El filtro dice "quizás" para cualquier clave, como en un falso positivo
+    monkeypatch.setattr(revocations, "might_contain", lambda key: True)
+
+    response, queries = denylist_queries(client, headers)
+
+    assert response.status_code == 200
+    assert len(queries) == 1
+
+
+def test_stateless_mode_skips_the_users_query(client, monkeypatch):
+    email = new_email()
+    register(client, email)
+    lookups = []
+    for name in ("get_user", "get_user_by_id"):
+        lookup = getattr(auth, name)
+        monkeypatch.setattr(
+            auth, name, lambda db, key, lookup=lookup: lookups.append(key) or lookup(db, key)
+        )
+
+    # Cada login da un token nuevo, que no está en la caché de principals
+    headers = login(client, email)
+    lookups.clear()
+    assert client.get(PROTECTED, headers=headers).status_code == 200
+    assert len(lookups) == 1
+
+    monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+    headers = login(client, email)
+    lookups.clear()
+    assert client.get(PROTECTED, headers=headers).status_code == 200
+    assert lookups == []
+
+
+def test_load_is_read_only_and_reconcile_prunes_expired_entries(client):
+    now = int(time.time())
+    with engine.begin() as connection:
+        connection.execute(
+            insert(TokenDenylist),
+            [
+                {"key": "jti:vencido", "expires_at": now - 60},
+                {"key": "jti:vigente", "expires_at": now + 600},
+            ],
+        )
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        revocations.load(engine)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert all(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+    assert revocations.might_contain("jti:vigente")
+
+    with engine.begin() as connection:
+        assert prune_denylist(connection) >= 1
+        keys = set(connection.scalars(select(TokenDenylist.key)))
+    assert "jti:vencido" not in keys
+    assert "jti:vigente" in keys
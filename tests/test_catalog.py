@@ -0,0 +1,16 @@
+from sqlalchemy import create_engine
+
+from app.models.catalog import CatalogVersion
+from app.services.catalog import bump_catalog_version, get_catalog_version
+
+
+def test_bump_creates_then_increments_the_version():
+    engine = create_engine("sqlite://")
+    CatalogVersion.__table__.create(engine)
+    with engine.begin() as connection:
+        assert get_catalog_version(connection) == 0
+        bump_catalog_version(connection)
+        assert get_catalog_version(connection) == 1
+        bump_catalog_version(connection)
+        bump_catalog_version(connection)
+        assert get_catalog_version(connection) == 3
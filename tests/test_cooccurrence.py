@@ -0,0 +1,135 @@
+import random
+
+import pytest
+from sqlalchemy import StaticPool, create_engine, delete, insert
+
+from app.models.user import user_favorites
+from app.services.cooccurrence import CooccurrenceIndex
+
+ANIMES = 12
+USERS = 8
+# Sin poda y con listas más cortas que la muestra el overlay es exacto
+NEIGHBORS = ANIMES
+PAIR_SAMPLE = ANIMES
+
+
+def new_index():
+    return CooccurrenceIndex(neighbors=NEIGHBORS, pair_sample=PAIR_SAMPLE)
+
+
+def columns(favorites):
+    pairs = [(user_id, anime_id) for user_id, ids in favorites.items() for anime_id in ids]
+    return [user_id for user_id, _ in pairs], [anime_id for _, anime_id in pairs]
+
+
+def fresh(favorites):
+    index = new_index()
+    index.replace(*columns(favorites))
+    return index
+
+
+def assert_same_scores(index, expected, favorites):
+    for anime_id in range(ANIMES):
+        assert dict(index.similar(anime_id, limit=ANIMES)) == pytest.approx(
+            dict(expected.similar(anime_id, limit=ANIMES))
+        )
+    for ids in favorites.values():
+        assert dict(index.recommend(sorted(ids), limit=ANIMES)) == pytest.approx(
+            dict(expected.recommend(sorted(ids), limit=ANIMES))
+        )
+
+
+def change(index, favorites, user_id, added=(), removed=()):
+    ids = favorites[user_id]
+    ids |= set(added)
+    ids -= set(removed)
+    index.favorites_changed(ids - set(added), added, removed)
+
+
+def random_changes(favorites, steps, seed):
+    rng = random.Random(seed)
+    for _ in range(steps):
+        user_id = rng.randrange(USERS)
+        candidates = rng.sample(range(ANIMES), rng.randint(1, 3))
+        added = {a for a in candidates if a not in favorites[user_id]}
+        removed = {a for a in candidates if a in favorites[user_id]}
+        yield user_id, added, removed
+
+
+def initial_favorites(seed):
+    rng = random.Random(seed)
+    return {user_id: set(rng.sample(range(ANIMES), 4)) for user_id in range(USERS)}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_overlay_matches_a_rebuild_on_the_final_data(seed):
+    favorites = initial_favorites(seed)
+    index = fresh(favorites)
+    for step, (user_id, added, removed) in enumerate(random_changes(favorites, 60, seed)):
+        change(index, favorites, user_id, added, removed)
+        if step == 30:
+            index.compact()
+    assert_same_scores(index, fresh(favorites), favorites)
+    index.compact()
+    assert_same_scores(index, fresh(favorites), favorites)
+
+
+def test_changes_during_load_are_replayed():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    user_favorites.create(engine)
+    favorites = initial_favorites(0)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(user_favorites),
+            [
+                {"user_id": user_id, "anime_id": anime_id}
+                for user_id, ids in favorites.items()
+                for anime_id in ids
+            ],
+        )
+
+    index = fresh(favorites)
+    replace = index.replace
+
+    def replace_after_changes(user_ids, anime_ids):
+        # Ya se leyó la tabla: estos cambios solo llegan por la reaplicación
+        for user_id, added, removed in random_changes(favorites, 20, 1):
+            with engine.begin() as connection:
+                for anime_id in added:
+                    connection.execute(
+                        insert(user_favorites).values(user_id=user_id, anime_id=anime_id)
+                    )
+                if removed:
+                    connection.execute(
+                        delete(user_favorites).where(
+                            user_favorites.c.user_id == user_id,
+                            user_favorites.c.anime_id.in_(removed),
+                        )
+                    )
+            change(index, favorites, user_id, added, removed)
+        replace(user_ids, anime_ids)
+
+    index.replace = replace_after_changes
+    index.load(engine)
+    assert not index._since_build
+    assert_same_scores(index, fresh(favorites), favorites)
+
+
+def test_sampled_pairs_never_score_below_zero():
+    index = CooccurrenceIndex(neighbors=NEIGHBORS, pair_sample=2)
+    # El usuario 1 aporta el par (1, 20) que debe sobrevivir
+    favorites = {0: {10}, 1: {1, 20}}
+    index.replace(*columns(favorites))
+    # Con ids menores añadidos en medio, la baja de 20 no resta los pares que sumó
+    change(index, favorites, 0, added={20})
+    change(index, favorites, 0, added={1})
+    change(index, favorites, 0, added={2})
+    change(index, favorites, 0, removed={20})
+
+    expected = CooccurrenceIndex(neighbors=NEIGHBORS, pair_sample=2)
+    expected.replace(*columns(favorites))
+    assert dict(index.recommend([1, 2]))[20] == pytest.approx(
+        dict(expected.recommend([1, 2]))[20]
+    )
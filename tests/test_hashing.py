@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.hashing import HashingPool
+
+
+@pytest.fixture
+def pool():
+    pool = HashingPool(workers=1, queue_depth=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_cancelled_caller_keeps_the_running_hash_in_flight(pool):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait(5)
+        return "hash"
+
+    async def scenario():
+        task = asyncio.ensure_future(pool.run(slow_hash))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # El hilo sigue ocupado: el hueco no se libera ni cuenta como terminado
+        stats = pool.stats()
+        assert (stats["in_flight"], stats["completed"]) == (1, 0)
+        release.set()
+        while pool.stats()["in_flight"]:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert pool.stats()["completed"] == 1
+
+
+def test_cancelled_queued_hash_frees_its_slot_without_completing(pool):
+    started, release = threading.Event(), threading.Event()
+    ran = []
+
+    def slow_hash():
+        started.set()
+        release.wait(5)
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run(slow_hash))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(pool.run(ran.append, "queued"))
+        await asyncio.sleep(0.01)
+        assert pool.stats()["in_flight"] == 2
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert pool.stats()["in_flight"] == 1
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+    stats = pool.stats()
+    assert (stats["in_flight"], stats["completed"], ran) == (0, 1, [])
+
+
+def test_full_pool_rejects_with_503(pool):
+    release = threading.Event()
+
+    async def scenario():
+        jobs = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as error:
+            await pool.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(*jobs)
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    stats = pool.stats()
+    assert (stats["completed"], stats["rejected"], stats["in_flight"]) == (2, 1, 0)
@@ -0,0 +1,262 @@
+import asyncio
+import threading
+from datetime import timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.models.database import SessionLocal, ThreadedSession
+from app.models.history import UserHistory, utcnow
+from app.services import history_buffer as buffer_module
+from app.services.history_buffer import HistoryBuffer
+
+MAX_ATTEMPTS = 3
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def new_buffer():
+    # Sin la tarea de fondo: cada prueba decide cuándo se escribe
+    return HistoryBuffer(max_size=100, interval=60, max_attempts=MAX_ATTEMPTS)
+
+
+def stored(user_id):
+    with SessionLocal() as db:
+        return {
+            anime_id: (status, updated_at)
+            for anime_id, status, updated_at in db.execute(
+                select(UserHistory.anime_id, UserHistory.status, UserHistory.updated_at)
+                .where(UserHistory.user_id == user_id)
+            )
+        }
+
+
+def as_utc(moment):
+    # SQLite devuelve la fecha sin zona; se guarda en UTC
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+@pytest.fixture
+def session(client):
+    db = SessionLocal()
+    yield ThreadedSession(db)
+    db.close()
+
+
+@pytest.fixture
+def poison(monkeypatch):
+    """Makes every batch that contains one of the returned anime ids fail."""
+    bad = set()
+    write = buffer_module.upsert_history_batch
+
+    def upsert(db, entries):
+        if any(entry[1] in bad for entry in entries):
+            raise IntegrityError("INSERT", {}, Exception("poison"))
+        return write(db, entries)
+
+    monkeypatch.setattr(buffer_module, "upsert_history_batch", upsert)
+    return bad
+
+
+def test_same_key_updates_coalesce_and_last_status_wins(session, user):
+    user_id, _ = user
+
+    async def scenario():
+        buffer = new_buffer()
+        await buffer.add(session, user_id, 1, "viendo")
+        await buffer.add(session, user_id, 1, "visto")
+        await buffer.add(session, user_id, 2, "viendo")
+        stats = buffer.stats()
+        await buffer.flush()
+        return stats, buffer.stats()
+
+    before, after = run(scenario())
+    assert (before["pending"], before["coalesced"], before["buffered"]) == (2, 1, 3)
+    assert (after["pending"], after["flushed_rows"], after["flushes"]) == (0, 2, 1)
+    rows = stored(user_id)
+    assert {anime_id: status for anime_id, (status, _) in rows.items()} == {
+        1: "visto",
+        2: "viendo",
+    }
+
+
+def test_updated_at_is_the_time_the_update_was_received(session, user):
+    user_id, _ = user
+
+    async def scenario():
+        buffer = new_buffer()
+        before = utcnow()
+        await buffer.add(session, user_id, 1, "viendo")
+        after = utcnow()
+        await asyncio.sleep(0.05)
+        flushed = utcnow()
+        await buffer.flush()
+        return before, after, flushed
+
+    before, after, flushed = run(scenario())
+    updated_at = as_utc(stored(user_id)[1][1])
+    assert before <= updated_at <= after < flushed
+
+
+def test_failed_batch_falls_back_to_single_writes(session, user, poison):
+    user_id, _ = user
+    poison.add(3)
+
+    async def scenario():
+        buffer = new_buffer()
+        for anime_id in (1, 2, 3):
+            await buffer.add(session, user_id, anime_id, "viendo")
+        await buffer.flush()
+        return buffer
+
+    buffer = run(scenario())
+    assert set(stored(user_id)) == {1, 2}
+    assert list(buffer._pending[user_id]) == [3]
+    assert buffer._pending[user_id][3][2] == 1
+    stats = buffer.stats()
+    assert (stats["pending"], stats["flushed_rows"], stats["failed_flushes"]) == (1, 2, 1)
+
+
+def test_requeued_entry_does_not_overwrite_a_newer_status(session, user, monkeypatch):
+    user_id, _ = user
+    started, release = threading.Event(), threading.Event()
+
+    def write_batch(entries):
+        # La escritura falla, pero solo después de que llegue un estado nuevo
+        started.set()
+        release.wait(5)
+        return 0, entries
+
+    monkeypatch.setattr(buffer_module, "_write_batch", write_batch)
+
+    async def scenario():
+        buffer = new_buffer()
+        await buffer.add(session, user_id, 1, "viendo")
+        flush = asyncio.ensure_future(buffer.flush())
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        await buffer.add(session, user_id, 1, "visto")
+        release.set()
+        await flush
+        return buffer
+
+    buffer = run(scenario())
+    status, _, tries = buffer._pending[user_id][1]
+    assert (status, tries) == ("visto", 0)
+    assert buffer.stats()["pending"] == 1
+
+
+def test_entry_is_dropped_after_max_attempts(session, user, poison, caplog):
+    user_id, _ = user
+    poison.add(4)
+
+    async def scenario():
+        buffer = new_buffer()
+        await buffer.add(session, user_id, 4, "visto")
+        for _ in range(MAX_ATTEMPTS):
+            assert buffer.has_pending(user_id)
+            await buffer.flush()
+        return buffer
+
+    buffer = run(scenario())
+    assert not buffer.has_pending(user_id)
+    stats = buffer.stats()
+    assert (stats["pending"], stats["dropped"], stats["failed_flushes"]) == (
+        0,
+        1,
+        MAX_ATTEMPTS,
+    )
+    assert "Descartada la entrada de historial" in caplog.text
+    assert stored(user_id) == {}
+
+
+def test_flush_before_read_writes_buffered_entries(session, user):
+    user_id, _ = user
+
+    async def scenario():
+        buffer = new_buffer()
+        await buffer.add(session, user_id, 5, "viendo")
+        await buffer.flush_before_read(user_id)
+        return buffer
+
+    buffer = run(scenario())
+    assert not buffer.has_pending(user_id)
+    assert stored(user_id)[5][0] == "viendo"
+
+
+def test_failed_flush_before_read_does_not_raise(session, user, monkeypatch):
+    user_id, _ = user
+
+    def write_batch(entries):
+        raise ConnectionError("base de datos caída")
+
+    monkeypatch.setattr(buffer_module, "_write_batch", write_batch)
+
+    async def scenario():
+        buffer = new_buffer()
+        await buffer.add(session, user_id, 5, "viendo")
+        await buffer.flush_before_read(user_id)
+        return buffer
+
+    buffer = run(scenario())
+    assert buffer._pending[user_id][5][2] == 1
+    assert stored(user_id) == {}
+
+
+def test_remove_sees_buffered_and_stored_entries(session, user):
+    user_id, _ = user
+
+    async def scenario():
+        buffer = new_buffer()
+        # Solo en el buffer
+        await buffer.add(session, user_id, 6, "viendo")
+        await buffer.remove(session, user_id, 6)
+        assert not buffer.has_pending(user_id)
+        # En la base y con un estado más nuevo en el buffer
+        await buffer.add(session, user_id, 7, "viendo")
+        await buffer.flush()
+        await buffer.add(session, user_id, 7, "visto")
+        await buffer.remove(session, user_id, 7)
+        assert not buffer.has_pending(user_id)
+        with pytest.raises(HTTPException) as error:
+            await buffer.remove(session, user_id, 8)
+        assert error.value.status_code == 404
+        return buffer
+
+    buffer = run(scenario())
+    assert buffer.stats()["pending"] == 0
+    assert stored(user_id) == {}
+
+
+def test_remove_waits_for_a_running_flush(session, user, monkeypatch):
+    user_id, _ = user
+    started, release = threading.Event(), threading.Event()
+    write = buffer_module._write_batch
+
+    def write_batch(entries):
+        started.set()
+        release.wait(5)
+        return write(entries)
+
+    monkeypatch.setattr(buffer_module, "_write_batch", write_batch)
+
+    async def scenario():
+        buffer = new_buffer()
+        await buffer.add(session, user_id, 9, "viendo")
+        flush = asyncio.ensure_future(buffer.flush())
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        # El DELETE llega con la fila aún sin escribir: debe esperar al lote
+        remove = asyncio.ensure_future(buffer.remove(session, user_id, 9))
+        await asyncio.sleep(0.05)
+        assert not remove.done()
+        release.set()
+        await flush
+        await remove
+
+    run(scenario())
+    assert stored(user_id) == {}
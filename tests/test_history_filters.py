@@ -0,0 +1,149 @@
+import orjson
+import pytest
+from sqlalchemy import func, select
+
+from app.models.database import SessionLocal
+from app.models.history import UserHistory
+
+from .conftest import count_queries
+
+HISTORY = "/api/user/history"
+STAMP = "2024-05-01T12:00:00+00:00"
+
+
+def set_status(client, headers, anime_id, status):
+    response = client.post(
+        HISTORY, json={"anime_id": anime_id, "status": status}, headers=headers
+    )
+    assert response.status_code == 200
+
+
+def remove(client, headers, anime_id):
+    response = client.request("DELETE", HISTORY, json={"anime_id": anime_id}, headers=headers)
+    assert response.status_code == 200
+
+
+def get_history(client, headers, **params):
+    response = client.get(HISTORY, params=params, headers=headers)
+    assert response.status_code == 200
+    return response
+
+
+def walk(client, headers, size, **params):
+    """Every page through `X-Next-Cursor`; returns the anime ids and the pages read."""
+    ids, pages, cursor = [], 0, None
+    while True:
+        extra = {"cursor": cursor} if cursor else {}
+        response = get_history(client, headers, size=size, **params, **extra)
+        ids.extend(item["anime_id"] for item in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, pages
+
+
+def stored_count(user_id, status=None):
+    query = select(func.count()).where(UserHistory.user_id == user_id)
+    if status is not None:
+        query = query.where(UserHistory.status == status)
+    with SessionLocal() as db:
+        return db.execute(query).scalar()
+
+
+def assert_totals_match(client, user_id, headers):
+    for status in (None, "viendo", "visto"):
+        params = {} if status is None else {"status": status}
+        total = get_history(client, headers, **params).headers["X-Total-Count"]
+        assert int(total) == stored_count(user_id, status)
+
+
+def test_status_filter_and_total_count_follow_changes(client, user):
+    user_id, headers = user
+    for anime_id in range(1, 7):
+        set_status(client, headers, anime_id, "viendo" if anime_id <= 4 else "visto")
+    assert_totals_match(client, user_id, headers)
+
+    set_status(client, headers, 1, "visto")
+    set_status(client, headers, 2, "visto")
+    assert_totals_match(client, user_id, headers)
+
+    remove(client, headers, 3)
+    remove(client, headers, 5)
+    assert_totals_match(client, user_id, headers)
+
+    watching = get_history(client, headers, status="viendo").json()
+    assert [(item["anime_id"], item["status"]) for item in watching] == [(4, "viendo")]
+    watched = get_history(client, headers, status="visto").json()
+    assert [item["anime_id"] for item in watched] == [1, 2, 6]
+
+
+def test_order_updated_puts_the_last_update_first(client, auth_headers):
+    for anime_id in (1, 2, 3):
+        set_status(client, auth_headers, anime_id, "viendo")
+    set_status(client, auth_headers, 1, "visto")
+    items = get_history(client, auth_headers, order="updated").json()
+    assert [item["anime_id"] for item in items] == [1, 3, 2]
+    added = get_history(client, auth_headers).json()
+    assert [item["anime_id"] for item in added] == [1, 2, 3]
+
+
+@pytest.mark.parametrize("status", [None, "viendo"])
+def test_updated_cursor_pages_through_ties_once(client, auth_headers, status):
+    # Mismo updated_at para todas: el cursor desempata por id
+    lines = [
+        orjson.dumps({
+            "type": "history",
+            "anime_id": anime_id,
+            "status": "viendo" if anime_id % 3 else "visto",
+            "updated_at": STAMP,
+        })
+        for anime_id in range(1, 11)
+    ]
+    response = client.post(
+        "/api/user/import",
+        content=b"\n".join(lines),
+        headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.json()["history_written"] == 10
+    set_status(client, auth_headers, 4, "viendo" if status else "visto")
+
+    params = {"order": "updated"} if status is None else {"order": "updated", "status": status}
+    everything = get_history(client, auth_headers, size=100, **params).json()
+    expected = [item["anime_id"] for item in everything]
+    assert expected[0] == 4
+    ids, pages = walk(client, auth_headers, 3, **params)
+    assert ids == expected
+    assert len(set(ids)) == len(ids)
+    assert pages == len(ids) // 3 + 1
+
+
+def test_added_cursor_pages_in_insertion_order(client, auth_headers):
+    for anime_id in (5, 2, 8, 1, 9):
+        set_status(client, auth_headers, anime_id, "viendo")
+    assert walk(client, auth_headers, 2) == ([5, 2, 8, 1, 9], 3)
+
+
+def test_cursor_page_costs_the_same_queries_as_the_first(client, auth_headers):
+    for anime_id in range(1, 11):
+        set_status(client, auth_headers, anime_id, "viendo")
+    with count_queries() as first:
+        cursor = get_history(client, auth_headers, size=3, order="updated").headers[
+            "X-Next-Cursor"
+        ]
+    with count_queries() as later:
+        get_history(client, auth_headers, size=3, order="updated", cursor=cursor)
+    assert len(first) == len(later)
+
+
+@pytest.mark.parametrize(
+    "params, detail",
+    [
+        ({"status": "pausado"}, "Estado inválido"),
+        ({"order": "random"}, "Orden inválido"),
+        ({"order": "updated", "cursor": "no-es-un-cursor"}, "Cursor inválido"),
+    ],
+)
+def test_invalid_filters_are_rejected(client, auth_headers, params, detail):
+    response = client.get(HISTORY, params=params, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
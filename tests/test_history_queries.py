@@ -0,0 +1,43 @@
+import pytest
+
+from .conftest import ANIMES, count_queries
+
+
+def history_queries(client, headers, **params):
+    with count_queries() as statements:
+        response = client.get("/api/user/history", params=params, headers=headers)
+    assert response.status_code == 200
+    return len(response.json()), len(statements)
+
+
+def fill_history(client, headers, entries):
+    for anime_id in range(1, entries + 1):
+        response = client.post(
+            "/api/user/history",
+            json={"anime_id": anime_id, "status": "viendo" if anime_id % 2 else "visto"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+
+@pytest.mark.parametrize("order", ["added", "updated"])
+def test_history_queries_do_not_grow_with_entries(client, auth_headers, order):
+    fill_history(client, auth_headers, 1)
+    items, one = history_queries(client, auth_headers, size=100, order=order)
+    assert items == 1
+
+    fill_history(client, auth_headers, ANIMES)
+    items, many = history_queries(client, auth_headers, size=100, order=order)
+    assert items == ANIMES
+
+    assert 0 < one == many
+
+
+def test_history_queries_with_status_filter(client, auth_headers):
+    fill_history(client, auth_headers, 1)
+    _, one = history_queries(client, auth_headers, status="viendo")
+
+    fill_history(client, auth_headers, ANIMES)
+    _, many = history_queries(client, auth_headers, status="viendo")
+
+    assert 0 < one == many
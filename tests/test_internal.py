@@ -0,0 +1,14 @@
+from app.models.database import settings
+
+
+def test_metrics_need_no_internal_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_TOKEN", "interno")
+    assert client.get("/internal/db/pool").status_code == 401
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+
+def test_metrics_off_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,92 @@
+import pytest
+
+from .conftest import ANIMES, count_queries
+
+LIBRARY = "/api/user/library"
+
+
+def get_library(client, headers, **params):
+    response = client.get(LIBRARY, params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def fill_library(client, headers, entries):
+    for anime_id in range(1, entries + 1):
+        client.post("/api/user/favorites", json={"anime_id": anime_id}, headers=headers)
+        client.post(
+            "/api/user/history",
+            json={"anime_id": anime_id, "status": "viendo" if anime_id % 2 else "visto"},
+            headers=headers,
+        )
+
+
+def library_queries(client, headers, **params):
+    with count_queries() as statements:
+        get_library(client, headers, **params)
+    return statements
+
+
+def test_library_returns_first_pages_and_counts(client, auth_headers):
+    fill_library(client, auth_headers, 5)
+    library = get_library(client, auth_headers, size=3)
+    assert [item["anime_id"] for item in library["favorites"]] == [1, 2, 3]
+    assert [(item["anime_id"], item["status"]) for item in library["history"]] == [
+        (1, "viendo"),
+        (2, "visto"),
+        (3, "viendo"),
+    ]
+    assert library["counts"] == {"favorites": 5, "history": 5, "viendo": 3, "visto": 2}
+
+
+@pytest.mark.parametrize(
+    "fields, keys",
+    [
+        ("favorites", {"favorites"}),
+        ("history,counts", {"history", "counts"}),
+        (" counts , favorites ", {"counts", "favorites"}),
+    ],
+)
+def test_library_fields_select_the_parts(client, auth_headers, fields, keys):
+    fill_library(client, auth_headers, 2)
+    assert set(get_library(client, auth_headers, fields=fields)) == keys
+
+
+@pytest.mark.parametrize("fields", ["favorites,amigos", ",", ""])
+def test_library_rejects_unknown_fields(client, auth_headers, fields):
+    response = client.get(LIBRARY, params={"fields": fields}, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Campo inválido")
+
+
+def test_library_counts_follow_changes(client, auth_headers):
+    fill_library(client, auth_headers, 4)
+    client.post("/api/user/history", json={"anime_id": 1, "status": "visto"}, headers=auth_headers)
+    client.request("DELETE", "/api/user/history", json={"anime_id": 2}, headers=auth_headers)
+    client.request("DELETE", "/api/user/favorites", json={"anime_id": 3}, headers=auth_headers)
+    counts = get_library(client, auth_headers, fields="counts")["counts"]
+    assert counts == {"favorites": 3, "history": 3, "viendo": 1, "visto": 2}
+
+
+@pytest.mark.parametrize("fields", [None, "favorites", "history,counts"])
+def test_library_is_one_query_whatever_the_size(client, auth_headers, fields):
+    params = {"size": 100} if fields is None else {"size": 100, "fields": fields}
+    fill_library(client, auth_headers, 1)
+    one = library_queries(client, auth_headers, **params)
+    fill_library(client, auth_headers, ANIMES)
+    many = library_queries(client, auth_headers, **params)
+    assert len(one) == len(many)
+    # Todas las partes, versiones incluidas, salen de una sola sentencia
+    assert sum("UNION ALL" in statement for statement in many) == 1
+
+
+def test_library_etag_changes_with_the_lists(client, auth_headers):
+    fill_library(client, auth_headers, 1)
+    etag = client.get(LIBRARY, headers=auth_headers).headers["ETag"]
+    cached = client.get(LIBRARY, headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    client.post("/api/user/favorites", json={"anime_id": 2}, headers=auth_headers)
+    fresh = client.get(LIBRARY, headers={**auth_headers, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
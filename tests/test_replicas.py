@@ -0,0 +1,37 @@
+import time
+
+from app.models.replicas import ReplicaRouter
+
+STICKY = 5
+
+
+def new_router(secret="test"):
+    return ReplicaRouter([object()], STICKY, secret)
+
+
+def test_client_pin_is_honored_for_its_user_only():
+    router = new_router()
+    pin = router.pin(1)
+    # Otro worker: sin el pin en memoria, solo cuenta el del cliente
+    other = new_router()
+    assert other.choose(1, pin) is None
+    assert other.choose(2, pin) is not None
+    assert other.choose(None, pin) is not None
+
+
+def test_tampered_or_foreign_pins_are_rejected():
+    router = new_router()
+    pin = router.pin(1)
+    until, _, signature = pin.rpartition(".")
+    later = f"{float(until) + 1:.3f}"
+    assert router.client_pinned(pin, 1)
+    assert not router.client_pinned(f"{later}.{signature}", 1)
+    assert not router.client_pinned(until, 1)
+    assert not router.client_pinned("basura", 1)
+    assert not new_router("otra").client_pinned(pin, 1)
+
+
+def test_expired_pin_is_rejected():
+    router = new_router()
+    until = f"{time.time() - 1:.3f}"
+    assert not router.client_pinned(f"{until}.{router._sign(1, until)}", 1)
@@ -0,0 +1,58 @@
+import pytest
+
+from app.ingest import ingest
+from app.models.database import engine
+from app.services.catalog import catalog
+from app.services.title_search import title_search
+
+SEARCH = "/api/anime/search"
+TITLES = [
+    "Naruto",
+    "Naruto Shippuden",
+    "Boruto: Naruto Next Generations",
+    "One Piece",
+    "Attack on Titan",
+]
+
+
+def ingest_titles(titles):
+    with engine.begin() as connection:
+        ingest([(None, title) for title in titles], connection)
+    # Lo que harían las tareas periódicas tras la carga
+    catalog.refresh(engine)
+    title_search.refresh(engine)
+
+
+def search(client, q, **params):
+    response = client.get(SEARCH, params={"q": q, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.fixture(scope="module")
+def titles(client):
+    ingest_titles(TITLES)
+
+
+def test_typo_finds_the_title(client, titles):
+    results = search(client, "naurto")
+    assert results[0]["title"] == "Naruto"
+
+
+def test_prefix_matches_in_ranked_order(client, titles):
+    results = search(client, "narut")
+    assert [result["title"] for result in results] == [
+        "Naruto",
+        "Naruto Shippuden",
+        "Boruto: Naruto Next Generations",
+    ]
+    scores = [result["score"] for result in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_title_added_by_ingest_is_found(client, titles):
+    assert search(client, "fullmetal alchemist") == []
+    ingest_titles(["Fullmetal Alchemist: Brotherhood"])
+    results = search(client, "fullmetal alchemist")
+    assert results[0]["title"] == "Fullmetal Alchemist: Brotherhood"
+    assert results[0]["score"] == 1
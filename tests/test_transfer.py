@@ -0,0 +1,123 @@
+import orjson
+from sqlalchemy import func, select
+
+from app.models.database import SessionLocal
+from app.models.history import UserHistory
+from app.models.stats import AnimeStats
+from app.models.user import UserDB, user_favorites
+from app.services.popularity import COUNTERS, STATUS_COUNTERS
+
+from .conftest import register
+
+FAVORITES = [3, 1, 7]
+HISTORY = [(2, "viendo"), (5, "visto"), (1, "viendo"), (2, "visto")]
+
+
+def export(client, headers):
+    response = client.get("/api/user/export", headers=headers)
+    assert response.status_code == 200
+    return [orjson.loads(line) for line in response.content.splitlines()]
+
+
+def import_lines(client, headers, lines):
+    response = client.post(
+        "/api/user/import",
+        content=b"\n".join(lines),
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def library_key(line):
+    return line["type"], line["anime_id"]
+
+
+def anime_stats():
+    with SessionLocal() as db:
+        return {
+            row.anime_id: {name: getattr(row, name) for name in COUNTERS}
+            for row in db.scalars(select(AnimeStats))
+        }
+
+
+def user_counters(user_id):
+    """`(stored, actual)` history counters of the user: the `users` columns and COUNT(*)."""
+    with SessionLocal() as db:
+        user = db.get(UserDB, user_id)
+        stored = {status: getattr(user, name) for status, name in STATUS_COUNTERS.items()}
+        actual = dict.fromkeys(STATUS_COUNTERS, 0)
+        actual.update(db.execute(
+            select(UserHistory.status, func.count())
+            .where(UserHistory.user_id == user_id)
+            .group_by(UserHistory.status)
+        ).tuples().all())
+        favorites = db.execute(
+            select(func.count()).where(user_favorites.c.user_id == user_id)
+        ).scalar()
+    return stored, actual, favorites
+
+
+def test_export_import_round_trip(client, user):
+    _, source = user
+    for anime_id in FAVORITES:
+        client.post("/api/user/favorites", json={"anime_id": anime_id}, headers=source)
+    for anime_id, status in HISTORY:
+        client.post(
+            "/api/user/history", json={"anime_id": anime_id, "status": status}, headers=source
+        )
+    exported = export(client, source)
+    assert len(exported) == len(FAVORITES) + 3
+
+    target_id, target = register(client)
+    before = anime_stats()
+    report = import_lines(client, target, [orjson.dumps(line) for line in exported])
+    assert report["lines"] == len(exported)
+    assert (report["favorites_added"], report["history_written"]) == (3, 3)
+    assert (report["ignored"], report["invalid"], report["errors"]) == (0, 0, [])
+    # El historial se escribe por anime_id; su orden en el archivo lo conserva updated_at
+    imported = export(client, target)
+    assert sorted(imported, key=library_key) == sorted(exported, key=library_key)
+
+    # Los contadores de users y de anime_stats suben con lo importado
+    stored, actual, favorites = user_counters(target_id)
+    assert stored == actual == {"viendo": 1, "visto": 2}
+    assert favorites == len(FAVORITES)
+    after = anime_stats()
+    for anime_id in set(before) | set(after):
+        delta = {
+            name: after.get(anime_id, {}).get(name, 0) - before.get(anime_id, {}).get(name, 0)
+            for name in COUNTERS
+        }
+        assert delta == {
+            "favorites_count": int(anime_id in FAVORITES),
+            "watching_count": int(anime_id == 1),
+            "watched_count": int(anime_id in (2, 5)),
+        }
+
+    # Reimportar no duplica nada ni mueve los contadores
+    again = import_lines(client, target, [orjson.dumps(line) for line in exported])
+    assert (again["favorites_added"], again["ignored"]) == (0, 3)
+    assert user_counters(target_id) == (stored, actual, favorites)
+
+
+def test_import_reports_invalid_lines_and_unknown_animes(client, user):
+    user_id, headers = user
+    lines = [
+        b'{"type":"favorite","anime_id":4}',
+        b"no es json",
+        b'{"type":"history","anime_id":4,"status":"pausado"}',
+        b"",
+        b'{"type":"favorite","anime_id":99999}',
+        b'{"type":"history","anime_id":99999,"status":"visto"}',
+        b'{"type":"history","anime_id":4,"status":"visto"}',
+    ]
+    report = import_lines(client, headers, lines)
+    assert report["lines"] == len(lines)
+    assert (report["favorites_added"], report["history_written"]) == (1, 1)
+    assert (report["invalid"], report["ignored"]) == (2, 2)
+    assert [error["line"] for error in report["errors"]] == [2, 3]
+
+    stored, actual, favorites = user_counters(user_id)
+    assert stored == actual == {"viendo": 0, "visto": 1}
+    assert favorites == 1